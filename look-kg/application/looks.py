@@ -0,0 +1,74 @@
+# application/looks.py
+"""
+Busca dos N melhores looks completos (um item por categoria alvo).
+
+Um look é uma clique no grafo de compatibilidade: contexto + um item por alvo,
+todos os pares com score > 0. O score do look é o gargalo do complete_look
+guloso: cada item é pontuado contra tudo que veio antes dele (contexto, depois
+os alvos na ordem pedida) e o look vale o menor desses scores.
+
+Enumeração em profundidade, alvo a alvo, com candidatos em ordem de score
+contra o contexto (desc, item_id). Cotas: o score parcial do look e, para os
+alvos que faltam, o melhor candidato de cada um; quando a cota não alcança o
+N-ésimo look o ramo é cortado (e, como os candidatos vêm ordenados, os irmãos
+seguintes também). Orçamento de expansões e de tempo: estourado, devolve os
+melhores achados até ali com complete=False.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from application.topk import TopK
+
+# orçamento padrão por busca
+MAX_EXPANSIONS = 20000
+TIME_BUDGET_MS = 200
+
+Item = Mapping[str, Any]  # domain.entities.Item ou um dict com os mesmos campos
+Pool = List[Tuple[float, Item]]  # (score contra o contexto, item), ordenado
+
+
+def search(pools: List[Pool], n: int, pair: Callable[[Item, Item], float],
+           max_expansions: Optional[int] = None, time_budget_ms: Optional[int] = None) -> Dict[str, Any]:
+    """
+    pools[i]: candidatos do i-ésimo alvo com score > 0 contra o contexto.
+    Devolve {"looks": [(itens, score)], "complete": bool, "expansions": int};
+    complete=True quando a busca terminou dentro do orçamento (resultado ótimo).
+    """
+    max_expansions = MAX_EXPANSIONS if max_expansions is None else max_expansions
+    deadline = time.monotonic() + (TIME_BUDGET_MS if time_budget_ms is None else time_budget_ms) / 1000.0
+    top = TopK(n)
+    # suffix[i]: cota dos alvos i.. (o look não passa do melhor candidato de nenhum deles)
+    suffix = [1.0] * (len(pools) + 1)
+    for i in range(len(pools) - 1, -1, -1):
+        suffix[i] = min(suffix[i + 1], pools[i][0][0] if pools[i] else 0.0)
+    state = {"expansions": 0, "stopped": False}
+
+    def dfs(i: int, chosen: List[Item], ids: Tuple[str, ...], cur: float) -> None:
+        if i == len(pools):
+            top.push(cur, ids, list(chosen))
+            return
+        rest = suffix[i + 1]
+        for s0, c in pools[i]:
+            order = ids + (c["item_id"],)
+            if not top.admits(min(cur, s0, rest), order):
+                break  # irmãos seguintes: cota menor ou empate com ordem maior
+            if state["expansions"] >= max_expansions or (
+                    state["expansions"] % 256 == 255 and time.monotonic() > deadline):
+                state["stopped"] = True
+                return
+            state["expansions"] += 1
+            m = min(cur, s0)
+            for x in chosen:
+                m = min(m, pair(x, c))
+                if m <= 0 or not top.admits(min(m, rest), order):
+                    break
+            else:
+                dfs(i + 1, chosen + [c], order, m)
+                if state["stopped"]:
+                    return
+
+    if pools and all(pools):
+        dfs(0, [], (), 1.0)
+    return {"looks": top.items(), "complete": not state["stopped"], "expansions": state["expansions"]}
@@ -0,0 +1,104 @@
+# application/result_cache.py
+"""
+Cache LRU/TTL de resultados de recomendação (suggest_complements, complete_look).
+
+Cada entrada é guardada junto com a versão do catálogo/grafo em que foi
+calculada; quando a versão muda (upsert, rebuild, delete) o cache inteiro é
+descartado no próximo acesso. Limites: número de entradas, memória aproximada
+(tamanho do JSON do resultado) e idade. Contadores de hit/miss/evicção para
+monitoramento.
+
+Configuração (0 desliga o limite correspondente; LOOKKG_RESULT_CACHE_SIZE=0
+desliga o cache):
+  LOOKKG_RESULT_CACHE_SIZE  máximo de entradas (padrão 4096)
+  LOOKKG_RESULT_CACHE_MB    memória aproximada máxima (padrão 32)
+  LOOKKG_RESULT_CACHE_TTL   idade máxima em segundos (padrão 300)
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 32 << 20, ttl: float = 300.0):
+        self.max_entries, self.max_bytes, self.ttl = max_entries, max_bytes, ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()  # chave -> (criado, bytes, valor)
+        self._version: Any = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        return cls(max_entries=int(os.environ.get("LOOKKG_RESULT_CACHE_SIZE", "4096")),
+                   max_bytes=int(float(os.environ.get("LOOKKG_RESULT_CACHE_MB", "32")) * (1 << 20)),
+                   ttl=float(os.environ.get("LOOKKG_RESULT_CACHE_TTL", "300")))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _check_version(self, version: Any) -> None:
+        if version != self._version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key: Hashable, version: Any) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._check_version(version)
+            entry = self._data.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[0] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, version: Any, value: Any) -> None:
+        if not self.enabled:
+            return
+        size = len(json.dumps(value, ensure_ascii=False, default=str))
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            # versão mudou durante o cálculo: o valor já nasceu velho
+            if version != self._version:
+                return
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic(), size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"enabled": self.enabled, "entries": len(self._data), "bytes": self._bytes,
+                    "max_entries": self.max_entries, "max_bytes": self.max_bytes, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                    "evictions": self.evictions, "invalidations": self.invalidations}
@@ -1,19 +1,33 @@
 # application/services.py
-from typing import List, Dict, Any, Optional
-from infrastructure.storage import catalog_repo
-from infrastructure.graph import networkx_repo
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from domain.entities import Item
+from infrastructure.storage import catalog_repo, catalog_cache
+from infrastructure.storage.item_store import ItemStore
+from infrastructure.graph import dict_repo, snapshot as graph_snapshot
 from infrastructure.graph_builder import rules_engine as re
+from infrastructure.graph_builder.scoring_kernel import BLOCK_PAIRS, ScoringKernel
+from infrastructure.observability import metrics
+from application import looks
+from application.result_cache import ResultCache
+from application.topk import TopK, bounded_bottleneck
 
 ROLE = re.ROLE
 SINGLETON_ROLES = re.SINGLETON_ROLES
+# candidatos pontuados pela varredura curta antes de passar para a vizinhança do grafo
+SCAN_BUDGET = 64
 
-def _present_categories(ctx: List[Dict[str, Any]]):
+logger = logging.getLogger(__name__)
+
+def _present_categories(ctx: Sequence[Mapping[str, Any]]):
     return {i.get("categoria") for i in ctx}
 
-def _present_roles(ctx: List[Dict[str, Any]]):
+def _present_roles(ctx: Sequence[Mapping[str, Any]]):
     return {ROLE.get(i.get("categoria")) for i in ctx if ROLE.get(i.get("categoria"))}
 
-def _category_allowed(ctx: List[Dict[str, Any]], cat: str) -> bool:
+def _category_allowed(ctx: Sequence[Mapping[str, Any]], cat: str) -> bool:
     # 1) não repetir a mesma categoria
     if cat in _present_categories(ctx):
         return False
@@ -23,63 +37,564 @@ def _category_allowed(ctx: List[Dict[str, Any]], cat: str) -> bool:
         return False
     return True
 
+class _Scoring:
+    """
+    Caches de score de uma requisição, compartilhados entre as sementes de um
+    lote: score por par de assinaturas (só o float; os códigos do rationale
+    são calculados à parte, só para os itens devolvidos) e a lista de
+    candidatos do grafo. `graph` é a versão do grafo presa para a requisição
+    inteira (view()).
+    """
+    def __init__(self, graph, candidates=None):
+        self.graph = graph
+        self._pairs: Dict[tuple, float] = {}
+        self._reasons: Dict[tuple, List[int]] = {}
+        self._source = candidates or (lambda: ItemStore(graph.all_candidates()))
+        self._candidates: Optional[ItemStore] = None
+
+    def pair(self, a: Mapping[str, Any], b: Mapping[str, Any]) -> float:
+        key = (re.signature(a), re.signature(b))
+        v = self._pairs.get(key)
+        if v is None:
+            v = self._pairs[key] = re.pair_score(a, b)
+        return v
+
+    def reasons(self, ctx: Sequence[Mapping[str, Any]], c: Mapping[str, Any]) -> List[int]:
+        """Os códigos (re.REASONS) de re.bottleneck_reasons(ctx, c)."""
+        out: Dict[int, None] = {}
+        sc = re.signature(c)
+        for s in ctx:
+            key = (re.signature(s), sc)
+            r = self._reasons.get(key)
+            if r is None:
+                r = self._reasons[key] = re.pair_reasons(s, c)
+            out.update(dict.fromkeys(r))
+        return list(out)
+
+    def candidates(self) -> ItemStore:
+        if self._candidates is None:
+            self._candidates = self._source()
+        return self._candidates
+
 class RecommendationService:
     def __init__(self):
-        self.graph = networkx_repo.GraphManager.singleton()
+        self.graph = dict_repo.GraphManager.singleton()
+        self._saved_generation: Optional[int] = None
+        self.graph_source: Optional[str] = None  # "snapshot" | "rebuild"
+        self._sorted: Tuple[Any, ItemStore] = (None, ItemStore())  # (versão do grafo, nós por item_id)
+        self.results = ResultCache.from_env()
+        self._register_gauges()
+
+    def _register_gauges(self) -> None:
+        # lidos só na coleta do /metrics
+        metrics.gauge("lookkg_catalog_items", "Itens no snapshot do catálogo em memória.",
+                      lambda: len(catalog_cache.snapshot().store))
+        metrics.gauge("lookkg_graph_nodes", "Nós da versão publicada do grafo.",
+                      lambda: self.graph.view().number_of_nodes())
+        metrics.gauge("lookkg_graph_edges", "Arestas da versão publicada do grafo.",
+                      lambda: self.graph.view().number_of_edges())
+        metrics.gauge("lookkg_graph_generation", "Geração da versão publicada do grafo.",
+                      lambda: self.graph.view().generation)
+        metrics.gauge("lookkg_graph_ready", "1 quando o grafo está pronto para servir.",
+                      lambda: int(self.graph.status == "ready"))
+        metrics.gauge("lookkg_result_cache_entries", "Entradas no cache de resultados.",
+                      lambda: self.results.stats()["entries"])
+        metrics.gauge("lookkg_result_cache_bytes", "Memória aproximada do cache de resultados.",
+                      lambda: self.results.stats()["bytes"])
+        metrics.counter_func("lookkg_result_cache_requests_total", "Consultas ao cache de resultados.",
+                             lambda: {("hit",): self.results.hits, ("miss",): self.results.misses}, ("result",))
+
+    # ---------- ciclo de vida do grafo ----------
+    def warm_start(self, background: bool = True) -> str:
+        """
+        Startup: carrega o snapshot do grafo se ainda vale para o catálogo
+        atual (mesma revisão, mesmos itens, mesmas regras); senão dispara o
+        rebuild (em thread, por padrão) e grava um snapshot novo ao final.
+        """
+        rev, items = catalog_repo.load_all_with_revision()
+        snap = graph_snapshot.load(rev, items, weights=self.graph.weight_format,
+                                   params=self.graph.sparsify.params())
+        if snap is not None:
+            ids, edges = snap
+            self.graph.load_edges(items, ids, edges, revision=rev)
+            self._saved_generation = self.graph.generation
+            self.graph_source = "snapshot"
+            return "snapshot"
+        self.graph.status, self.graph_source = "rebuilding", None
+        if background:
+            threading.Thread(target=self._rebuild_quietly, name="graph-rebuild", daemon=True).start()
+        else:
+            self.rebuild_graph()
+        return "rebuild"
+
+    def _rebuild_quietly(self) -> None:
+        try:
+            self.rebuild_graph()
+        except Exception:
+            logger.exception("rebuild do grafo em background falhou")  # status "error" fica visível em /ready
+
+    def save_graph_snapshot(self) -> bool:
+        """
+        Grava o snapshot se o grafo mudou desde o último. Após upserts a
+        revisão do grafo é desconhecida: só grava se os nós baterem com o
+        catálogo atual (aí vale a revisão lida junto com ele).
+        """
+        gen, rev, ids, nodes, edges = self.graph.export_edges()
+        if gen == self._saved_generation or self.graph.status != "ready":
+            return False
+        digest = graph_snapshot.items_digest(nodes)
+        if rev is None:
+            rev, items = catalog_repo.load_all_with_revision()
+            by_id = {it["item_id"]: it for it in items}
+            if len(by_id) != len(ids) or any(i not in by_id for i in ids):
+                return False
+            if graph_snapshot.items_digest([by_id[i] for i in ids]) != digest:
+                return False
+        graph_snapshot.save(ids, edges, rev, digest, params=self.graph.sparsify.params())
+        self._saved_generation = gen
+        return True
+
+    def graph_status(self) -> Dict[str, Any]:
+        g, view = self.graph, self.graph.view()
+        return {"status": g.status, "source": self.graph_source, "catalog_revision": view.revision,
+                "backend": type(g).__name__, "sparsify": g.sparsify.params(),
+                "generation": view.generation, "nodes": view.number_of_nodes(), "edges": view.number_of_edges()}
 
     def upsert_item_and_generate_edges(self, item: Dict[str, Any]) -> Dict[str, Any]:
         norm = re.normalize_item(item)  # valida e normaliza
         saved = catalog_repo.add_item(norm)
-        all_items = catalog_repo.load_all()
-        self.graph.upsert_item(saved, all_items)
+        catalog_cache.note_upsert(saved)
+        self.graph.upsert_item(saved, catalog_cache.snapshot().store)
         return saved
 
+    def bulk_upsert_items(self, raw_items: List[Any]) -> Dict[str, Any]:
+        """
+        Ingestão em lote: valida cada item com normalize_item, grava todos numa
+        transação e aplica um único delta no grafo. Erros são reportados por
+        posição (índice em raw_items) sem abortar o restante do lote.
+        """
+        valid: List[tuple] = []
+        errors: List[Dict[str, Any]] = []
+        for idx, raw in enumerate(raw_items):
+            if not isinstance(raw, dict):
+                errors.append({"index": idx, "error": "item deve ser um objeto JSON"})
+                continue
+            try:
+                valid.append((idx, re.normalize_item(raw)))
+            except (ValueError, TypeError, AttributeError) as e:
+                errors.append({"index": idx, "error": str(e)})
+
+        results = catalog_repo.add_items([norm for _, norm in valid])
+        saved: List[Dict[str, Any]] = []
+        ids: List[Dict[str, Any]] = []
+        for (idx, norm), err in zip(valid, results):
+            if err:
+                errors.append({"index": idx, "error": err})
+            else:
+                saved.append(norm)
+                ids.append({"index": idx, "item_id": norm["item_id"]})
+
+        graph: Dict[str, int] = {}
+        if saved:
+            catalog_cache.note_upserts(saved)
+            graph = self.graph.upsert_items(saved, catalog_cache.snapshot().store)
+        errors.sort(key=lambda e: e["index"])
+        return {"saved": len(saved), "items": ids, "errors": errors, "graph": graph}
+
+    def delete_items(self, item_ids: List[str]) -> Dict[str, Any]:
+        """
+        Remove itens do catálogo (uma transação) e do grafo sem rebuild: cada
+        nó sai com as arestas incidentes; com top-K esparso, os parceiros que
+        desejavam um removido são reabastecidos. Caches derivados (candidatos
+        ordenados, resultados) acompanham a nova versão do grafo.
+        """
+        deleted = catalog_repo.delete_items(item_ids)
+        graph: Dict[str, int] = {}
+        if deleted:
+            catalog_cache.note_deletes(deleted)
+            graph = self.graph.remove_items(deleted, catalog_cache.snapshot().store)
+        gone = set(deleted)
+        return {"deleted": deleted, "missing": [i for i in dict.fromkeys(item_ids) if i not in gone],
+                "graph": graph}
+
     def rebuild_graph(self) -> Dict[str, int]:
-        all_items = catalog_repo.load_all()
-        return self.graph.rebuild(all_items)
+        # revisão e itens da mesma leitura: o snapshot gravado fica coerente. A leitura é feita
+        # sob a trava dos escritores: um upsert/delete concorrente ou já está nela ou espera e é
+        # aplicado sobre o grafo novo (lido antes da trava, seria sobrescrito pelo rebuild)
+        with self.graph.writing():
+            rev, all_items = catalog_repo.load_all_with_revision()
+            res = self.graph.rebuild(all_items, revision=rev)
+        self.graph_source = "rebuild"
+        self.save_graph_snapshot()
+        return res
+
+    def search_items(self, query: str, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        return {"items": catalog_repo.search(query, limit=limit, offset=offset)}
+
+    # ---------- recomendação ----------
+    def _candidates(self, view) -> ItemStore:
+        """
+        Nós da versão `view` do grafo em ordem de item_id (a ordem dos empates
+        em todo ranking), guardados para a versão publicada mais recente. As
+        colunas de códigos do ItemStore alimentam a ScoringKernel do lote.
+        """
+        cached_view, cands = self._sorted
+        if cached_view is view:
+            return cands
+        with metrics.stage("recommend.candidates"):
+            cands = ItemStore(sorted(view.all_candidates(), key=lambda c: c["item_id"]))
+        self._sorted = (view, cands)  # troca atômica do par
+        return cands
+
+    def _scoring(self) -> _Scoring:
+        # prende a versão publicada do grafo para a requisição inteira
+        view = self.graph.view()
+        return _Scoring(view, lambda: self._candidates(view))
+
+    def _rank(self, ctx: Sequence[Mapping[str, Any]], top_k: int, threshold: float = 0.0,
+              constraints: Optional[Dict[str, str]] = None,
+              cats: Optional[set] = None,
+              shared: Optional[_Scoring] = None) -> Optional[List[Tuple[Item, float]]]:
+        """
+        Top-k (item, score) por score_bottleneck(ctx, c) lendo os pesos já
+        guardados nas arestas, sem varrer o catálogo: candidatos são a interseção
+        das vizinhanças do contexto (a união, com top-K esparso) e só os pares
+        ausentes do grafo são pontuados. O peso guardado difere do
+        score_pair(ctx, c) no máximo pela assimetria das regras + quantização:
+        quem pode entrar no top-k dentro dessa margem é repontuado exato.
+        None => os vizinhos não bastam para garantir o resultado (varrer tudo).
+        """
+        shared = shared or self._scoring()
+        sw = metrics.Stopwatch("recommend.rank")
+        g = shared.graph
+        ctx_ids = {s.get("item_id") for s in ctx}
+        nodes = [i for i in dict.fromkeys(s.get("item_id") for s in ctx) if g.has_node(i)]
+        if not nodes or top_k <= 0:
+            return None
+        node_ctx = [g.node_item(i) for i in nodes]
+        ext = [s for s in ctx if not g.has_node(s.get("item_id"))]
+        adj = [g.adjacent(i) for i in nodes]
+        union = g.sparsify.top_k > 0
+        if union:
+            pool: Iterable[str] = set().union(*adj)
+        else:
+            first = min(adj, key=len)
+            pool = [c for c in first if all(c in a for a in adj)]
+        sw.lap("neighbors")
+
+        allowed: Dict[Any, bool] = {}
+        pair = shared.pair
+
+        slack = re.asymmetry_bound() + g.weight_error
+        bounds = []  # (cota superior, item_id, item|None)
+        for c in pool:
+            if c in ctx_ids:
+                continue
+            cat = g.category(c)
+            if cat not in allowed:
+                allowed[cat] = (cats is None or cat in cats) and _category_allowed(ctx, cat)
+            if not allowed[cat]:
+                continue
+            ws = [a.get(c) for a in adj]
+            item = None
+            if ext or constraints or (union and None in ws):
+                item = g.node_item(c)
+                ws = [w if w is not None else pair(s, item) for w, s in zip(ws, node_ctx)]
+                ws += [pair(s, item) for s in ext]
+            v = min(ws)
+            mul = re.constraint_multiplier(item, constraints) if constraints and item is not None else 1.0
+            bounds.append((min(v + slack, 1.0) * mul, c, item))
+        sw.lap("filter")
+
+        # repontua na ordem (cota desc, item_id) até a cota não alcançar o k-ésimo
+        # exato; o clamp em 1.0 deixa muitos empates, desfeitos por item_id
+        bounds.sort(key=lambda b: (-b[0], b[1]))
+        sw.lap("sort")
+        top = TopK(top_k, threshold)
+        order = list(ctx)
+        for hi, c, item in bounds:
+            if not top.admits(hi, c):
+                break
+            item = item or g.node_item(c)
+            mul = re.constraint_multiplier(item, constraints) if constraints else 1.0
+            sc = bounded_bottleneck(order, item, pair, mul, top, c)
+            if sc is not None:
+                top.push(sc, c, item)
+        results = top.items()
+        sw.lap("score")
+
+        # fora da vizinhança o score é < min_weight + margem (com top-K esparso
+        # a busca fica restrita aos vizinhos: é o contrato da esparsificação)
+        if not union:
+            outside = (g.sparsify.min_weight + slack) * (
+                re.constraint_multiplier(constraints, constraints) if constraints else 1.0)
+            if threshold <= outside and (len(results) < top_k or results[-1][1] <= outside):
+                return None
+        return results
 
-    def search_items(self, query: str, limit: int = 100) -> Dict[str, Any]:
-        return {"items": catalog_repo.search(query, limit=limit)}
+    @metrics.stage("recommend.scan")
+    def _scan(self, ctx: Sequence[Mapping[str, Any]], top_k: int, threshold: float = 0.0,
+              constraints: Optional[Dict[str, str]] = None,
+              cats: Optional[set] = None, budget: Optional[int] = None,
+              shared: Optional[_Scoring] = None) -> Optional[List[Tuple[Item, float]]]:
+        """
+        Varredura do catálogo em branch-and-bound: cota por categoria
+        (rules_engine.pair_upper_bound, mínimo sobre o contexto) poda sem
+        pontuar; o mínimo parcial poda no meio do contexto; e a varredura para
+        quando nem a maior cota alcança o k-ésimo. Como os scores saturam em 1.0
+        isso costuma acontecer logo nos primeiros itens do catálogo.
+        Com `budget`, desiste (None) depois de pontuar tantos candidatos.
+        """
+        top = TopK(top_k, threshold)
+        mul_max = re.constraint_multiplier(constraints, constraints) if constraints else 1.0
+        ub: Dict[Any, Optional[float]] = {}  # categoria -> cota (None: categoria não permitida)
+        order: Dict[Any, List[Mapping[str, Any]]] = {}  # categoria -> contexto, quem mais corta primeiro
+        def bound(cat: Any) -> Optional[float]:
+            if cat not in ub:
+                ok = (cats is None or cat in cats) and _category_allowed(ctx, cat)
+                ub[cat] = min((re.pair_upper_bound(s, cat) for s in ctx), default=0.0) if ok else None
+                order[cat] = list(ctx)
+            return ub[cat]
+        # maior cota possível: categorias pedidas, ou o vocabulário + qualquer outra (sem papel)
+        bounds = [u for u in map(bound, cats if cats is not None else re.CATEGORIES) if u is not None]
+        if cats is None:
+            bounds.append(min((re.pair_upper_bound(s, None) for s in ctx), default=0.0))
+        ceiling = max(bounds, default=0.0) * mul_max
+        shared = shared or self._scoring()
+        exclude = {s.get("item_id") for s in ctx}
+        by_sig: Dict[tuple, Optional[float]] = {}  # assinatura -> score (None: podada)
+        for idx, c in enumerate(shared.candidates()):
+            cat = c.categoria
+            if c.item_id in exclude:
+                continue
+            if not top.admits(ceiling, idx):
+                break  # vale para o resto: ordem só cresce e o k-ésimo só sobe
+            u = bound(cat)
+            if u is None:
+                continue
+            mul = re.constraint_multiplier(c, constraints) if constraints else 1.0
+            if not top.admits(u * mul, idx):
+                continue
+            sig = re.signature(c)
+            if sig not in by_sig:
+                if budget is not None and len(by_sig) >= budget:
+                    return None
+                # podada uma vez, podada sempre: o k-ésimo não desce e a ordem só cresce
+                by_sig[sig] = bounded_bottleneck(order[cat], c, shared.pair, mul, top, idx)
+            score = by_sig[sig]
+            if score is not None:
+                top.push(score, idx, c)
+        return top.items()
+
+    def _top(self, ctx: Sequence[Mapping[str, Any]], top_k: int, threshold: float = 0.0,
+             constraints: Optional[Dict[str, str]] = None, cats: Optional[set] = None,
+             shared: Optional[_Scoring] = None) -> List[Dict[str, Any]]:
+        # varredura curta primeiro (termina cedo quando o topo satura); senão
+        # vizinhança do grafo; sem garantia pelos vizinhos, varredura completa
+        shared = shared or self._scoring()
+        ranked = self._scan(ctx, top_k, threshold, constraints, cats, budget=SCAN_BUDGET + 2 * top_k, shared=shared)
+        if ranked is None:
+            ranked = self._rank(ctx, top_k, threshold, constraints, cats, shared=shared)
+        if ranked is None:
+            ranked = self._scan(ctx, top_k, threshold, constraints, cats, shared=shared)
+        return self._present(ctx, ranked, shared)
+
+    @staticmethod
+    @metrics.stage("recommend.present")
+    def _present(ctx: Sequence[Mapping[str, Any]], ranked: List[Tuple[Item, float]],
+                 shared: _Scoring) -> List[Dict[str, Any]]:
+        # rationale (códigos de re.REASONS) só para os itens devolvidos
+        return [{"item_id": c.get("item_id"), "nome": c.get("nome"), "categoria": c.get("categoria"),
+                 "score": sc, "reasons": shared.reasons(ctx, c)} for c, sc in ranked]
+
+    # ---------- cache de resultados ----------
+    def _results_version(self, shared: _Scoring) -> tuple:
+        # upsert/rebuild/delete mudam a geração do grafo ou a versão do catálogo
+        return (id(self.graph), shared.graph.generation, catalog_repo.version(check_external=False))
+
+    @staticmethod
+    def _canonical(selected: Sequence[Mapping[str, Any]]) -> Optional[List[Mapping[str, Any]]]:
+        """
+        Contexto sem repetições, na ordem dada (ela decide a ordem do
+        rationale); None se algum item não tem id (sem cache).
+        """
+        if any(not s.get("item_id") for s in selected):
+            return None
+        return list({s["item_id"]: s for s in selected}.values())
 
-    def suggest_complements(self, selected: List[Dict[str, Any]], top_k: int = 10,
+    def _cached(self, key: tuple, compute) -> Dict[str, Any]:
+        shared = self._scoring()
+        version = self._results_version(shared)
+        hit = self.results.get(key, version)
+        if hit is not None:
+            return dict(hit)  # quem chama pode anotar o dict (ex.: "message")
+        res = compute(shared)
+        self.results.put(key, version, res)
+        return dict(res)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.results.stats()
+
+    def suggest_complements(self, selected: Sequence[Mapping[str, Any]], top_k: int = 10,
                             threshold: float = 0.0, constraints: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-        # Filtra candidatos por categorias permitidas para o contexto
-        candidates = [
-            c for c in self.graph.all_candidates(exclude_ids=[s.get("item_id") for s in selected])
-            if _category_allowed(selected, c.get("categoria"))
-        ]
-        results = []
-        for c in candidates:
-            sc, rationale = re.score_bottleneck(selected, c)
-            if constraints:
-                sc *= re.constraint_multiplier(c, constraints)
-            if sc >= threshold:
-                results.append({"item_id": c.get("item_id"), "nome": c.get("nome"), "categoria": c.get("categoria"),
-                                "score": sc, "rationale": rationale})
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return {"results": results[:top_k]}
-
-    def complete_look(self, selected: List[Dict[str, Any]], targets: List[str], top_k: int = 1) -> Dict[str, Any]:
+        ctx = self._canonical(selected)
+        if ctx is None:
+            return {"results": self._top(selected, top_k, threshold, constraints)}
+        key = ("complementar", tuple(s["item_id"] for s in ctx), top_k, float(threshold),
+               tuple(sorted((k, v) for k, v in (constraints or {}).items() if v)))
+        return self._cached(key, lambda shared: {"results": self._top(ctx, top_k, threshold, constraints,
+                                                                        shared=shared)})
+
+    def suggest_complements_batch(self, contexts: Iterable[Sequence[Mapping[str, Any]]], top_k: int = 10,
+                                  threshold: float = 0.0,
+                                  constraints: Optional[Dict[str, str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        suggest_complements para muitos contextos, um resultado por vez (na
+        ordem). Um bloco de sementes é pontuado contra o catálogo inteiro de uma
+        vez pela ScoringKernel (bit a bit igual a score_pair); filtro de
+        categorias (por conjunto de categorias do contexto), multiplicadores e
+        rationale por par de assinaturas são compartilhados entre as sementes.
+        Contextos com itens fora do grafo seguem pelo caminho de uma semente.
+        """
+        shared = self._scoring()
+        cands = shared.candidates()
+        n = len(cands)
+        pos = cands.index
+        cat = cands.column("categoria")
+        cat_values = cands.vocab("categoria").values[:int(cat.max(initial=0)) + 1]
+        mul = np.array([re.constraint_multiplier(c, constraints) for c in cands]) if constraints else None
+        masks: Dict[frozenset, np.ndarray] = {}  # categorias do contexto -> categorias permitidas
+        kernel: Optional[ScoringKernel] = None
+        step = max(1, BLOCK_PAIRS // max(n, 1))
+
+        def in_graph(ctx: Sequence[Mapping[str, Any]]) -> bool:
+            return all(s.get("item_id") in pos and re.signature(s) == re.signature(cands[pos[s["item_id"]]])
+                       for s in ctx)
+
+        def rank(ctx: Sequence[Mapping[str, Any]], sc: np.ndarray) -> List[Tuple[Item, float]]:
+            key = frozenset(s.get("categoria") for s in ctx)
+            if key not in masks:
+                masks[key] = np.array([_category_allowed(ctx, cname) for cname in cat_values], dtype=bool)
+            ok = masks[key][cat] & (sc >= threshold)
+            ok[[pos[s["item_id"]] for s in ctx]] = False
+            idx = np.flatnonzero(ok)
+            if len(idx) > top_k:
+                kth = np.partition(-sc[idx], top_k - 1)[top_k - 1]
+                idx = idx[-sc[idx] <= kth]  # inclui os empates no k-ésimo
+            idx = idx[np.lexsort((idx, -sc[idx]))][:top_k]  # empate: ordem do catálogo
+            return [(cands[k], float(sc[k])) for k in idx.tolist()]
+
+        pending: List[Sequence[Mapping[str, Any]]] = []
+        def flush() -> Iterator[Dict[str, Any]]:
+            nonlocal kernel
+            vec = [ctx for ctx in pending if in_graph(ctx)]
+            if vec:
+                with metrics.stage("recommend.batch.score"):
+                    kernel = kernel or ScoringKernel(cands)
+                    rows = np.array([pos[s["item_id"]] for ctx in vec for s in ctx], dtype=np.intp)
+                    block = kernel.score_block(rows, np.arange(n))
+            r0, vi = 0, 0
+            for ctx in pending:
+                if vi < len(vec) and ctx is vec[vi]:
+                    sc = block[r0:r0 + len(ctx)].min(axis=0)
+                    if mul is not None:
+                        sc = sc * mul
+                    ranked = rank(ctx, sc) if top_k > 0 else []
+                    r0, vi = r0 + len(ctx), vi + 1
+                    yield {"results": self._present(ctx, ranked, shared)}
+                else:
+                    yield {"results": self._top(ctx, top_k, threshold, constraints, shared=shared)}
+            pending.clear()
+
+        rows = 0
+        for ctx in contexts:
+            ctx = list(ctx)
+            if rows + len(ctx) > step and pending:
+                yield from flush()
+                rows = 0
+            pending.append(ctx)
+            rows += len(ctx)
+        yield from flush()
+
+    def complete_look(self, selected: Sequence[Mapping[str, Any]], targets: List[str], top_k: int = 1) -> Dict[str, Any]:
+        ctx = self._canonical(selected)
+        if ctx is None:
+            return self._complete_look(selected, targets, top_k, self._scoring())
+        key = ("completar", tuple(s["item_id"] for s in ctx), tuple(targets), top_k)
+        return self._cached(key, lambda shared: self._complete_look(ctx, targets, top_k, shared))
+
+    def _complete_look(self, selected: Sequence[Mapping[str, Any]], targets: List[str], top_k: int,
+                       shared: _Scoring) -> Dict[str, Any]:
         out, missing = {}, []
         ctx = list(selected)
-        all_cands = self.graph.all_candidates()
 
         for t in targets:
             if not _category_allowed(ctx, t):
                 missing.append(f"{t} (já existe no look ou papel único ocupado)")
                 continue
-            pool = [c for c in all_cands if c.get("categoria") == t and _category_allowed(ctx, c.get("categoria"))]
-            scored = []
-            for c in pool:
-                sc, rationale = re.score_bottleneck(ctx, c)
-                scored.append((c, sc, rationale))
-            scored.sort(key=lambda x: x[1], reverse=True)
-            if scored and scored[0][1] > 0:
-                best = [{"item_id": scored[0][0]["item_id"], "nome": scored[0][0]["nome"],
-                         "categoria": scored[0][0]["categoria"], "score": scored[0][1], "rationale": scored[0][2]}]
+            best = self._top(ctx, 1, cats={t}, shared=shared)
+            if best and best[0]["score"] > 0:
                 out[t] = best[:top_k]
-                ctx.append(scored[0][0])  # adiciona ao contexto
+                ctx.append(shared.graph.node_item(best[0]["item_id"]))  # adiciona ao contexto
             else:
                 missing.append(t)
 
         return {"targets": out, "missing": missing}
+
+    def search_looks(self, selected: Sequence[Mapping[str, Any]], targets: List[str], n: int = 5,
+                     max_expansions: Optional[int] = None, time_budget_ms: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Os n melhores looks completos para os alvos (application.looks): mesmas
+        regras do complete_look (categoria não repete, papel único não repete,
+        score > 0), mas com busca exata limitada por orçamento em vez do guloso.
+        """
+        ctx = list(selected)
+        shared = self._scoring()
+        pair = shared.pair
+        sw = metrics.Stopwatch("recommend.looks")
+
+        wanted = list(dict.fromkeys(targets))
+        by_cat: Dict[str, List[Item]] = {t: [] for t in wanted}
+        for c in shared.graph.all_candidates(exclude_ids=[s.get("item_id") for s in ctx]):
+            if c.get("categoria") in by_cat:
+                by_cat[c.get("categoria")].append(c)
+
+        # score de cada candidato contra o contexto, vetorizado (bit a bit igual a score_pair)
+        cands = [c for t in wanted for c in by_cat[t]]
+        s0_all = np.zeros(len(cands))
+        if ctx and cands:
+            kern = ScoringKernel([*ctx, *cands])
+            s0_all = kern.score_block(np.arange(len(ctx)), np.arange(len(ctx), len(ctx) + len(cands))).min(axis=0)
+        s0_of = dict(zip((c["item_id"] for c in cands), s0_all.tolist()))
+        sw.lap("score")
+
+        missing, placed, cats, pools = [], list(ctx), [], []
+        for t in wanted:
+            if not _category_allowed(placed, t):
+                missing.append(f"{t} (já existe no look ou papel único ocupado)")
+                continue
+            pool: looks.Pool = [(s0_of[c["item_id"]], c) for c in by_cat[t] if s0_of[c["item_id"]] > 0]
+            if not pool:
+                missing.append(t)
+                continue
+            pool.sort(key=lambda e: (-e[0], e[1]["item_id"]))
+            cats.append(t)
+            pools.append(pool)
+            placed.append({"categoria": t})
+
+        sw.lap("pools")
+        res = looks.search(pools, n, pair, max_expansions=max_expansions, time_budget_ms=time_budget_ms)
+        sw.lap("search")
+        out = []
+        for chosen, score in res["looks"]:
+            prefix, entries = list(ctx), []
+            for c in chosen:
+                # rationale só dos looks devolvidos
+                entries.append({"item_id": c.get("item_id"), "nome": c.get("nome"),
+                                "categoria": c.get("categoria"), "score": re.bottleneck_score(prefix, c),
+                                "reasons": shared.reasons(prefix, c)})
+                prefix.append(c)
+            out.append({"score": score, "items": entries})
+        sw.lap("present")
+        return {"looks": out, "targets": cats, "missing": missing,
+                "complete": res["complete"], "expansions": res["expansions"]}
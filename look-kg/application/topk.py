@@ -0,0 +1,84 @@
+# application/topk.py
+"""
+Top-K por branch-and-bound para o score gargalo (score_bottleneck).
+
+O score de um candidato é o mínimo de score_pair sobre o contexto (vezes o
+constraint_multiplier). Logo qualquer mínimo parcial já é cota superior: assim
+que ela não alcança o k-ésimo melhor (ou o threshold) o candidato é descartado
+sem pontuar o resto do contexto. Cotas mais grossas (por categoria, a partir
+das matrizes do rules_engine) descartam candidatos sem pontuar nada.
+
+Empates: vence a menor `ordem` (posição no catálogo ou item_id), como no sort
+estável da varredura antiga.
+"""
+from __future__ import annotations
+
+import heapq
+from typing import Any, Callable, List, Mapping, Tuple
+
+Item = Mapping[str, Any]  # domain.entities.Item ou um dict com os mesmos campos
+
+
+class _Later:
+    """Inverte a comparação da ordem: no heap mínimo o empate de maior ordem fica no topo."""
+    __slots__ = ("key",)
+
+    def __init__(self, key: Any):
+        self.key = key
+
+    def __lt__(self, other: "_Later") -> bool:
+        return self.key > other.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Later) and self.key == other.key
+
+
+class TopK:
+    """Os k melhores (score, ordem) vistos, num heap mínimo cujo topo é o k-ésimo."""
+
+    def __init__(self, k: int, threshold: float = 0.0):
+        self.k, self.threshold = k, threshold
+        self._heap: List[Tuple[float, _Later, Any]] = []
+
+    def admits(self, bound: float, order: Any) -> bool:
+        """Um candidato com score <= bound (nesta ordem) ainda pode entrar?"""
+        if bound < self.threshold or self.k <= 0:
+            return False
+        if len(self._heap) < self.k:
+            return True
+        worst, later, _ = self._heap[0]
+        return bound > worst or (bound == worst and order < later.key)
+
+    def push(self, score: float, order: Any, payload: Any) -> bool:
+        if not self.admits(score, order):
+            return False
+        entry = (score, _Later(order), payload)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heapreplace(self._heap, entry)
+        return True
+
+    def items(self) -> List[Tuple[Any, float]]:
+        """(payload, score) do melhor para o pior."""
+        best = sorted(self._heap, key=lambda e: (-e[0], e[1].key))
+        return [(payload, score) for score, _, payload in best]
+
+
+def bounded_bottleneck(ctx: List[Item], cand: Item, pair: Callable[[Item, Item], float],
+                       mul: float, top: TopK, order: Any) -> Any:
+    """
+    min(pair(s, cand) for s in ctx) * mul, ou None assim que o mínimo parcial
+    não cabe mais em `top`. O item de contexto que cortou vai para o início de
+    ctx (a lista é reordenada no lugar): tende a cortar o próximo também.
+    """
+    m = 1.0 if ctx else 0.0  # score_pair <= 1 (clamp)
+    for j, s in enumerate(ctx):
+        v = pair(s, cand)
+        if v < m:
+            m = v
+            if not top.admits(m * mul, order):
+                if j:
+                    ctx.insert(0, ctx.pop(j))
+                return None
+    return m * mul if top.admits(m * mul, order) else None
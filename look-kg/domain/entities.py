@@ -1,8 +1,21 @@
+# domain/entities.py
+from collections.abc import Mapping
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional
 
-@dataclass
-class Item:
+# colunas do catálogo, na ordem dos campos de Item (e do SELECT do catalog_repo)
+FIELDS = ("item_id", "nome", "categoria", "cor", "padrao", "material", "estilo", "ocasion", "clima", "paleta")
+_FIELD_SET = frozenset(FIELDS)
+
+@dataclass(slots=True, eq=False)
+class Item(Mapping[str, Any]):
+    """
+    Item do catálogo. Só leitura depois de criado: é compartilhado pelo
+    snapshot do catálogo, pelo grafo e pelos caches de recomendação
+    (infrastructure.storage.item_store). Lê como um dict (it["cor"],
+    it.get("cor"), dict(it)) e é um Mapping para o código que trata itens
+    como mapeamentos; igualdade e hash seguem sendo por identidade.
+    """
     item_id: str
     nome: str
     categoria: str
@@ -12,3 +25,30 @@ class Item:
     estilo: Optional[str] = None
     ocasion: Optional[str] = None
     clima: Optional[str] = None
+    paleta: Optional[str] = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in _FIELD_SET else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in _FIELD_SET
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def keys(self):
+        return FIELDS
+
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {f: getattr(self, f) for f in FIELDS}
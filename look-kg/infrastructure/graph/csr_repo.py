@@ -0,0 +1,454 @@
+# infrastructure/graph/csr_repo.py
+"""
+Backend compacto do grafo: adjacência CSR com ids inteiros e pesos quantizados.
+
+Mesma interface do GraphManager (dict_repo): rebuild, upsert_item(s),
+neighbors, partners, all_candidates, load_edges/export_edges (snapshot).
+
+- nó = índice inteiro; os atributos do item ficam uma vez só em `items`
+  (tabela lateral de Items, os mesmos objetos do catálogo), com `index`
+  item_id -> índice;
+- arestas nos dois sentidos em indptr/indices (int32), linhas ordenadas
+  pelo índice do parceiro;
+- peso quantizado (LOOKKG_GRAPH_WEIGHTS): uint8 (padrão, passo 1/255;
+  score > 0 nunca vira 0) ou float16. ~10 bytes por aresta no total;
+- upserts e remoções não reescrevem os arrays: as linhas alteradas vão para
+  um overlay (dict por nó, None = aresta removida; nó removido = None em
+  `items`) que é compactado no CSR quando passa de COMPACT_RATIO das
+  entradas;
+- read-copy-update como no GraphManager: o estado fica numa CSRGraphView
+  imutável; escritas vão num rascunho (arrays do CSR compartilhados, tabela
+  de itens/índice copiados, linhas do overlay copiadas na primeira escrita)
+  publicado com uma troca de referência.
+
+Ativado com LOOKKG_GRAPH_BACKEND=csr (ver GraphManager.singleton).
+"""
+from __future__ import annotations
+
+import copy
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from domain.entities import Item
+from infrastructure.observability import metrics
+from infrastructure.storage.item_store import as_item
+
+WEIGHT_FORMATS = ("uint8", "float16")
+# erro máximo de quantize() para pesos em [0, 1]
+WEIGHT_ERROR = {"uint8": 1 / 255, "float16": 2.0 ** -11}
+# overlay maior que esta fração do CSR (ou que COMPACT_MIN entradas) => compacta
+COMPACT_RATIO = 0.25
+COMPACT_MIN = 1 << 16
+
+Edges = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def default_weight_format() -> str:
+    fmt = os.environ.get("LOOKKG_GRAPH_WEIGHTS", "uint8")
+    if fmt not in WEIGHT_FORMATS:
+        raise ValueError(f"LOOKKG_GRAPH_WEIGHTS inválido: {fmt!r} (use {', '.join(WEIGHT_FORMATS)})")
+    return fmt
+
+
+def quantize(w: np.ndarray, fmt: str) -> np.ndarray:
+    w = np.asarray(w, dtype=np.float64)
+    if fmt == "uint8":
+        q = np.rint(np.clip(w, 0.0, 1.0) * 255)
+        return np.where(w > 0, np.maximum(q, 1), 0).astype(np.uint8)
+    return w.astype(np.float16)
+
+
+def dequantize(q: np.ndarray, fmt: str) -> np.ndarray:
+    if fmt == "uint8":
+        return np.asarray(q, dtype=np.float64) / 255.0
+    return np.asarray(q, dtype=np.float64)
+
+
+class CSRGraphView:
+    """
+    Versão imutável do grafo CSR (ver dict_repo.GraphView): leitura sem
+    lock; draft() abre o rascunho da próxima versão.
+    """
+    def __init__(self, cfg, items: Sequence[Mapping[str, Any]], src: np.ndarray, dst: np.ndarray, q: np.ndarray,
+                 floors: Dict[str, Dict[Any, Tuple[float, str]]], revision: Optional[int], generation: int):
+        """Grafo inteiro novo; src/dst/q trazem cada aresta nos dois sentidos."""
+        n = len(items)
+        order = np.lexsort((dst, src))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        qtype = np.dtype(cfg.weight_format)
+        # (indptr, indices, pesos, nós cobertos pelo CSR); o resto do overlay parte daqui
+        csr = (indptr, dst[order].astype(np.int32), q[order].astype(qtype), n)
+        self._assign(cfg, [as_item(it) for it in items], csr, {}, set(), len(src) // 2, floors, revision, generation)
+
+    @classmethod
+    def from_parts(cls, cfg, items: List[Optional[Item]], csr: Tuple[np.ndarray, np.ndarray, np.ndarray, int],
+                   patch: Dict[int, Dict[int, Any]], replaced: set, edges: int,
+                   floors: Dict[str, Dict[Any, Tuple[float, str]]], revision: Optional[int],
+                   generation: int) -> "CSRGraphView":
+        """Versão sobre um CSR já pronto (ex.: arrays mapeados de arquivo) + overlay, sem copiar a base."""
+        view = cls.__new__(cls)
+        view._assign(cfg, items, csr, patch, replaced, edges, floors, revision, generation)
+        return view
+
+    def _assign(self, cfg, items: List[Optional[Item]], csr: Tuple[np.ndarray, np.ndarray, np.ndarray, int],
+                patch: Dict[int, Dict[int, Any]], replaced: set, edges: int,
+                floors: Dict[str, Dict[Any, Tuple[float, str]]], revision: Optional[int], generation: int) -> None:
+        self.sparsify, self.weight_format, self.weight_error = cfg.sparsify, cfg.weight_format, cfg.weight_error
+        self._qtype = np.dtype(self.weight_format)
+        self._csr = csr
+        self.items = items
+        self.index = {it.item_id: k for k, it in enumerate(items) if it is not None}
+        self._cat_code: Dict[Any, int] = {}
+        self.cat = np.array([self._cat_code.setdefault(it.categoria, len(self._cat_code)) if it is not None
+                             else 0 for it in items], dtype=np.int32)
+        self._replaced = replaced
+        self._patch = patch
+        self._patch_size = sum(len(row) for row in patch.values())
+        self._holes = len(items) - len(self.index)  # nós removidos (None em items) até a próxima compactação
+        self._edges = edges
+        self.floors = floors
+        self.revision, self.generation = revision, generation
+        # rascunho: linhas do overlay já copiadas (None: versão publicada, só leitura)
+        self._owned: Optional[set] = None
+
+    # ---------- leitura ----------
+    def _row(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(parceiros, pesos quantizados) do nó i, ordenados pelo índice do parceiro."""
+        indptr, indices, weights, n_base = self._csr
+        if i < n_base and i not in self._replaced:
+            nb, q = indices[indptr[i]:indptr[i + 1]], weights[indptr[i]:indptr[i + 1]]
+        else:
+            nb, q = indices[:0], weights[:0]
+        p = self._patch.get(i)
+        if p:
+            keys = np.fromiter(p.keys(), dtype=np.int64, count=len(p))
+            if len(nb):
+                keep = ~np.isin(nb, keys)
+                nb, q = nb[keep], q[keep]
+            live = [(k, x) for k, x in p.items() if x is not None]
+            if live:
+                nb = np.concatenate([nb, np.array([k for k, _ in live], dtype=np.int32)])
+                q = np.concatenate([q, np.array([x for _, x in live], dtype=self._qtype)])
+                order = np.argsort(nb, kind="stable")
+                nb, q = nb[order], q[order]
+        return nb, q
+
+    def number_of_nodes(self) -> int:
+        return len(self.index)
+
+    def number_of_edges(self) -> int:
+        return self._edges
+
+    def neighbors(self, item_id: str) -> List[str]:
+        i = self.index.get(item_id)
+        if i is None: return []
+        return [self.items[j].item_id for j in self._row(i)[0].tolist()]
+
+    def partners(self, item_id: str, categoria: str) -> Dict[str,float]:
+        """Parceiros de item_id na categoria dada -> peso (desquantizado)."""
+        i = self.index.get(item_id)
+        code = self._cat_code.get(categoria)
+        if i is None or code is None: return {}
+        nb, q = self._row(i)
+        keep = self.cat[nb] == code
+        w = dequantize(q[keep], self.weight_format)
+        return {self.items[j].item_id: x for j, x in zip(nb[keep].tolist(), w.tolist())}
+
+    def all_candidates(self, exclude_ids: Iterable[str]=()) -> List[Item]:
+        ids = set(exclude_ids or [])
+        return [it for it in self.items if it is not None and it.item_id not in ids]
+
+    def has_node(self, item_id: str) -> bool:
+        return item_id in self.index
+
+    def category(self, item_id: str) -> Any:
+        return self.node_item(item_id).categoria
+
+    def node_item(self, item_id: str) -> Item:
+        it = self.items[self.index[item_id]]
+        assert it is not None  # index só aponta para nós vivos
+        return it
+
+    def adjacent(self, item_id: str) -> Dict[str,float]:
+        nb, q = self._row(self.index[item_id])
+        return {self.items[j].item_id: x for j, x in zip(nb.tolist(), dequantize(q, self.weight_format).tolist())}
+
+    def _has_edge(self, i: int, j: int) -> bool:
+        nb = self._row(i)[0]
+        k = int(np.searchsorted(nb, j))
+        return k < len(nb) and int(nb[k]) == j
+
+    def has_overlay(self) -> bool:
+        return bool(self._patch or self._replaced or self._holes or self._csr[3] != len(self.items))
+
+    def edges(self) -> Edges:
+        """(u, v, peso quantizado) com u < v, overlay incluído."""
+        view = self.compacted()
+        indptr, indices, weights, n = view._csr
+        src = np.repeat(np.arange(n, dtype=np.int32), np.diff(indptr))
+        up = src < indices
+        return src[up], indices[up], weights[up]
+
+    def compacted(self) -> "CSRGraphView":
+        """A mesma versão com o overlay aplicado: linhas intocadas vêm fatiadas do CSR, as demais de _row()."""
+        if not self.has_overlay():
+            return self
+        indptr, indices, weights, n_base = self._csr
+        touched = np.zeros(len(self.items), dtype=bool)
+        touched[list(self._replaced | set(self._patch))] = True
+        touched[n_base:] = True
+        src = np.repeat(np.arange(n_base, dtype=np.int64), np.diff(indptr))
+        keep = ~touched[src]
+        srcs, dsts, qs = [src[keep]], [indices[keep].astype(np.int64)], [weights[keep]]
+        for i in np.flatnonzero(touched).tolist():
+            nb, q = self._row(i)
+            srcs.append(np.full(len(nb), i, dtype=np.int64)); dsts.append(nb.astype(np.int64)); qs.append(q)
+        src, dst, q = np.concatenate(srcs), np.concatenate(dsts), np.concatenate(qs)
+        items = [it for it in self.items if it is not None]
+        if self._holes:
+            # nós removidos saem e os índices são renumerados (não sobra aresta apontando para eles)
+            live = np.array([it is not None for it in self.items], dtype=bool)
+            renum = np.cumsum(live) - 1
+            src, dst = renum[src], renum[dst]
+        return CSRGraphView(self, items, src, dst, q, self.floors, self.revision, self.generation)
+
+    # ---------- rascunho (escritor, sob CSRGraphManager._lock) ----------
+    def draft(self) -> "CSRGraphView":
+        """Próxima versão: arrays do CSR compartilhados, O(nós) de cópia, overlay sob demanda."""
+        d = copy.copy(self)
+        d.items, d.index, d._cat_code, d.cat = list(self.items), dict(self.index), dict(self._cat_code), self.cat.copy()
+        d._replaced, d._patch, d.floors = set(self._replaced), dict(self._patch), dict(self.floors)
+        d.revision, d.generation = None, self.generation + 1
+        d._owned = set()
+        return d
+
+    def _upsert_items(self, batch: Sequence[Mapping[str, Any]], items: Sequence[Mapping[str, Any]]) -> None:
+        """Mesma semântica do GraphView._upsert_items; só o overlay é tocado."""
+        from infrastructure.graph_builder.partition import iter_upsert_edges
+        last = {it["item_id"]: k for k, it in enumerate(batch)}
+        batch = [it for k, it in enumerate(batch) if last[it["item_id"]] == k]
+        rows = [self._node(it) for it in batch]
+        in_batch = set(rows)
+        # arestas antigas dos nós do lote: viram lápides nas linhas dos parceiros
+        olds = [self._row(i)[0].tolist() for i in rows]
+        inner = sum(1 for old in olds for j in old if j in in_batch)  # cada aresta interna conta 2x
+        dropped = sum(len(old) for old in olds) - inner // 2
+        for i, old in zip(rows, olds):
+            for j in old:
+                self._put(j, i, None)
+            self._clear_row(i)
+        combined = batch + [o for o in items if o["item_id"] not in last]
+        added = 0
+        for xs, ys, ws in iter_upsert_edges(batch, combined[len(batch):]):
+            qs = quantize(ws, self.weight_format).tolist()
+            for a, b, q in zip(xs.tolist(), ys.tolist(), qs):
+                ia = rows[a]
+                ib = rows[b] if b < len(rows) else self._node(combined[b], update=False)
+                self._put(ia, ib, q)
+                self._put(ib, ia, q)
+            added += len(qs)
+        self._edges += added - dropped
+
+    def _node(self, item: Mapping[str, Any], update: bool=True) -> int:
+        """Índice do item (novo nó no fim, se preciso); com update, atualiza os atributos."""
+        i = self.index.get(item["item_id"])
+        if i is None:
+            i = len(self.items)
+            self.index[item["item_id"]] = i
+            self.items.append(None)
+            self.cat = np.append(self.cat, np.int32(0))
+        elif not update:
+            return i
+        it = self.items[i] = as_item(item)
+        self.cat[i] = self._cat_code.setdefault(it.categoria, len(self._cat_code))
+        return i
+
+    def _put(self, i: int, j: int, q: Any) -> None:
+        owned = self._owned
+        assert owned is not None  # só rascunhos escrevem
+        if i not in owned:
+            self._patch[i] = dict(self._patch.get(i, {}))
+            owned.add(i)
+        row = self._patch[i]
+        if j not in row: self._patch_size += 1
+        row[j] = q
+
+    def _clear_row(self, i: int) -> None:
+        """A linha de i passa a vir só do overlay, vazia."""
+        if i < self._csr[3]: self._replaced.add(i)
+        self._patch_size -= len(self._patch.get(i, ()))
+        self._patch[i] = {}
+        assert self._owned is not None
+        self._owned.add(i)
+
+    def _remove_node(self, item_id: str) -> None:
+        """O(grau): lápides nas linhas dos parceiros; o índice vira buraco até a compactação."""
+        self._drop_edges(item_id)
+        i = self.index.pop(item_id)
+        self.items[i] = None
+        self._holes += 1
+        self.floors.pop(item_id, None)
+
+    # --- primitivas usadas pela manutenção do grafo esparsificado (graph_builder.sparsify) ---
+    def _add_node(self, item: Mapping[str, Any]) -> None:
+        self._node(item)
+
+    def _drop_edges(self, item_id: str) -> None:
+        i = self.index[item_id]
+        old = self._row(i)[0].tolist()
+        for j in old:
+            self._put(j, i, None)
+        self._clear_row(i)
+        self._edges -= len(old)
+
+    def _set_edge(self, a: str, b: str, w: float) -> None:
+        i, j = self.index[a], self.index[b]
+        if not self._has_edge(i, j): self._edges += 1
+        q = quantize(np.array([w]), self.weight_format)[0].item()
+        self._put(i, j, q)
+        self._put(j, i, q)
+
+    def _del_edge(self, a: str, b: str) -> None:
+        i, j = self.index[a], self.index[b]
+        if self._has_edge(i, j): self._edges -= 1
+        self._put(i, j, None)
+        self._put(j, i, None)
+
+    def _as_stored(self, w: np.ndarray) -> np.ndarray:
+        return dequantize(quantize(w, self.weight_format), self.weight_format)
+
+    def _overlay_full(self) -> bool:
+        return (self._patch_size > max(COMPACT_MIN, COMPACT_RATIO * len(self._csr[1]))
+                or self._holes > COMPACT_RATIO * len(self.items))
+
+
+class CSRGraphManager:
+    def __init__(self, workers: Optional[int]=None, shard_pairs: Optional[int]=None,
+                 weight_format: Optional[str]=None, top_k: Optional[int]=None,
+                 min_weight: Optional[float]=None):
+        from infrastructure.graph_builder.sparsify import SparsifyConfig
+        self.workers, self.shard_pairs = workers, shard_pairs
+        self.sparsify = SparsifyConfig.from_env(top_k, min_weight)
+        self.weight_format = weight_format or default_weight_format()
+        self._qtype = np.dtype(self.weight_format)
+        self.weight_error = WEIGHT_ERROR[self.weight_format]
+        # escritas serializadas; leitores não travam (view())
+        self._lock = threading.RLock()
+        self.status = "empty"
+        self._view = CSRGraphView(self, [], np.empty(0, np.int64), np.empty(0, np.int64),
+                                  np.empty(0, self._qtype), {}, None, 0)
+
+    def view(self) -> CSRGraphView:
+        """A versão publicada: imutável, para segurar durante uma requisição."""
+        return self._view
+
+    def __getattr__(self, name: str):
+        # leitura avulsa (has_node, partners, generation, items...) vai para a versão publicada
+        if name.startswith("_"): raise AttributeError(name)
+        return getattr(self._view, name)
+
+    def writing(self):
+        """Trava dos escritores (ver GraphManager.writing)."""
+        return self._lock
+
+    def _publish(self, view: CSRGraphView) -> None:
+        if view._owned is not None and view._overlay_full():
+            view = view.compacted()
+        view._owned = None
+        self._view = view  # troca atômica: quem já segura a anterior não é afetado
+
+    # ---------- montagem ----------
+    def _undirected(self, x: np.ndarray, y: np.ndarray, w: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        x, y = np.asarray(x, dtype=np.int64), np.asarray(y, dtype=np.int64)
+        q = w if w.dtype == self._qtype else quantize(w, self.weight_format)
+        return np.concatenate([x, y]), np.concatenate([y, x]), np.concatenate([q, q])
+
+    @metrics.rebuild()
+    def rebuild(self, items: Sequence[Mapping[str, Any]], revision: Optional[int]=None):
+        from infrastructure.graph_builder.partition import CatalogPartition
+        from infrastructure.graph_builder.parallel import iter_task_results
+        from infrastructure.graph_builder.sparsify import Sparsifier
+        with self._lock:
+            prev = self.status
+            if prev != "ready": self.status = "rebuilding"
+            try:
+                part = CatalogPartition(items)
+                results = iter_task_results(part, self.workers, self.shard_pairs)
+                sp = None
+                if self.sparsify.enabled:
+                    # top-K decidido sobre o peso quantizado, o mesmo que partners() devolve depois
+                    sp = Sparsifier(part, [it["item_id"] for it in items], [it.get("categoria") for it in items],
+                                    self.sparsify, stored=self._view._as_stored)
+                    results = sp.filter(results)
+                xs, ys, qs = [np.empty(0, np.int64)], [np.empty(0, np.int64)], [np.empty(0, self._qtype)]
+                for _, (x, y, w) in results:
+                    xs.append(x); ys.append(y); qs.append(quantize(w, self.weight_format))
+                src, dst, q = self._undirected(np.concatenate(xs), np.concatenate(ys), np.concatenate(qs))
+                view = CSRGraphView(self, items, src, dst, q, sp.floors() if sp else {},
+                                    revision, self._view.generation + 1)
+            except BaseException:
+                self.status = prev if prev == "ready" else "error"
+                raise
+            self._publish(view)
+            self.status = "ready"
+            return {"nodes": view.number_of_nodes(), "edges": view.number_of_edges()}
+
+    @metrics.stage("graph.load_edges")
+    def load_edges(self, items: Sequence[Mapping[str, Any]], ids: List[str], edges: Edges, revision: Optional[int]=None):
+        """Monta o CSR a partir de arestas prontas (snapshot), nós na ordem de ids."""
+        by_id = {it["item_id"]: it for it in items}
+        u, v, w = edges
+        from infrastructure.graph_builder.sparsify import floors_from_edges
+        src, dst, q = self._undirected(u, v, np.asarray(w))
+        floors = {}
+        if self.sparsify.enabled:
+            floors = floors_from_edges(ids, [by_id[i].get("categoria") for i in ids], u, v,
+                                       dequantize(q[:len(q) // 2], self.weight_format), self.sparsify.top_k)
+        with self._lock:
+            view = CSRGraphView(self, [by_id[i] for i in ids], src, dst, q, floors, revision,
+                                self._view.generation + 1)
+            self._publish(view)
+            self.status = "ready"
+        return {"nodes": view.number_of_nodes(), "edges": view.number_of_edges()}
+
+    def export_edges(self):
+        """(generation, revision, ids, itens dos nós, (u, v, peso quantizado)) com u < v."""
+        view = self._view.compacted()
+        ids = [it["item_id"] for it in view.items]
+        return view.generation, view.revision, ids, list(view.items), view.edges()
+
+    # ---------- escrita incremental ----------
+    def upsert_item(self, item: Mapping[str, Any], items: Sequence[Mapping[str, Any]]):
+        return self.upsert_items([item], items)
+
+    @metrics.stage("graph.upsert")
+    def upsert_items(self, batch: Sequence[Mapping[str, Any]], items: Sequence[Mapping[str, Any]]):
+        """Mesma semântica do GraphManager.upsert_items; só o overlay é tocado."""
+        with self._lock:
+            if self._view.number_of_nodes()==0: return self.rebuild(items)
+            draft = self._view.draft()
+            if self.sparsify.enabled:
+                from infrastructure.graph_builder.sparsify import sparse_upsert
+                sparse_upsert(draft, batch, items, self.sparsify)
+            else:
+                draft._upsert_items(batch, items)
+            self._publish(draft)
+            return {"nodes": draft.number_of_nodes(), "edges": draft.number_of_edges()}
+
+    @metrics.stage("graph.remove")
+    def remove_items(self, item_ids: Iterable[str], items: Sequence[Mapping[str, Any]]):
+        """Mesma semântica do GraphManager.remove_items; só o overlay é tocado."""
+        with self._lock:
+            draft = self._view.draft()
+            if self.sparsify.enabled:
+                from infrastructure.graph_builder.sparsify import sparse_remove
+                sparse_remove(draft, item_ids, items, self.sparsify)
+            else:
+                for i in dict.fromkeys(item_ids):
+                    if draft.has_node(i): draft._remove_node(i)
+            self._publish(draft)
+            return {"nodes": draft.number_of_nodes(), "edges": draft.number_of_edges()}
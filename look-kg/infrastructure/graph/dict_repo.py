@@ -0,0 +1,343 @@
+import os
+import threading
+import numpy as np
+from typing import Dict, Any, List, Iterable, Mapping, Optional, Sequence, Tuple
+from domain.entities import Item
+from infrastructure.observability import metrics
+from infrastructure.storage.item_store import as_item
+
+# linhas base: item_id -> categoria do parceiro -> {parceiro: peso} (o formato de adjacência do nx.Graph,
+# partido por categoria para partners() ser um lookup direto)
+Rows = Dict[str, Dict[Any, Dict[str, float]]]
+# overlay maior que esta fração das entradas da base (ou que COMPACT_MIN entradas) => compacta
+COMPACT_RATIO = 0.25
+COMPACT_MIN = 1 << 16
+
+def _rows_from_edges(ids: Sequence[str], cats: Sequence[Any], u: np.ndarray, v: np.ndarray, w: np.ndarray) -> Rows:
+    """
+    Linhas base a partir de arestas (u, v, w) por posição em ids. Cada aresta
+    entra nos dois sentidos, agrupada com numpy por (nó, categoria do
+    parceiro): um dict por grupo, sem objeto Python por aresta além da entrada.
+    """
+    rows: Rows = {i: {} for i in ids}
+    if not len(w): return rows
+    cat_of: Dict[Any,int] = {}
+    ccode = np.array([cat_of.setdefault(c, len(cat_of)) for c in cats], dtype=np.int64)
+    cat_list = list(cat_of)
+    u, v = np.asarray(u, dtype=np.int64), np.asarray(v, dtype=np.int64)
+    src, dst, ws = np.concatenate([u, v]), np.concatenate([v, u]), np.concatenate([w, w]).astype(np.float64)
+    key = src * len(cat_list) + ccode[dst]
+    order = np.argsort(key, kind="stable")
+    key, dst, ws = key[order], dst[order], ws[order]
+    cuts = (np.flatnonzero(np.diff(key)) + 1).tolist()
+    starts, ends = [0] + cuts, cuts + [len(key)]
+    nbrs, wl = np.array(ids, dtype=object)[dst].tolist(), ws.tolist()
+    for s0, s1, k in zip(starts, ends, key[starts].tolist()):
+        a, c = divmod(k, len(cat_list))
+        rows[ids[a]][cat_list[c]] = dict(zip(nbrs[s0:s1], wl[s0:s1]))
+    return rows
+
+class GraphView:
+    """
+    Versão imutável do grafo (read-copy-update). Leitores pegam uma com
+    GraphManager.view() e a usam a requisição inteira, sem lock: nada nela
+    muda depois de publicada. Escritores trabalham num rascunho (draft()) e
+    o publicam com uma troca de referência (GraphManager._publish).
+
+    As linhas base (Rows) nunca são alteradas e ficam compartilhadas entre
+    versões; upserts e remoções vão para um overlay por nó (parceiro -> peso,
+    None = aresta removida; nó em _cleared = linha base ignorada), como no
+    backend csr, e o overlay é aplicado à base quando passa de COMPACT_RATIO
+    das entradas. Um upsert custa O(grau), sem copiar linhas inteiras.
+    """
+    def __init__(self, cfg, nodes: Dict[str, Item], rows: Rows, edges: int,
+                 floors: Dict[str, Dict[Any, Tuple[float, str]]], revision: Optional[int], generation: int):
+        # item_id -> Item (os mesmos objetos do catálogo), na ordem de inserção
+        self.nodes = nodes
+        self._rows = rows
+        self._base_size = 2 * edges  # entradas nas linhas base (cada aresta nos dois sentidos)
+        self._patch: Dict[str, Dict[str, Optional[float]]] = {}
+        self._cleared: set = set()
+        self._patch_size = 0
+        self._edges = edges
+        # pisos do top-K por nó (esparsificação; só os escritores usam)
+        self.floors = floors
+        # revisão do catalog.db refletida pelo grafo (None: desconhecida, ex. após upserts)
+        self.revision = revision
+        # sobe a cada versão publicada com conteúdo novo (para saber se vale gravar snapshot)
+        self.generation = generation
+        self.sparsify, self.weight_format, self.weight_error = cfg.sparsify, cfg.weight_format, cfg.weight_error
+        # rascunho: linhas do overlay já copiadas desta versão (None: versão publicada, só leitura)
+        self._owned: Optional[set] = None
+    # ---------- leitura ----------
+    def has_node(self, item_id: str) -> bool:
+        return item_id in self.nodes
+    def category(self, item_id: str) -> Any:
+        return self.nodes[item_id].categoria
+    def node_item(self, item_id: str) -> Item:
+        return self.nodes[item_id]
+    def adjacent(self, item_id: str) -> Dict[str,float]:
+        out: Dict[str,float] = {}
+        if item_id not in self._cleared:
+            for row in self._rows.get(item_id, {}).values(): out.update(row)
+        for nb, w in self._patch.get(item_id, {}).items():
+            if w is None: out.pop(nb, None)
+            else: out[nb] = w
+        return out
+    def number_of_nodes(self) -> int:
+        return len(self.nodes)
+    def number_of_edges(self) -> int:
+        return self._edges
+    def neighbors(self, item_id: str) -> List[str]:
+        return list(self.adjacent(item_id)) if item_id in self.nodes else []
+    def partners(self, item_id: str, categoria: str) -> Dict[str,float]:
+        """Parceiros de item_id na categoria dada -> peso (lookup direto na linha base + overlay)."""
+        if item_id not in self.nodes: return {}
+        out = {} if item_id in self._cleared else dict(self._rows.get(item_id, {}).get(categoria, {}))
+        nodes = self.nodes
+        # parceiro que mudou de categoria tem entrada no overlay (o upsert dele passa por _drop_edges)
+        for nb, w in self._patch.get(item_id, {}).items():
+            if w is None or nodes[nb].categoria != categoria: out.pop(nb, None)
+            else: out[nb] = w
+        return out
+    def all_candidates(self, exclude_ids: Iterable[str]=()) -> List[Item]:
+        ids=set(exclude_ids or [])
+        return [it for nid,it in self.nodes.items() if nid not in ids]
+    def _has_edge(self, a: str, b: str) -> bool:
+        p = self._patch.get(a)
+        if p is not None and b in p: return p[b] is not None
+        return a not in self._cleared and b in self._rows.get(a, {}).get(self.nodes[b].categoria, {})
+    def has_overlay(self) -> bool:
+        return bool(self._patch or self._cleared)
+    def compacted(self) -> "GraphView":
+        """A mesma versão com o overlay aplicado: linhas intocadas compartilhadas, as demais refeitas."""
+        if not self.has_overlay(): return self
+        rows, nodes = dict(self._rows), self.nodes
+        for a in self._cleared.union(self._patch):
+            if a not in nodes:
+                rows.pop(a, None)
+                continue
+            row = {} if a in self._cleared else {c: dict(r) for c, r in self._rows.get(a, {}).items()}
+            for nb, w in self._patch.get(a, {}).items():
+                for r in row.values(): r.pop(nb, None)
+                if w is not None: row.setdefault(nodes[nb].categoria, {})[nb] = w
+            rows[a] = {c: r for c, r in row.items() if r}
+        return GraphView(self, nodes, rows, self._edges, self.floors, self.revision, self.generation)
+    # ---------- rascunho (escritor, sob GraphManager._lock) ----------
+    def draft(self) -> "GraphView":
+        """Próxima versão: linhas base compartilhadas, O(nós) de cópia, overlay sob demanda."""
+        d = GraphView(self, dict(self.nodes), self._rows, 0, dict(self.floors), None, self.generation + 1)
+        d._base_size, d._edges = self._base_size, self._edges
+        d._patch, d._cleared, d._patch_size = dict(self._patch), set(self._cleared), self._patch_size
+        d._owned = set()
+        return d
+    def _put(self, a: str, b: str, w: Optional[float]):
+        owned = self._owned
+        assert owned is not None  # só rascunhos escrevem
+        if a not in owned:
+            self._patch[a] = dict(self._patch.get(a, {}))
+            owned.add(a)
+        row = self._patch[a]
+        if b not in row: self._patch_size += 1
+        row[b] = w
+    def _clear_row(self, a: str):
+        """A linha de a passa a vir só do overlay, vazia."""
+        self._cleared.add(a)
+        self._patch_size -= len(self._patch.get(a, ()))
+        self._patch[a] = {}
+        assert self._owned is not None
+        self._owned.add(a)
+    def _upsert_items(self, batch: Sequence[Mapping[str, Any]], items: Sequence[Mapping[str, Any]]):
+        from infrastructure.graph_builder.partition import iter_upsert_edges
+        # item_id repetido: vale a última ocorrência, na posição dela
+        last = {it["item_id"]: k for k, it in enumerate(batch)}
+        batch = [it for k, it in enumerate(batch) if last[it["item_id"]] == k]
+        for it in batch:
+            if it["item_id"] in self.nodes: self._drop_edges(it["item_id"])
+            self._add_node(it)
+        # demais itens do catálogo; arestas antigas do lote já saíram, então toda aresta gerada é nova
+        in_batch = set(last)
+        combined = list(batch) + [o for o in items if o["item_id"] not in in_batch]
+        ids = [it["item_id"] for it in combined]
+        for xs, ys, ws in iter_upsert_edges(batch, combined[len(batch):]):
+            for a, b, w in zip(xs.tolist(), ys.tolist(), ws.tolist()):
+                self._put(ids[a], ids[b], w)
+                self._put(ids[b], ids[a], w)
+            self._edges += len(ws)
+    def _drop_edges(self, item_id: str):
+        # lápides nas linhas dos parceiros; a linha do próprio nó fica vazia
+        old = list(self.adjacent(item_id))
+        for nb in old: self._put(nb, item_id, None)
+        self._clear_row(item_id)
+        self._edges -= len(old)
+    def _remove_node(self, item_id: str):
+        # O(grau): arestas incidentes e o próprio nó; a linha base sai na compactação
+        self._drop_edges(item_id)
+        del self.nodes[item_id]
+        self.floors.pop(item_id, None)
+    def _overlay_full(self) -> bool:
+        return (self._patch_size > max(COMPACT_MIN, COMPACT_RATIO * self._base_size)
+                or len(self._cleared) > COMPACT_RATIO * len(self.nodes))
+    # --- primitivas usadas pela manutenção do grafo esparsificado (graph_builder.sparsify) ---
+    def _add_node(self, item: Mapping[str, Any]):
+        # o Item é o próprio objeto do catálogo (sem cópia)
+        self.nodes[item["item_id"]] = as_item(item)
+    def _set_edge(self, a: str, b: str, w: float):
+        if not self._has_edge(a, b): self._edges += 1
+        self._put(a, b, w)
+        self._put(b, a, w)
+    def _del_edge(self, a: str, b: str):
+        if self._has_edge(a, b): self._edges -= 1
+        self._put(a, b, None)
+        self._put(b, a, None)
+    def _as_stored(self, w: np.ndarray) -> np.ndarray:
+        return w
+
+class GraphManager:
+    _instance = None
+    @classmethod
+    def singleton(cls):
+        if not cls._instance:
+            # LOOKKG_GRAPH_BACKEND=dict (padrão; "networkx", o nome antigo, continua valendo) usa as
+            # linhas de dicts deste módulo; =csr, a adjacência compacta (csr_repo); =shared, a mesma
+            # adjacência em arquivos mapeados entre workers (shared_repo)
+            backend = os.environ.get("LOOKKG_GRAPH_BACKEND", "dict")
+            if backend == "csr":
+                from infrastructure.graph.csr_repo import CSRGraphManager
+                cls._instance = CSRGraphManager()
+            elif backend == "shared":
+                from infrastructure.graph.shared_repo import SharedGraphManager
+                cls._instance = SharedGraphManager()
+            else:
+                cls._instance = GraphManager()
+        return cls._instance
+    def __init__(self, workers: Optional[int]=None, shard_pairs: Optional[int]=None,
+                 top_k: Optional[int]=None, min_weight: Optional[float]=None):
+        from infrastructure.graph_builder.sparsify import SparsifyConfig
+        # rebuild paralelo (None => LOOKKG_GRAPH_WORKERS / LOOKKG_GRAPH_SHARD_PAIRS)
+        self.workers, self.shard_pairs = workers, shard_pairs
+        # escritas (rebuild/upsert/load) serializadas; leitores não travam (view())
+        self._lock = threading.RLock()
+        # "empty" | "rebuilding" | "ready" | "error"
+        self.status = "empty"
+        # pesos exatos (o backend csr quantiza); registrado no snapshot
+        self.weight_format = "float64"
+        # erro máximo do peso guardado em relação ao score (quantização)
+        self.weight_error = 0.0
+        # esparsificação (None => LOOKKG_GRAPH_TOPK / LOOKKG_GRAPH_MIN_WEIGHT)
+        self.sparsify = SparsifyConfig.from_env(top_k, min_weight)
+        self._view = GraphView(self, {}, {}, 0, {}, None, 0)
+    def view(self) -> GraphView:
+        """A versão publicada: imutável, para segurar durante uma requisição."""
+        return self._view
+    def __getattr__(self, name: str):
+        # leitura avulsa (has_node, partners, generation, nodes...) vai para a versão publicada
+        if name.startswith("_"): raise AttributeError(name)
+        return getattr(self._view, name)
+    def writing(self):
+        """Trava dos escritores, para quem precisa ler o catálogo e reconstruir sem perder escritas concorrentes."""
+        return self._lock
+    def _publish(self, view: GraphView) -> None:
+        if view._owned is not None and view._overlay_full():
+            view = view.compacted()
+        view._owned = None
+        self._view = view  # troca atômica: quem já segura a anterior não é afetado
+    @metrics.rebuild()
+    def rebuild(self, items: Sequence[Mapping[str, Any]], revision: Optional[int]=None):
+        from infrastructure.graph_builder.partition import CatalogPartition
+        from infrastructure.graph_builder.parallel import iter_task_results
+        from infrastructure.graph_builder.sparsify import Sparsifier
+        with self._lock:
+            # um grafo já pronto continua servindo durante o rebuild (a troca é no fim)
+            prev = self.status
+            if prev != "ready": self.status = "rebuilding"
+            try:
+                # só blocos de categorias compatíveis; cada par de assinaturas é pontuado uma vez
+                part = CatalogPartition(items)
+                ids = [it["item_id"] for it in items]
+                cats = [it.get("categoria") for it in items]
+                results = iter_task_results(part, self.workers, self.shard_pairs)
+                sp = None
+                if self.sparsify.enabled:
+                    sp = Sparsifier(part, ids, cats, self.sparsify)
+                    results = sp.filter(results)
+                xs, ys, ws = [np.empty(0, np.int64)], [np.empty(0, np.int64)], [np.empty(0, np.float64)]
+                for _, (x, y, w) in results:
+                    xs.append(x); ys.append(y); ws.append(w)
+                w = np.concatenate(ws)
+                rows = _rows_from_edges(ids, cats, np.concatenate(xs), np.concatenate(ys), w)
+                view = GraphView(self, {i: as_item(it) for i, it in zip(ids, items)}, rows, len(w),
+                                 sp.floors() if sp else {}, revision, self._view.generation + 1)
+            except BaseException:
+                self.status = prev if prev == "ready" else "error"
+                raise
+            self._publish(view)
+            self.status = "ready"
+            return {"nodes": view.number_of_nodes(), "edges": view.number_of_edges()}
+    @metrics.stage("graph.load_edges")
+    def load_edges(self, items: Sequence[Mapping[str, Any]], ids: List[str], edges: Tuple[np.ndarray,np.ndarray,np.ndarray],
+                   revision: Optional[int]=None):
+        """Monta as linhas base a partir de arestas prontas (snapshot), nós na ordem de ids."""
+        from infrastructure.graph_builder.sparsify import floors_from_edges
+        by_id = {it["item_id"]: it for it in items}
+        u, v, w = (np.asarray(a) for a in edges)
+        cats = [by_id[i].get("categoria") for i in ids]
+        rows = _rows_from_edges(ids, cats, u, v, w)
+        floors = floors_from_edges(ids, cats, u, v, w, self.sparsify.top_k) if self.sparsify.enabled else {}
+        with self._lock:
+            view = GraphView(self, {i: as_item(by_id[i]) for i in ids}, rows, len(w), floors, revision,
+                             self._view.generation + 1)
+            self._publish(view)
+            self.status = "ready"
+        return {"nodes": view.number_of_nodes(), "edges": view.number_of_edges()}
+    def export_edges(self):
+        """(generation, revision, ids, itens dos nós, (u, v, w)) — foto consistente para o snapshot."""
+        view = self._view
+        ids = list(view.nodes)
+        pos = {n: k for k, n in enumerate(ids)}
+        us, vs, ws = [np.empty(0, np.int32)], [np.empty(0, np.int32)], [np.empty(0, np.float64)]
+        for k, a in enumerate(ids):
+            adj = view.adjacent(a)
+            j = np.fromiter(map(pos.__getitem__, adj), dtype=np.int32, count=len(adj))
+            up = j > k  # cada aresta uma vez, do lado de menor posição
+            us.append(np.full(int(up.sum()), k, dtype=np.int32)); vs.append(j[up])
+            ws.append(np.fromiter(adj.values(), dtype=np.float64, count=len(adj))[up])
+        nodes = [view.nodes[n] for n in ids]
+        return view.generation, view.revision, ids, nodes, (np.concatenate(us), np.concatenate(vs), np.concatenate(ws))
+    def upsert_item(self, item: Mapping[str, Any], items: Sequence[Mapping[str, Any]]):
+        return self.upsert_items([item], items)
+    @metrics.stage("graph.upsert")
+    def upsert_items(self, batch: Sequence[Mapping[str, Any]], items: Sequence[Mapping[str, Any]]):
+        """
+        Aplica um lote de upserts num único delta do grafo. Resultado igual a
+        chamar upsert_item item a item: cada item novo é `a` em score_pair
+        contra o catálogo e, dentro do lote, o item posterior é `a`. O delta
+        vai num rascunho da versão atual; se falhar no meio, nada é publicado.
+        """
+        with self._lock:
+            if self._view.number_of_nodes()==0: return self.rebuild(items)
+            draft = self._view.draft()
+            if self.sparsify.enabled:
+                from infrastructure.graph_builder.sparsify import sparse_upsert
+                sparse_upsert(draft, batch, items, self.sparsify)
+            else:
+                draft._upsert_items(batch, items)
+            self._publish(draft)
+            return {"nodes": draft.number_of_nodes(), "edges": draft.number_of_edges()}
+    @metrics.stage("graph.remove")
+    def remove_items(self, item_ids: Iterable[str], items: Sequence[Mapping[str, Any]]):
+        """
+        Remove nós e arestas incidentes num único delta, sem rebuild (ids fora
+        do grafo são ignorados). `items` é o catálogo já sem eles: com top-K
+        esparso, quem desejava um removido é reabastecido a partir dele.
+        """
+        with self._lock:
+            draft = self._view.draft()
+            if self.sparsify.enabled:
+                from infrastructure.graph_builder.sparsify import sparse_remove
+                sparse_remove(draft, item_ids, items, self.sparsify)
+            else:
+                for i in dict.fromkeys(item_ids):
+                    if draft.has_node(i): draft._remove_node(i)
+            self._publish(draft)
+            return {"nodes": draft.number_of_nodes(), "edges": draft.number_of_edges()}
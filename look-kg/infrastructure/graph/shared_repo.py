@@ -0,0 +1,300 @@
+# infrastructure/graph/shared_repo.py
+"""
+Grafo compartilhado entre processos (workers do uvicorn) por arquivos mapeados em memória.
+
+Layout em LOOKKG_GRAPH_SHARED_DIR (padrão: graph.shared/ ao lado do catalog.db):
+  base-<id>/            CSR compactado do csr_repo: indptr.npy, indices.npy,
+                        weights.npy, abertos com np.load(mmap_mode="r") — só
+                        leitura, as páginas ficam uma vez no page cache para
+                        todos os workers — e items.json (tabela de itens)
+  v-<geração>-<id>.npz  uma versão: nome da base + overlay (linhas alteradas
+                        desde a compactação, itens alterados), pisos do top-K
+                        e meta (geração, revisão, pesos, parâmetros, regras)
+  CURRENT               nome da versão atual, trocado com os.replace
+  LOCK                  flock das escritas
+
+Leitura: view() confere CURRENT (um stat) no máximo a cada LOOKKG_GRAPH_POLL
+segundos (padrão 1.0) e, se mudou, monta a versão nova sobre a base mapeada e
+publica como no csr_repo (RCU: quem segura a versão anterior não é afetado).
+Leitores nunca esperam: se outra thread está trocando a versão, seguem com a
+atual.
+
+Escrita (em qualquer worker): sob o flock, recarrega a versão atual, aplica o
+delta num rascunho (mesmo código do CSRGraphManager) e grava a versão nova;
+overlay passando de COMPACT_RATIO (ou rebuild/load_edges) grava uma base
+nova. O worker que escreveu também passa a ler dos arquivos. rebuild e
+load_edges só anexam quando a versão atual já é da mesma revisão do catálogo
+com os mesmos itens: N workers subindo juntos fazem um rebuild só. Versões
+com outros pesos/parâmetros/regras são ignoradas (o warm_start refaz).
+
+Memória por worker: O(itens) — tabela de itens (o scoring lê os atributos),
+índice, categorias e overlay; a adjacência, O(arestas), é compartilhada.
+
+Ativado com LOOKKG_GRAPH_BACKEND=shared (pesos quantizados como no csr).
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from domain.entities import Item
+from infrastructure.graph import snapshot as graph_snapshot
+from infrastructure.graph.csr_repo import CSRGraphManager, CSRGraphView
+from infrastructure.graph_builder import rules_engine as re
+from infrastructure.observability import metrics
+from infrastructure.storage import catalog_repo
+from infrastructure.storage.item_store import as_item
+
+FORMAT = 1
+# versões mantidas em disco (e as bases que elas usam); o resto é apagado
+KEEP_VERSIONS = 4
+
+def _plain(it: Optional[Item]) -> Optional[Dict[str, Any]]:
+    # itens vão para o disco em JSON (e voltam internados por as_item)
+    return None if it is None else it.to_dict()
+
+
+def shared_dir() -> Path:
+    env = os.environ.get("LOOKKG_GRAPH_SHARED_DIR")
+    return Path(env) if env else catalog_repo.CATALOG_DB.with_name("graph.shared")
+
+
+class SharedGraphManager(CSRGraphManager):
+    def __init__(self, path: Optional[Path] = None, poll_interval: Optional[float] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path or shared_dir())
+        if poll_interval is None:
+            poll_interval = float(os.environ.get("LOOKKG_GRAPH_POLL", "1.0"))
+        self.poll_interval = poll_interval
+        self._last_poll = float("-inf")
+        self._current: Optional[Tuple[int, int, int]] = None  # stat de CURRENT já carregado
+        self._base: Tuple[Optional[str], Any] = (None, None)  # (nome, (csr, itens)) da base mapeada
+        self._base_name: Optional[str] = None  # base da versão publicada
+        # troca de versão (leitores tentam sem esperar; escritores seguram durante toda a escrita)
+        self._swap = threading.RLock()
+        self._flock_depth = 0
+        self._flock_file: Optional[IO[str]] = None
+
+    # ---------- leitura ----------
+    def view(self) -> CSRGraphView:
+        now = time.monotonic()
+        if now - self._last_poll >= self.poll_interval:
+            self._last_poll = now
+            if self._swap.acquire(blocking=False):
+                try:
+                    self._reload()
+                finally:
+                    self._swap.release()
+        return self._view
+
+    def _reload(self) -> bool:
+        """Publica a versão apontada por CURRENT se ela mudou desde a última carga."""
+        try:
+            st = os.stat(self.path / "CURRENT")
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if key == self._current:
+                return False
+            name = (self.path / "CURRENT").read_text(encoding="utf-8").strip()
+            with metrics.stage("graph.shared.load"):
+                loaded = self._load(name)
+        except (OSError, ValueError, KeyError):
+            return False  # versão apagada/trocada no meio da leitura: fica a atual, tenta de novo depois
+        self._current = key
+        if loaded is None:
+            return False
+        view, self._base_name = loaded
+        self._view = view
+        self.status = "ready"
+        return True
+
+    def _compatible(self, meta: Dict[str, Any]) -> bool:
+        return (meta.get("format") == FORMAT and meta.get("weights") == self.weight_format
+                and meta.get("params") == self.sparsify.params() and meta.get("rules") == re.rules_fingerprint())
+
+    def _load(self, name: str) -> Optional[Tuple[CSRGraphView, str]]:
+        with np.load(self.path / name, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            if not self._compatible(meta):
+                return None
+            pi, pj, pq, dead = z["patch_i"].tolist(), z["patch_j"].tolist(), z["patch_q"].tolist(), z["patch_dead"]
+            dead = dead.tolist()
+            replaced = set(z["replaced"].tolist())
+            changed = json.loads(str(z["items"]))
+            floors = json.loads(str(z["floors"]))
+        csr, base_items = self._map_base(meta["base"])
+        items: List[Optional[Item]] = list(base_items)
+        items.extend([None] * (meta["n_items"] - len(items)))
+        for k, it in changed.items():
+            items[int(k)] = None if it is None else as_item(it)
+        patch: Dict[int, Dict[int, Any]] = {}
+        for i, j, q, d in zip(pi, pj, pq, dead):
+            patch.setdefault(i, {})[j] = None if d else q
+        floors = {a: {c: tuple(f) for c, f in fl} for a, fl in floors.items()}
+        view = CSRGraphView.from_parts(self, items, csr, patch, replaced, meta["edges"], floors,
+                                       meta["revision"], meta["generation"])
+        return view, meta["base"]
+
+    def _map_base(self, name: str):
+        if self._base[0] != name:
+            d = self.path / name
+            indptr, indices, weights = (np.load(d / f, mmap_mode="r") for f in ("indptr.npy", "indices.npy", "weights.npy"))
+            items = [None if it is None else as_item(it)
+                     for it in json.loads((d / "items.json").read_text(encoding="utf-8"))]
+            # só a base atual fica referenciada aqui; versões antigas seguram a sua enquanto alguém as usa
+            self._base = (name, ((indptr, indices, weights, len(items)), items))
+        return self._base[1]
+
+    # ---------- escrita ----------
+    @contextmanager
+    def _flock(self) -> Iterator[None]:
+        # reentrante: rebuild pode ser chamado de dentro de upsert_items (grafo vazio)
+        if self._flock_depth == 0:
+            self.path.mkdir(parents=True, exist_ok=True)
+            f = open(self.path / "LOCK", "a+")
+            try:
+                with metrics.stage("graph.shared.lock_wait"):
+                    fcntl.flock(f, fcntl.LOCK_EX)
+            except BaseException:
+                f.close()  # sem o lock (ex.: interrompido na espera): não sobra handle aberto
+                raise
+            self._flock_file = f
+        self._flock_depth += 1
+        try:
+            yield
+        finally:
+            self._flock_depth -= 1
+            if self._flock_depth == 0 and self._flock_file is not None:
+                fcntl.flock(self._flock_file, fcntl.LOCK_UN)
+                self._flock_file.close()
+                self._flock_file = None
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Escrita exclusiva entre threads e processos, a partir da versão mais nova em disco."""
+        with self._lock, self._swap, self._flock():
+            self._reload()
+            yield
+
+    def writing(self):
+        # também entre processos: um rebuild lê o catálogo já com o LOCK do diretório
+        return self._writing()
+
+    def _matches(self, items: Sequence[Mapping[str, Any]], revision: Optional[int]) -> bool:
+        """A versão publicada já é o grafo desta revisão do catálogo, com estes itens?"""
+        view = self._view
+        if self.status != "ready" or revision is None or view.revision != revision:
+            return False
+        by_id = {it["item_id"]: it for it in items}
+        live = [it for it in view.items if it is not None]
+        if len(live) != len(by_id) or any(it["item_id"] not in by_id for it in live):
+            return False
+        return graph_snapshot.items_digest(live) == graph_snapshot.items_digest([by_id[it["item_id"]] for it in live])
+
+    def _attached(self) -> Dict[str, int]:
+        return {"nodes": self._view.number_of_nodes(), "edges": self._view.number_of_edges()}
+
+    def rebuild(self, items: Sequence[Mapping[str, Any]], revision: Optional[int] = None):
+        with self._writing():
+            if self._matches(items, revision):
+                return self._attached()
+            return super().rebuild(items, revision)
+
+    def load_edges(self, items: Sequence[Mapping[str, Any]], ids: List[str], edges, revision: Optional[int] = None):
+        with self._writing():
+            if self._matches(items, revision):
+                return self._attached()
+            return super().load_edges(items, ids, edges, revision)
+
+    def upsert_items(self, batch: Sequence[Mapping[str, Any]], items: Sequence[Mapping[str, Any]]):
+        with self._writing():
+            return super().upsert_items(batch, items)
+
+    def remove_items(self, item_ids, items: Sequence[Mapping[str, Any]]):
+        with self._writing():
+            return super().remove_items(item_ids, items)
+
+    def _publish(self, view: CSRGraphView) -> None:
+        # chamado pelo CSRGraphManager dentro de _writing(): grava e passa a ler do disco
+        base_name = self._base_name
+        base = self._base[1] if base_name is not None and self._base[0] == base_name else None
+        if base_name is None or base is None or view._csr is not base[0] or view._overlay_full():
+            view = view.compacted()
+            base_name = self._write_base(view)
+            base_items: List[Optional[Item]] = view.items
+        else:
+            base_items = base[1]
+        with metrics.stage("graph.shared.write"):
+            name = self._write_version(view, base_name, base_items)
+        self._replace(self.path / "CURRENT", name.encode("utf-8"))
+        if not self._reload():
+            raise RuntimeError(f"versão recém-gravada do grafo não carregou: {name}")
+        self._gc()
+
+    @staticmethod
+    def _replace(path: Path, data: bytes) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _write_base(self, view: CSRGraphView) -> str:
+        name = f"base-{uuid.uuid4().hex[:12]}"
+        tmp = self.path / (name + ".tmp")
+        tmp.mkdir(parents=True)
+        indptr, indices, weights, _ = view._csr
+        np.save(tmp / "indptr.npy", np.asarray(indptr))
+        np.save(tmp / "indices.npy", np.asarray(indices))
+        np.save(tmp / "weights.npy", np.asarray(weights))
+        (tmp / "items.json").write_text(json.dumps([_plain(it) for it in view.items], ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path / name)
+        return name
+
+    def _write_version(self, view: CSRGraphView, base_name: str, base_items: List[Optional[Item]]) -> str:
+        n_base = len(base_items)
+        # itens que não são os mesmos objetos da base: alterados, removidos (None) ou novos
+        changed = {str(k): _plain(it) for k, it in enumerate(view.items) if k >= n_base or it is not base_items[k]}
+        cells = [(i, j, q) for i, row in view._patch.items() for j, q in row.items()]
+        meta = {"format": FORMAT, "base": base_name, "generation": view.generation, "revision": view.revision,
+                "n_items": len(view.items), "edges": view._edges, "weights": self.weight_format,
+                "params": self.sparsify.params(), "rules": re.rules_fingerprint()}
+        floors = {a: list(fl.items()) for a, fl in view.floors.items()}
+        name = f"v-{view.generation:010d}-{uuid.uuid4().hex[:8]}.npz"
+        tmp = self.path / (name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)),
+                     items=np.array(json.dumps(changed, ensure_ascii=False)),
+                     floors=np.array(json.dumps(floors, ensure_ascii=False)),
+                     patch_i=np.array([c[0] for c in cells], dtype=np.int32),
+                     patch_j=np.array([c[1] for c in cells], dtype=np.int32),
+                     patch_q=np.array([0 if c[2] is None else c[2] for c in cells], dtype=self._qtype),
+                     patch_dead=np.array([c[2] is None for c in cells], dtype=bool),
+                     replaced=np.array(sorted(view._replaced), dtype=np.int32))
+        os.replace(tmp, self.path / name)
+        return name
+
+    def _gc(self) -> None:
+        """Apaga versões antigas e bases sem versão; quem já mapeou segue lendo (o inode vive até o munmap)."""
+        versions = sorted(p for p in self.path.glob("v-*.npz"))
+        keep = versions[-KEEP_VERSIONS:]
+        for p in versions[:-KEEP_VERSIONS]:
+            p.unlink(missing_ok=True)
+        used = {self._base_name}
+        for p in keep:
+            try:
+                with np.load(p, allow_pickle=False) as z:
+                    used.add(json.loads(str(z["meta"]))["base"])
+            except (OSError, ValueError, KeyError):
+                pass
+        for d in self.path.glob("base-*"):
+            if d.name not in used:
+                shutil.rmtree(d, ignore_errors=True)
@@ -0,0 +1,106 @@
+# infrastructure/graph/snapshot.py
+"""
+Snapshot do grafo em disco, para subir a API sem o rebuild O(n²).
+
+Formato: um .npz sem compressão (abre em milissegundos, sem pickle) com
+  ids   item_id de cada nó, na ordem dos nós do grafo
+  u, v  índices (int32) das pontas de cada aresta
+  w     peso (float64 = valor exato de score_pair; uint8/float16 quando
+        vem do backend csr, já quantizado)
+  meta  JSON: formato, revisão do catálogo, fingerprint das regras, dtype
+        dos pesos, parâmetros de construção (esparsificação) e digest dos
+        itens usados no grafo
+
+O snapshot só é aceito se formato, dtype dos pesos, parâmetros, fingerprint das
+regras (rules_engine), revisão do catálogo e digest dos itens atuais baterem; caso contrário quem
+chama faz o rebuild. Gravação atômica (arquivo temporário + os.replace).
+
+Caminho: LOOKKG_GRAPH_SNAPSHOT ou graph.snapshot.npz ao lado do catalog.db.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from infrastructure.graph_builder import rules_engine as re
+from infrastructure.storage import catalog_repo
+
+FORMAT = 1
+
+Item = Mapping[str, Any]  # domain.entities.Item ou um dict com os mesmos campos
+Edges = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def snapshot_path() -> Path:
+    env = os.environ.get("LOOKKG_GRAPH_SNAPSHOT")
+    return Path(env) if env else catalog_repo.CATALOG_DB.with_name("graph.snapshot.npz")
+
+
+def items_digest(items: Sequence[Item]) -> str:
+    """Hash do conteúdo dos itens (colunas do catálogo), na ordem dada."""
+    h = hashlib.sha256()
+    for it in items:
+        h.update(json.dumps([it.get(c) for c in catalog_repo._COLUMNS], ensure_ascii=False).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()[:32]
+
+
+def save(ids: List[str], edges: Edges, revision: int, digest: str, params: Optional[Dict[str, Any]] = None,
+         path: Optional[Path] = None) -> Path:
+    path = Path(path or snapshot_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    u, v, w = edges
+    w = np.asarray(w)
+    meta = {"format": FORMAT, "catalog_revision": int(revision), "rules": re.rules_fingerprint(),
+            "weights": str(w.dtype), "params": params or {}, "digest": digest, "nodes": len(ids), "edges": int(len(w))}
+    # temporário por processo: vários workers podem gravar o mesmo snapshot ao mesmo tempo
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), ids=np.array(ids, dtype=str),
+                 u=np.asarray(u, dtype=np.int32), v=np.asarray(v, dtype=np.int32), w=w)
+    os.replace(tmp, path)
+    return path
+
+
+def read_meta(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    path = Path(path or snapshot_path())
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            return json.loads(str(z["meta"]))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load(revision: int, items: Sequence[Item], weights: str = "float64",
+         params: Optional[Dict[str, Any]] = None, path: Optional[Path] = None) -> Optional[Tuple[List[str], Edges]]:
+    """
+    (ids, (u, v, w)) se o snapshot vale para estes itens nesta revisão, com
+    pesos no dtype `weights` e montado com os mesmos `params`; None se não
+    existe, está corrompido ou ficou velho.
+    """
+    path = Path(path or snapshot_path())
+    meta = read_meta(path)
+    if (not meta or meta.get("format") != FORMAT or meta.get("weights") != weights
+            or meta.get("params", {}) != (params or {})
+            or meta.get("rules") != re.rules_fingerprint()
+            or meta.get("catalog_revision") != revision or meta.get("nodes") != len(items)):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            ids = z["ids"].tolist()
+            u, v, w = z["u"], z["v"], z["w"]
+    except (OSError, ValueError, KeyError):
+        return None
+    by_id = {it["item_id"]: it for it in items}
+    if len(by_id) != len(ids) or any(i not in by_id for i in ids):
+        return None
+    if meta.get("digest") != items_digest([by_id[i] for i in ids]):
+        return None
+    return ids, (u, v, w)
@@ -0,0 +1,93 @@
+# infrastructure/graph_builder/parallel.py
+"""
+Rebuild paralelo: o espaço de pares (tarefas de CatalogPartition) é
+dividido em shards contíguos com quantidades parecidas de pares de itens e
+pontuado/expandido num ProcessPoolExecutor. Os resultados voltam na ordem
+das tarefas, então o grafo montado pelo processo pai é idêntico ao serial.
+
+Configuração (env ou argumentos do GraphManager):
+  LOOKKG_GRAPH_WORKERS      processos (padrão: os.cpu_count(); 1 = serial)
+  LOOKKG_GRAPH_SHARD_PAIRS  pares de itens por shard (padrão: automático)
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from infrastructure.graph_builder.partition import CatalogPartition, Task
+from infrastructure.graph_builder.scoring_kernel import BLOCK_PAIRS
+
+# Abaixo disso subir processos custa mais do que pontuar tudo aqui mesmo
+MIN_PARALLEL_PAIRS = 1 << 21
+# Shards por worker no modo automático (folga para balancear a fila)
+SHARDS_PER_WORKER = 4
+
+TaskResult = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def default_workers() -> int:
+    env = os.environ.get("LOOKKG_GRAPH_WORKERS")
+    return max(1, int(env)) if env else (os.cpu_count() or 1)
+
+
+def default_shard_pairs() -> Optional[int]:
+    env = os.environ.get("LOOKKG_GRAPH_SHARD_PAIRS")
+    return int(env) if env else None
+
+
+def make_shards(part: CatalogPartition, tasks: List[Task], shard_pairs: int) -> List[List[Task]]:
+    """Agrupa tarefas consecutivas até ~shard_pairs pares de itens por shard."""
+    shards: List[List[Task]] = []
+    cur: List[Task] = []
+    acc = 0
+    for t in tasks:
+        n = part.task_pairs(t)
+        if cur and acc + n > shard_pairs:
+            shards.append(cur)
+            cur, acc = [], 0
+        cur.append(t)
+        acc += n
+    if cur:
+        shards.append(cur)
+    return shards
+
+
+# ---- lado do worker: a partição chega uma vez pelo initializer ----
+_part: Optional[CatalogPartition] = None
+
+
+def _init_worker(part: CatalogPartition) -> None:
+    global _part
+    _part = part
+
+
+def _run_shard(tasks: List[Task]) -> List[TaskResult]:
+    assert _part is not None
+    return [_part.run_task(t) for t in tasks]
+
+
+def iter_task_results(part: CatalogPartition, workers: Optional[int] = None,
+                      shard_pairs: Optional[int] = None) -> Iterator[Tuple[Task, TaskResult]]:
+    """(tarefa, (x, y, score)) na ordem de part.tasks(), serial ou em paralelo."""
+    workers = workers or default_workers()
+    shard_pairs = shard_pairs or default_shard_pairs()
+    tasks = part.tasks(min(BLOCK_PAIRS, shard_pairs) if shard_pairs else BLOCK_PAIRS)
+    total = sum(part.task_pairs(t) for t in tasks)
+
+    if workers <= 1 or total < MIN_PARALLEL_PAIRS:
+        for t in tasks:
+            yield t, part.run_task(t)
+        return
+
+    shard_pairs = shard_pairs or max(1, -(-total // (workers * SHARDS_PER_WORKER)))
+    shards = make_shards(part, tasks, shard_pairs)
+    # spawn: o processo da API tem threads (uvicorn), fork não é seguro aqui
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=ctx,
+                             initializer=_init_worker, initargs=(part,)) as ex:
+        for shard, results in zip(shards, ex.map(_run_shard, shards)):
+            yield from zip(shard, results)
@@ -0,0 +1,135 @@
+# infrastructure/graph_builder/partition.py
+"""
+Particionamento do catálogo por categoria/papel para a geração de arestas.
+
+score_pair zera todo par da mesma categoria e todo par de papéis
+incompatíveis (saia x calca, sapato x sapato, ...). Em vez de pontuar esses
+pares e jogá-los fora, enumeramos só os blocos (categoria_a, categoria_b)
+que podem gerar aresta e, dentro de cada bloco, só as classes de
+assinatura (ver scoring_kernel.SignatureClasses).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from infrastructure.graph_builder import rules_engine as re
+from infrastructure.graph_builder.scoring_kernel import BLOCK_PAIRS, ScoringKernel, SignatureClasses
+
+Block = Tuple[Any, Any]
+# (bloco, primeira classe, última classe + 1) — fatia de linhas de um bloco
+Task = Tuple[int, int, int]
+
+
+def compatible_category_pairs(categories: Sequence[Any]) -> List[Block]:
+    """Pares (ca, cb) de categorias distintas (sem repetição) cujos papéis podem formar aresta."""
+    return [
+        (a, b)
+        for x, a in enumerate(categories)
+        for b in categories[x + 1:]
+        if not re._role_incompatible(a, b)
+    ]
+
+
+class CatalogPartition:
+    """Classes de assinatura agrupadas por categoria + blocos compatíveis."""
+
+    def __init__(self, items: Sequence[Mapping[str, Any]]):
+        self.classes = SignatureClasses(items)
+        self.kernel = ScoringKernel(self.classes.reps)
+        by_cat: Dict[Any, List[int]] = {}
+        for c, rep in enumerate(self.classes.reps):
+            by_cat.setdefault(rep.get("categoria"), []).append(c)
+        self.by_cat = {cat: np.asarray(cs, dtype=np.intp) for cat, cs in by_cat.items()}
+        self.blocks: List[Block] = compatible_category_pairs(list(self.by_cat))
+
+    def task_pairs(self, task: Task) -> int:
+        """Quantidade de pares de itens cobertos por uma tarefa."""
+        b, r0, r1 = task
+        ca, cb = self.blocks[b]
+        count = self.classes.count
+        return int(count[self.by_cat[ca][r0:r1]].sum()) * int(count[self.by_cat[cb]].sum())
+
+    def tasks(self, block_pairs: int = BLOCK_PAIRS) -> List[Task]:
+        """
+        Fatias de linhas de cada bloco com no máximo ~block_pairs pares
+        (contando tanto pares de classes quanto de itens; uma linha sempre cabe).
+        """
+        count = self.classes.count
+        out: List[Task] = []
+        for b, (ca, cb) in enumerate(self.blocks):
+            rows, cols = self.by_cat[ca], self.by_cat[cb]
+            per_row = max(len(cols), int(count[cols].sum()))
+            r0 = 0
+            while r0 < len(rows):
+                r1, acc = r0, 0
+                while r1 < len(rows) and (r1 == r0 or acc + per_row * count[rows[r1]] <= block_pairs):
+                    acc += per_row * int(count[rows[r1]])
+                    r1 += 1
+                out.append((b, r0, r1))
+                r0 = r1
+        return out
+
+    def score_task(self, task: Task) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Pontua uma fatia de bloco nos dois sentidos (score_pair não é simétrico)
+        e devolve (p, q, score(p,q), score(q,p)) só dos pares de classes com
+        algum sentido > 0.
+        """
+        b, r0, r1 = task
+        ca, cb = self.blocks[b]
+        rows, cols = self.by_cat[ca][r0:r1], self.by_cat[cb]
+        fwd = self.kernel.score_block(rows, cols)
+        bwd = self.kernel.score_block(cols, rows).T
+        ii, jj = np.nonzero((fwd > 0) | (bwd > 0))
+        return rows[ii], cols[jj], fwd[ii, jj], bwd[ii, jj]
+
+    def expand(self, p: np.ndarray, q: np.ndarray, fwd: np.ndarray, bwd: np.ndarray
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Expande pares de classes em arestas de itens (x, y, score) com x na
+        categoria da linha e y na da coluna. O score é o de score_pair(a, b)
+        com `a` o item que vem antes na lista original, como no laço i < j.
+        Ordem de saída: par de classes, depois membro de p, depois membro de q.
+        """
+        cls = self.classes
+        cp, cq = cls.count[p], cls.count[q]
+        sizes = cp * cq
+        total = int(sizes.sum())
+        k = np.repeat(np.arange(len(p)), sizes)
+        off = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        x = cls.order[cls.start[p][k] + off // cq[k]]
+        y = cls.order[cls.start[q][k] + off % cq[k]]
+        w = np.where(x < y, fwd[k], bwd[k])
+        keep = w > 0
+        return x[keep], y[keep], w[keep]
+
+    def run_task(self, task: Task) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.expand(*self.score_task(task))
+
+
+def iter_upsert_edges(batch: Sequence[Mapping[str, Any]], others: Sequence[Mapping[str, Any]],
+                      block_pairs: int = BLOCK_PAIRS) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Arestas de um lote de upserts, em blocos (a, b, score) com índices na
+    lista batch + others e score = score_pair(a, b) > 0, sempre com `a` no lote:
+    primeiro cada item do lote contra os demais (uma coluna por assinatura),
+    depois os pares dentro do lote com o item posterior como `a` — o mesmo
+    resultado de aplicar os upserts um a um.
+    """
+    classes = SignatureClasses(others)
+    B = len(batch)
+    kern = ScoringKernel(list(batch) + classes.reps)
+    cols = np.arange(B, B + len(classes))
+    step = max(1, block_pairs // max(1, len(classes)))
+    for r0 in range(0, B, step):
+        per_item = kern.score_block(np.arange(r0, min(r0 + step, B)), cols)[:, classes.of]
+        rr, kk = np.nonzero(per_item > 0)
+        yield rr + r0, kk + B, per_item[rr, kk]
+    step = max(1, block_pairs // max(1, B))
+    for r0 in range(1, B, step):
+        rows = np.arange(r0, min(r0 + step, B))
+        inner = kern.score_block(rows, np.arange(rows[-1]))
+        jj, ii = np.nonzero((inner > 0) & (np.arange(rows[-1])[None, :] < rows[:, None]))
+        yield rows[jj], ii, inner[jj, ii]
@@ -1,5 +1,11 @@
 # infrastructure/graph_builder/rules_engine.py
-from typing import Dict, Any, List, Tuple, Set
+import hashlib
+import json
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Tuple, Set
+
+from domain.entities import Item
 
 # ===================== Vocabulários rígidos =====================
 CATEGORIES = [
@@ -150,36 +156,84 @@ def normalize_item(it: Dict[str, Any]) -> Dict[str, Any]:
 
     return out
 
+# ===================== Motivos (rationale) =====================
+# O rationale sai como códigos compactos; REASONS é a tabela código -> texto
+# (GET /v1/recommend/reasons). Só acrescente no fim: clientes guardam os códigos.
+REASONS: Tuple[str, ...] = (
+    "mesma categoria", "papéis incompatíveis",
+    "cor: mesma cor", "cor: análogas", "cor: complementares", "cor: tríade", "cor: neutro", "cor: baixo contraste",
+    "estilo compatível", "estilo aceitável", "estilo distante",
+    "ocasião compatível", "ocasião aceitável", "ocasião distante",
+    "clima compatível", "clima aceitável", "clima distante",
+    "materiais neutros", "materiais coerentes",
+    "padrões colidem",
+)
+_R = {t: i for i, t in enumerate(REASONS)}.__getitem__
+R_SAME_CATEGORY, R_ROLES = _R("mesma categoria"), _R("papéis incompatíveis")
+R_COLOR_SAME, R_COLOR_ANALOG = _R("cor: mesma cor"), _R("cor: análogas")
+R_COLOR_COMPLEMENT, R_COLOR_TRIAD = _R("cor: complementares"), _R("cor: tríade")
+R_COLOR_NEUTRAL, R_COLOR_LOW = _R("cor: neutro"), _R("cor: baixo contraste")
+R_STYLE, R_OCCASION, R_CLIMATE = _R("estilo compatível"), _R("ocasião compatível"), _R("clima compatível")
+R_MAT_NEUTRAL, R_MAT_COHERENT = _R("materiais neutros"), _R("materiais coerentes")
+R_PATTERN_CLASH = _R("padrões colidem")
+
+def reason_texts(codes: List[int]) -> List[str]:
+    return [REASONS[c] for c in codes]
+
 # ===================== Scoring helpers =====================
-def _color_score(a: str, b: str) -> Tuple[float,str]:
-    if not a or not b: return 0.0,""
-    if a == b: return 0.6, "mesma cor"
-    if b in ANALOGAS.get(a,set()) or a in ANALOGAS.get(b,set()): return 0.45, "análogas"
-    if COMPLEMENTARES.get(a) == b or COMPLEMENTARES.get(b) == a: return 0.5, "complementares"
+# Caminho do score: só floats, sem strings nem listas (roda nos laços quentes).
+# Os *_reason montam o motivo do mesmo ramo, só para resultados devolvidos.
+_NO_ROW: Dict[str, float] = {}
+_NEUTRAL_COLORS = frozenset({"preto","branco","cinza","nude","bege","marrom"})
+_COLOR_VALUE = {None: 0.0, R_COLOR_SAME: 0.6, R_COLOR_ANALOG: 0.45, R_COLOR_COMPLEMENT: 0.5,
+                R_COLOR_TRIAD: 0.35, R_COLOR_NEUTRAL: 0.4, R_COLOR_LOW: 0.2}
+
+def _color_reason(a: str, b: str) -> Optional[int]:
+    if not a or not b: return None
+    if a == b: return R_COLOR_SAME
+    if b in ANALOGAS.get(a,()) or a in ANALOGAS.get(b,()): return R_COLOR_ANALOG
+    if COMPLEMENTARES.get(a) == b or COMPLEMENTARES.get(b) == a: return R_COLOR_COMPLEMENT
     for tri in TRIADES:
-        if a in tri and b in tri: return 0.35, "tríade"
-    if a in {"preto","branco","cinza","nude","bege","marrom"} or b in {"preto","branco","cinza","nude","bege","marrom"}:
-        return 0.4, "neutro"
-    return 0.2, "baixo contraste"
-
-def _matrix_score(x: str, y: str, mat: Dict[str,Dict[str,float]], label: str) -> Tuple[float,str]:
-    if not x or not y: return 0.0,""
-    val = mat.get(x,{}).get(y, 0.4)
-    txt = f"{label} compatível" if val>=0.7 else (f"{label} aceitável" if val>=0.5 else f"{label} distante")
-    return val*0.3, txt  # normaliza peso local (será reponderado no mix final)
-
-def _pattern_penalty(a: str, b: str) -> Tuple[float,str]:
-    if not a or not b: return 0.0,""
-    return PATTERN_MATRIX.get(a,{}).get(b,0.0), "padrões colidem" if PATTERN_MATRIX.get(a,{}).get(b,0.0) < 0 else ""
-
-def _material_score(a: str, b: str) -> Tuple[float,str]:
-    if not a or not b: return 0.05,"materiais neutros"
+        if a in tri and b in tri: return R_COLOR_TRIAD
+    if a in _NEUTRAL_COLORS or b in _NEUTRAL_COLORS:
+        return R_COLOR_NEUTRAL
+    return R_COLOR_LOW
+
+def _color_value(a: str, b: str) -> float:
+    return _COLOR_VALUE[_color_reason(a, b)]
+
+def _matrix_value(x: str, y: str, mat: Dict[str,Dict[str,float]]) -> float:
+    if not x or not y: return 0.0
+    return mat.get(x,_NO_ROW).get(y, 0.4)*0.3  # normaliza peso local (será reponderado no mix final)
+
+def _matrix_reason(x: str, y: str, mat: Dict[str,Dict[str,float]], base: int) -> Optional[int]:
+    # base = código do "compatível"; +1 aceitável, +2 distante
+    if not x or not y: return None
+    val = mat.get(x,_NO_ROW).get(y, 0.4)
+    return base if val>=0.7 else (base+1 if val>=0.5 else base+2)
+
+def _pattern_value(a: str, b: str) -> float:
+    if not a or not b: return 0.0
+    return PATTERN_MATRIX.get(a,_NO_ROW).get(b,0.0)
+
+def _pattern_reason(a: str, b: str) -> Optional[int]:
+    return R_PATTERN_CLASH if _pattern_value(a, b) < 0 else None
+
+def _material_group(m: Optional[str]):
+    # vazio => "materiais neutros" (sem grupo); desconhecido cai em "leve"
+    return MAT_GROUP.get(m,"leve") if m else None
+
+def _material_value(a: str, b: str) -> float:
+    if not a or not b: return 0.05
     ga, gb = MAT_GROUP.get(a,"leve"), MAT_GROUP.get(b,"leve")
-    val = MAT_MATRIX.get(ga,{}).get(gb,0.6)
-    return val*0.25, "materiais coerentes"
+    return MAT_MATRIX.get(ga,_NO_ROW).get(gb,0.6)*0.25
+
+def _material_reason(a: str, b: str) -> int:
+    return R_MAT_COHERENT if a and b else R_MAT_NEUTRAL
 
 # papéis incompatíveis para aresta (evita “saia x calça”, “sapato x sapato”, etc.)
-def _role_incompatible(cat_a: str, cat_b: str) -> bool:
+def _role_incompatible(cat_a: Optional[str], cat_b: Optional[str]) -> bool:
+    if cat_a is None or cat_b is None: return False
     ra, rb = ROLE.get(cat_a), ROLE.get(cat_b)
     if not ra or not rb: return False
     if ra == rb and ra in SINGLETON_ROLES: return True
@@ -187,36 +241,116 @@ def _role_incompatible(cat_a: str, cat_b: str) -> bool:
     return False
 
 # ===================== Score final =====================
-def score_pair(a: Dict[str,Any], b: Dict[str,Any]) -> Tuple[float,List[str]]:
-    if a.get("categoria") == b.get("categoria"): 
-        return 0.0, ["mesma categoria"]
-    if _role_incompatible(a.get("categoria"), b.get("categoria")):
-        return 0.0, ["papéis incompatíveis"]
-
-    s = 0.0; rat: List[str] = []
+# campos lidos pelo score, na ordem de SIGNATURE_KEYS
+_SCORE_KEYS = ("categoria","cor","estilo","ocasion","clima","material","padrao")
+_SCORE_ATTRS = attrgetter(*_SCORE_KEYS)
 
-    v,t = _color_score(a.get("cor"), b.get("cor")); s += v; rat.append(f"cor: {t}" if t else "")
-    v,t = _matrix_score(a.get("estilo"), b.get("estilo"), STYLE_MATRIX, "estilo"); s += v; rat.append(t if t else "")
-    v,t = _matrix_score(a.get("ocasion"), b.get("ocasion"), OCC_MATRIX, "ocasião"); s += v; rat.append(t if t else "")
-    v,t = _matrix_score(a.get("clima"), b.get("clima"), CLIMATE_MATRIX, "clima"); s += v; rat.append(t if t else "")
-    v,t = _material_score(a.get("material"), b.get("material")); s += v; rat.append(t if t else "")
-    v,t = _pattern_penalty(a.get("padrao"), b.get("padrao")); s += v; rat.append(t if t else "")
+def _score_fields(it: Mapping[str,Any]) -> Tuple:
+    if type(it) is Item:  # atributos direto (Item.get é chamada Python; aqui é caminho quente)
+        return _SCORE_ATTRS(it)
+    return (it.get("categoria"), it.get("cor"), it.get("estilo"), it.get("ocasion"),
+            it.get("clima"), it.get("material"), it.get("padrao"))
 
+def pair_score(a: Mapping[str,Any], b: Mapping[str,Any]) -> float:
+    """Só o score de score_pair(a, b), sem montar o rationale."""
+    ca, cor_a, est_a, occ_a, cli_a, mat_a, pad_a = _score_fields(a)
+    cb, cor_b, est_b, occ_b, cli_b, mat_b, pad_b = _score_fields(b)
+    if ca == cb or _role_incompatible(ca, cb):
+        return 0.0
     # pesos finais — já normalizados nos helpers (~ somar ~1.0); clamp
-    rat = [x for x in rat if x]
-    s = max(0.0, min(1.0, s))
-    return s, rat
-
-def score_bottleneck(ctx: List[Dict[str,Any]], cand: Dict[str,Any]) -> Tuple[float,List[str]]:
-    if not ctx: return 0.0,[]
-    vals: List[float] = []; rats: List[str] = []
-    for it in ctx:
-        v, r = score_pair(it, cand)
-        vals.append(v); rats += r
-    return (min(vals) if vals else 0.0), list(dict.fromkeys(rats))
-
-def constraint_multiplier(c: Dict[str,str], cons: Dict[str,str]) -> float:
+    s = (0.0 + _color_value(cor_a, cor_b)
+         + _matrix_value(est_a, est_b, STYLE_MATRIX)
+         + _matrix_value(occ_a, occ_b, OCC_MATRIX)
+         + _matrix_value(cli_a, cli_b, CLIMATE_MATRIX)
+         + _material_value(mat_a, mat_b)
+         + _pattern_value(pad_a, pad_b))
+    return max(0.0, min(1.0, s))
+
+def pair_reasons(a: Mapping[str,Any], b: Mapping[str,Any]) -> List[int]:
+    """Códigos (REASONS) do rationale de score_pair(a, b), na ordem dos helpers."""
+    ca, cor_a, est_a, occ_a, cli_a, mat_a, pad_a = _score_fields(a)
+    cb, cor_b, est_b, occ_b, cli_b, mat_b, pad_b = _score_fields(b)
+    if ca == cb:
+        return [R_SAME_CATEGORY]
+    if _role_incompatible(ca, cb):
+        return [R_ROLES]
+    codes = (_color_reason(cor_a, cor_b),
+             _matrix_reason(est_a, est_b, STYLE_MATRIX, R_STYLE),
+             _matrix_reason(occ_a, occ_b, OCC_MATRIX, R_OCCASION),
+             _matrix_reason(cli_a, cli_b, CLIMATE_MATRIX, R_CLIMATE),
+             _material_reason(mat_a, mat_b),
+             _pattern_reason(pad_a, pad_b))
+    return [c for c in codes if c is not None]
+
+def bottleneck_score(ctx: Sequence[Mapping[str,Any]], cand: Mapping[str,Any]) -> float:
+    return min((pair_score(it, cand) for it in ctx), default=0.0)
+
+def bottleneck_reasons(ctx: Sequence[Mapping[str,Any]], cand: Mapping[str,Any]) -> List[int]:
+    return list(dict.fromkeys(c for it in ctx for c in pair_reasons(it, cand)))
+
+# score + textos, numa chamada (explicações; fora dos laços quentes)
+def score_pair(a: Mapping[str,Any], b: Mapping[str,Any]) -> Tuple[float,List[str]]:
+    return pair_score(a, b), reason_texts(pair_reasons(a, b))
+
+def score_bottleneck(ctx: Sequence[Mapping[str,Any]], cand: Mapping[str,Any]) -> Tuple[float,List[str]]:
+    return bottleneck_score(ctx, cand), reason_texts(bottleneck_reasons(ctx, cand))
+
+# ===================== Cotas superiores =====================
+# Maior score_pair(a, b) possível para qualquer b da categoria cat_b, só pelas
+# tabelas (cada helper no seu máximo). Usada para podar candidatos no top-K.
+def pair_upper_bound(a: Mapping[str,Any], cat_b: Optional[str]) -> float:
+    if a.get("categoria") == cat_b or _role_incompatible(a.get("categoria"), cat_b):
+        return 0.0
+    s = 0.6 if a.get("cor") else 0.0  # "mesma cor" é o máximo de _color_value
+    for key, mat in (("estilo", STYLE_MATRIX), ("ocasion", OCC_MATRIX), ("clima", CLIMATE_MATRIX)):
+        x = a.get(key)
+        if x: s += 0.3 * max(list(mat.get(x, {}).values()) + [0.4])
+    m = a.get("material")
+    s += max(0.25 * max(list(MAT_MATRIX.get(_material_group(m), {}).values()) + [0.6]), 0.05) if m else 0.05
+    p = a.get("padrao")
+    if p: s += max(list(PATTERN_MATRIX.get(p, {}).values()) + [0.0])
+    return max(0.0, min(1.0, s))
+
+# ===================== Assinatura de atributos =====================
+# score_pair só olha estes atributos (material via grupo); itens com a mesma
+# assinatura são intercambiáveis para scoring — nunca dependem de item_id/nome.
+SIGNATURE_KEYS = _SCORE_KEYS
+
+def signature(it: Mapping[str,Any]) -> Tuple:
+    cat, cor, estilo, ocasion, clima, material, padrao = _score_fields(it)
+    return (cat, cor, estilo, ocasion, clima, _material_group(material), padrao)
+
+def constraint_multiplier(c: Mapping[str,Any], cons: Dict[str,str]) -> float:
     mul = 1.0
     if cons.get("ocasion") and c.get("ocasion")==cons["ocasion"]: mul *= 1.05
     if cons.get("clima") and c.get("clima")==cons["clima"]:     mul *= 1.05
     return mul
+
+# ===================== Assimetria =====================
+# score_pair(a,b) != score_pair(b,a) só pelas matrizes (linha = a); cor, papéis
+# e o clamp final são simétricos. Quem lê pesos já gravados no grafo (que
+# guardam um dos sentidos) usa esta cota como margem de erro.
+def _matrix_asymmetry(mat: Dict[str,Dict[str,float]], default: float) -> float:
+    keys = set(mat) | {y for row in mat.values() for y in row}
+    return max((abs(mat.get(x,{}).get(y,default) - mat.get(y,{}).get(x,default)) for x in keys for y in keys), default=0.0)
+
+@lru_cache(maxsize=None)
+def asymmetry_bound() -> float:
+    return (0.3 * (_matrix_asymmetry(STYLE_MATRIX, 0.4) + _matrix_asymmetry(OCC_MATRIX, 0.4)
+                   + _matrix_asymmetry(CLIMATE_MATRIX, 0.4))
+            + 0.25 * _matrix_asymmetry(MAT_MATRIX, 0.6) + _matrix_asymmetry(PATTERN_MATRIX, 0.0))
+
+# ===================== Fingerprint das regras =====================
+# Suba RULES_VERSION ao mudar a *lógica* dos helpers de score (as tabelas já
+# entram no hash). Snapshots de grafo gravados com outro fingerprint são descartados.
+RULES_VERSION = 1
+
+def rules_fingerprint() -> str:
+    tables = {
+        "version": RULES_VERSION, "role": ROLE, "singleton_roles": SINGLETON_ROLES,
+        "analogas": ANALOGAS, "complementares": COMPLEMENTARES, "triades": TRIADES,
+        "style": STYLE_MATRIX, "occ": OCC_MATRIX, "climate": CLIMATE_MATRIX,
+        "mat_group": MAT_GROUP, "mat": MAT_MATRIX, "pattern": PATTERN_MATRIX,
+    }
+    blob = json.dumps(tables, sort_keys=True, default=sorted)  # sets -> listas ordenadas
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
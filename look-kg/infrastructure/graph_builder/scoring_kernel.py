@@ -0,0 +1,234 @@
+# infrastructure/graph_builder/scoring_kernel.py
+"""
+Kernel vetorizado (NumPy) equivalente a rules_engine.score_pair.
+
+Cada atributo categórico (categoria, cor, estilo, ocasion, clima, grupo de
+material, padrao) vira um código inteiro e as regras do rules_engine são
+compiladas em tabelas densas [código_a, código_b]. Um bloco de pares é então
+pontuado só com indexação de arrays.
+
+As tabelas são preenchidas chamando os próprios helpers do rules_engine para
+cada combinação de valores, e as parcelas são somadas na mesma ordem de
+score_pair — por isso o resultado é bit a bit igual ao da versão escalar,
+inclusive para valores fora do vocabulário (itens legados não normalizados).
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from infrastructure.graph_builder import rules_engine as re
+from infrastructure.storage.item_store import ItemStore
+
+# Orçamento de células por bloco (linhas x colunas) ao varrer o triângulo superior
+BLOCK_PAIRS = 1 << 22
+
+
+class SignatureClasses:
+    """
+    Agrupa itens por rules_engine.signature: cada classe é pontuada uma vez
+    (pelo seu representante) e os pares de itens são expandidos dela.
+    Os membros ficam em formato CSR: order[start[c]:start[c+1]] são as
+    posições (crescentes) dos itens da classe c.
+    """
+
+    def __init__(self, items: Sequence[Mapping[str, Any]]):
+        self.reps: List[Mapping[str, Any]]
+        if isinstance(items, ItemStore):
+            self.of, self.reps = self._from_store(items)
+        else:
+            index: Dict[Tuple, int] = {}
+            reps: List[Mapping[str, Any]] = []
+            of = []
+            for it in items:
+                sig = re.signature(it)
+                c = index.get(sig)
+                if c is None:
+                    c = index[sig] = len(reps)
+                    reps.append(it)
+                of.append(c)
+            self.of, self.reps = np.asarray(of, dtype=np.intp), reps  # posição do item -> classe
+        self.count = np.bincount(self.of, minlength=len(self.reps)).astype(np.intp)
+        self.start = np.concatenate(([0], np.cumsum(self.count))).astype(np.intp)
+        self.order = np.argsort(self.of, kind="stable").astype(np.intp)
+
+    def __len__(self) -> int:
+        return len(self.reps)
+
+    @staticmethod
+    def _from_store(store: ItemStore) -> Tuple[np.ndarray, List[Mapping[str, Any]]]:
+        """As mesmas classes (numeradas por primeira ocorrência) a partir das colunas de códigos."""
+        if not len(store):
+            return np.zeros(0, dtype=np.intp), []
+        mat = store.column("material")
+        groups: Dict[Any, int] = {}
+        vals = store.vocab("material").values
+        mat_group = np.array([groups.setdefault(re._material_group(m), len(groups))
+                              for m in vals[:int(mat.max()) + 1]], dtype=np.int32)
+        cols = [store.column(k) for k in ("categoria", "cor", "estilo", "ocasion", "clima", "padrao")]
+        keys = np.stack(cols + [mat_group[mat]], axis=1)
+        _, first, inv = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        rank = np.empty(len(first), dtype=np.intp)
+        order = np.argsort(first, kind="stable")
+        rank[order] = np.arange(len(first))
+        return rank[inv.reshape(-1)], [store[int(k)] for k in first[order]]
+
+
+class _Vocab:
+    """Mapa valor -> código inteiro, com o vocabulário rígido primeiro."""
+
+    def __init__(self, base: Sequence[Any] = ()):
+        self.values: List[Any] = []
+        self.codes: Dict[Any, int] = {}
+        self.code(None)
+        for v in base:
+            self.code(v)
+
+    def code(self, v: Any) -> int:
+        c = self.codes.get(v)
+        if c is None:
+            c = self.codes[v] = len(self.values)
+            self.values.append(v)
+        return c
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def _table(values: Sequence[Any], fn: Callable[[Any, Any], float]) -> np.ndarray:
+    n = len(values)
+    out = np.empty((n, n), dtype=np.float64)
+    for i, a in enumerate(values):
+        for j, b in enumerate(values):
+            out[i, j] = fn(a, b)
+    return out
+
+
+class ScoringKernel:
+    """
+    Codifica uma lista de itens (de um ItemStore, usa as colunas de códigos
+    prontas) e pontua blocos de pares de uma vez.
+
+    Os índices usados em score_block/score_pairs são posições na lista
+    passada ao construtor; o primeiro argumento faz o papel de `a` em
+    score_pair(a, b) (as matrizes de estilo/ocasião não são simétricas).
+    """
+
+    def __init__(self, items: Sequence[Mapping[str, Any]]):
+        self.n = len(items)
+        # material entra pelo grupo; guardamos um material representante de cada grupo
+        self._v_mat = _Vocab(sorted(set(re.MAT_GROUP.values())))
+        mat_rep: Dict[Optional[str], Any] = {g: m for m, g in reversed(list(re.MAT_GROUP.items()))}
+        mat_rep[None] = None
+        if isinstance(items, ItemStore):
+            self._from_store(items, mat_rep)
+        else:
+            self._encode(items, mat_rep)
+        self._compile(mat_rep)
+
+    def _encode(self, items: Sequence[Mapping[str, Any]], mat_rep: Dict[Optional[str], Any]) -> None:
+        self._v_cat = _Vocab(re.CATEGORIES)
+        self._v_cor = _Vocab(re.COLORS)
+        self._v_estilo = _Vocab(re.STYLES)
+        self._v_ocasion = _Vocab(re.OCCASIONS)
+        self._v_clima = _Vocab(re.CLIMES)
+        self._v_padrao = _Vocab(re.PATTERNS)
+
+        def encode(vocab: _Vocab, key: str) -> np.ndarray:
+            return np.fromiter((vocab.code(it.get(key)) for it in items), dtype=np.int32, count=self.n)
+
+        self.categoria = encode(self._v_cat, "categoria")
+        self.cor = encode(self._v_cor, "cor")
+        self.estilo = encode(self._v_estilo, "estilo")
+        self.ocasion = encode(self._v_ocasion, "ocasion")
+        self.clima = encode(self._v_clima, "clima")
+        self.padrao = encode(self._v_padrao, "padrao")
+        mats = []
+        for it in items:
+            m = it.get("material")
+            g = re._material_group(m)
+            mat_rep.setdefault(g, m)
+            mats.append(self._v_mat.code(g))
+        self.material = np.asarray(mats, dtype=np.int32)
+
+    def _from_store(self, store: ItemStore, mat_rep: Dict[Optional[str], Any]) -> None:
+        """Colunas do ItemStore direto, sem ler os itens: os códigos são os dos vocabulários do processo."""
+        def column(key: str) -> Tuple[np.ndarray, _Vocab]:
+            col = store.column(key)  # antes do vocabulário: todo código da coluna já está nele
+            return col, _Vocab(store.vocab(key).values[1:])  # None = 0 nos dois
+
+        self.categoria, self._v_cat = column("categoria")
+        self.cor, self._v_cor = column("cor")
+        self.estilo, self._v_estilo = column("estilo")
+        self.ocasion, self._v_ocasion = column("ocasion")
+        self.clima, self._v_clima = column("clima")
+        self.padrao, self._v_padrao = column("padrao")
+        mat, v_mat = column("material")
+        groups = []
+        for m in v_mat.values:
+            g = re._material_group(m)
+            mat_rep.setdefault(g, m)
+            groups.append(self._v_mat.code(g))
+        self.material = np.asarray(groups, dtype=np.int32)[mat]
+
+    def _compile(self, mat_rep: Dict[Optional[str], Any]) -> None:
+        # ---- tabelas compiladas a partir das regras ----
+        cats = self._v_cat.values
+        n_cat = len(cats)
+        self.t_blocked = np.zeros((n_cat, n_cat), dtype=bool)
+        for i, a in enumerate(cats):
+            for j, b in enumerate(cats):
+                self.t_blocked[i, j] = a == b or re._role_incompatible(a, b)
+        self.t_cor = _table(self._v_cor.values, re._color_value)
+        self.t_estilo = _table(self._v_estilo.values,
+                               lambda a, b: re._matrix_value(a, b, re.STYLE_MATRIX))
+        self.t_ocasion = _table(self._v_ocasion.values,
+                                lambda a, b: re._matrix_value(a, b, re.OCC_MATRIX))
+        self.t_clima = _table(self._v_clima.values,
+                              lambda a, b: re._matrix_value(a, b, re.CLIMATE_MATRIX))
+        self.t_material = _table([mat_rep.get(g) for g in self._v_mat.values],
+                                 re._material_value)
+        self.t_padrao = _table(self._v_padrao.values, re._pattern_value)
+
+    # ---------------- scoring ----------------
+    def score_pairs(self, a_idx: np.ndarray, b_idx: np.ndarray) -> np.ndarray:
+        """Scores de pares (a_idx[k], b_idx[k]); aceita arrays de mesmo shape (ou broadcast)."""
+        a_idx = np.asarray(a_idx, dtype=np.intp)
+        b_idx = np.asarray(b_idx, dtype=np.intp)
+        # mesma ordem de soma de score_pair: cor, estilo, ocasião, clima, material, padrão
+        s = self.t_cor[self.cor[a_idx], self.cor[b_idx]]
+        s = s + self.t_estilo[self.estilo[a_idx], self.estilo[b_idx]]
+        s = s + self.t_ocasion[self.ocasion[a_idx], self.ocasion[b_idx]]
+        s = s + self.t_clima[self.clima[a_idx], self.clima[b_idx]]
+        s = s + self.t_material[self.material[a_idx], self.material[b_idx]]
+        s = s + self.t_padrao[self.padrao[a_idx], self.padrao[b_idx]]
+        np.clip(s, 0.0, 1.0, out=s)
+        s[self.t_blocked[self.categoria[a_idx], self.categoria[b_idx]]] = 0.0
+        return s
+
+    def score_block(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Matriz len(rows) x len(cols) com score_pair(items[r], items[c])."""
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        return self.score_pairs(rows[:, None], cols[None, :])
+
+    def iter_upper_edges(self, block_pairs: int = BLOCK_PAIRS
+                         ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Varre o triângulo superior (i < j) em blocos de linhas e devolve
+        (i, j, score) apenas dos pares com score > 0, em ordem linha-maior
+        (a mesma do laço duplo original).
+        """
+        n = self.n
+        if n < 2:
+            return
+        step = max(1, block_pairs // n)
+        for r0 in range(0, n - 1, step):
+            r1 = min(r0 + step, n - 1)
+            rows = np.arange(r0, r1)
+            cols = np.arange(r0 + 1, n)
+            sc = self.score_block(rows, cols)
+            keep = (sc > 0) & (cols[None, :] > rows[:, None])
+            ii, jj = np.nonzero(keep)
+            yield rows[ii], cols[jj], sc[ii, jj]
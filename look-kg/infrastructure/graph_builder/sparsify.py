@@ -0,0 +1,356 @@
+# infrastructure/graph_builder/sparsify.py
+"""
+Grafo esparsificado: cada nó mantém só os K parceiros mais fortes por
+categoria-alvo e nenhuma aresta abaixo de um peso mínimo.
+
+A aresta (a, b) fica no grafo se b está no top-K de a para a categoria de b
+("a quer b") ou vice-versa — no máximo 2·K·categorias arestas por nó, O(n·K)
+no total. Ordem do top-K: peso armazenado decrescente, desempate por item_id.
+
+Configuração (env ou argumentos do GraphManager):
+  LOOKKG_GRAPH_TOPK        K por (nó, categoria-alvo); 0/vazio = sem limite
+  LOOKKG_GRAPH_MIN_WEIGHT  peso mínimo de aresta (padrão 0: todo score > 0)
+
+Manutenção incremental: os K desejados de a numa categoria são exatamente os
+K melhores vizinhos de a nela (um vizinho melhor que o K-ésimo seria
+desejado também). Então basta guardar, por nó e categoria, o "piso" — a
+chave (-peso, item_id) do K-ésimo desejado, ausente quando há menos de K — e
+o resto sai do próprio grafo (partners/adjacent).
+
+O grafo passado para sparse_upsert/sparse_remove (o rascunho de uma
+versão, ver GraphView.draft) precisa expor: has_node, category, adjacent,
+partners, _add_node, _drop_edges, _remove_node, _set_edge, _del_edge,
+_as_stored e floors (dict item_id -> {categoria: chave}; os dicts internos
+são trocados, não alterados).
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from infrastructure.graph_builder.partition import CatalogPartition, Task, iter_upsert_edges
+from infrastructure.graph_builder.scoring_kernel import ScoringKernel
+
+Item = Mapping[str, Any]  # domain.entities.Item ou um dict com os mesmos campos
+Key = Tuple[float, str]                     # (-peso, item_id): menor = melhor
+Floors = Dict[str, Dict[Any, Key]]
+Stored = Callable[[np.ndarray], np.ndarray]  # peso exato -> peso como o backend guarda
+
+
+@dataclass(frozen=True)
+class SparsifyConfig:
+    top_k: int = 0          # 0 = sem limite por categoria
+    min_weight: float = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.top_k > 0 or self.min_weight > 0
+
+    @classmethod
+    def from_env(cls, top_k: Optional[int] = None, min_weight: Optional[float] = None) -> "SparsifyConfig":
+        if top_k is None:
+            top_k = int(os.environ.get("LOOKKG_GRAPH_TOPK") or 0)
+        if min_weight is None:
+            min_weight = float(os.environ.get("LOOKKG_GRAPH_MIN_WEIGHT") or 0.0)
+        if top_k < 0 or min_weight < 0:
+            raise ValueError("LOOKKG_GRAPH_TOPK e LOOKKG_GRAPH_MIN_WEIGHT não podem ser negativos")
+        return cls(top_k=top_k, min_weight=min_weight)
+
+    def params(self) -> Dict[str, Any]:
+        return {"top_k": self.top_k, "min_weight": self.min_weight}
+
+
+def _identity(w: np.ndarray) -> np.ndarray:
+    return w
+
+
+def _topk_mask(group: np.ndarray, w: np.ndarray, tie: np.ndarray, k: int) -> np.ndarray:
+    """Máscara das k primeiras entradas de cada grupo, por (-w, tie)."""
+    if len(group) == 0:
+        return np.zeros(0, dtype=bool)
+    order = np.lexsort((tie, -w, group))
+    g = group[order]
+    starts = np.r_[0, np.flatnonzero(g[1:] != g[:-1]) + 1]
+    first = np.repeat(starts, np.diff(np.r_[starts, len(g)]))
+    mask = np.zeros(len(group), dtype=bool)
+    mask[order[(np.arange(len(g)) - first) < k]] = True
+    return mask
+
+
+def floors_from_edges(ids: Sequence[str], cats: Sequence[Any], x: np.ndarray, y: np.ndarray,
+                      w: np.ndarray, k: int) -> Floors:
+    """Pisos de todos os nós a partir das arestas (x, y, peso armazenado) de um grafo esparsificado."""
+    floors: Floors = {}
+    if k <= 0 or len(w) == 0:
+        return floors
+    code: Dict[Any, int] = {}
+    ccode = np.array([code.setdefault(c, len(code)) for c in cats], dtype=np.int64)
+    tie = np.argsort(np.argsort(np.asarray(ids, dtype=object)))
+    src = np.concatenate([x, y]).astype(np.int64)
+    dst = np.concatenate([y, x]).astype(np.int64)
+    ww = np.concatenate([w, w]).astype(np.float64)
+    group = src * len(code) + ccode[dst]
+    order = np.lexsort((tie[dst], -ww, group))
+    g = group[order]
+    starts = np.r_[0, np.flatnonzero(g[1:] != g[:-1]) + 1]
+    at_k = starts + (k - 1)
+    at_k = at_k[at_k < np.r_[starts[1:], len(g)]]
+    for e in order[at_k].tolist():
+        a, b = int(src[e]), int(dst[e])
+        floors.setdefault(ids[a], {})[cats[b]] = (-float(ww[e]), ids[b])
+    return floors
+
+
+class Sparsifier:
+    """
+    Filtra o fluxo (tarefa, (x, y, w)) do rebuild bloco a bloco. Numa tarefa
+    cada linha x vê todos os seus parceiros da categoria da coluna (top-K
+    exato); o lado y é parcial e vai acumulando candidatos até o fim do
+    bloco. Os pisos saem das arestas mantidas (floors() ao final).
+    """
+
+    def __init__(self, part: CatalogPartition, ids: Sequence[str], cats: Sequence[Any],
+                 cfg: SparsifyConfig, stored: Optional[Stored] = None):
+        self.part, self.ids, self.cats, self.cfg = part, list(ids), list(cats), cfg
+        self.stored = stored or _identity
+        self.tie = np.argsort(np.argsort(np.asarray(self.ids, dtype=object)))
+        self._kept: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def _block_edges(self, fwd: List[Tuple], bwd: List[Tuple]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        k = self.cfg.top_k
+        x = np.concatenate([e[0] for e in fwd + bwd])
+        y = np.concatenate([e[1] for e in fwd + bwd])
+        w = np.concatenate([e[2] for e in fwd + bwd])
+        nf = sum(len(e[0]) for e in fwd)
+        # candidatos do lado y: top-K final entre os top-K parciais de cada tarefa
+        keep_b = _topk_mask(y[nf:], self.stored(w[nf:]), self.tie[x[nf:]], k)
+        keep = np.r_[np.ones(nf, dtype=bool), keep_b]
+        x, y, w = x[keep], y[keep], w[keep]
+        # união (o mesmo par pode vir dos dois lados), em ordem de (x, y)
+        _, first = np.unique(x * len(self.ids) + y, return_index=True)
+        return x[first], y[first], w[first]
+
+    def filter(self, results: Iterable[Tuple[Task, Tuple[np.ndarray, np.ndarray, np.ndarray]]]
+               ) -> Iterator[Tuple[Task, Tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+        k, min_w = self.cfg.top_k, self.cfg.min_weight
+        cur: Optional[Task] = None
+        fwd: List[Tuple] = []
+        bwd: List[Tuple] = []
+        for task, (x, y, w) in results:
+            if cur is not None and task[0] != cur[0]:
+                yield cur, self._finish(fwd, bwd)
+                fwd, bwd = [], []
+            cur = task
+            sw = self.stored(w)
+            m = sw >= min_w
+            x, y, w, sw = x[m], y[m], w[m], sw[m]
+            if k <= 0:
+                fwd.append((x, y, w))
+                continue
+            mf = _topk_mask(x, sw, self.tie[y], k)
+            mb = _topk_mask(y, sw, self.tie[x], k)
+            fwd.append((x[mf], y[mf], w[mf]))
+            bwd.append((x[mb], y[mb], w[mb]))
+        if cur is not None:
+            yield cur, self._finish(fwd, bwd)
+
+    def _finish(self, fwd: List[Tuple], bwd: List[Tuple]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self.cfg.top_k <= 0:
+            x, y, w = (np.concatenate([e[i] for e in fwd]) for i in range(3))
+            edges = (x, y, w)
+        else:
+            edges = self._block_edges(fwd, bwd)
+        self._kept.append(edges)
+        return edges
+
+    def floors(self) -> Floors:
+        if not self._kept:
+            return {}
+        x, y, w = (np.concatenate([e[i] for e in self._kept]) for i in range(3))
+        return floors_from_edges(self.ids, self.cats, x, y, self.stored(w), self.cfg.top_k)
+
+
+# ---------- manutenção incremental ----------
+def _wants(floors: Floors, a: str, b: str, cat_b: Any, w: float) -> bool:
+    f = floors.get(a, {}).get(cat_b)
+    return f is None or (-w, b) <= f
+
+
+def _kth(partners: Dict[str, float], k: int) -> Optional[Key]:
+    if len(partners) < k:
+        return None
+    return sorted((-w, p) for p, w in partners.items())[k - 1]
+
+
+def _set_floor(floors: Floors, a: str, cat: Any, key: Optional[Key]) -> None:
+    # o dict interno é trocado, nunca alterado: pode ser da versão publicada do grafo
+    cur = {c: f for c, f in floors.get(a, {}).items() if c != cat}
+    if key is not None:
+        cur[cat] = key
+    if cur:
+        floors[a] = cur
+    else:
+        floors.pop(a, None)
+
+
+def _refill(g, cat: Any, ys: List[str], members: List[Item], pos: Dict[str, int],
+            items: Sequence[Item], cfg: SparsifyConfig) -> None:
+    """
+    Cada y perdeu um desejado em cat com a lista cheia: refaz o top-K de y
+    em cat contra os membros da categoria (um kernel para todos os y).
+    Pares já ligados mantêm o peso do grafo; os novos seguem a convenção do
+    rebuild (`a` é quem vem antes no catálogo).
+    """
+    k = cfg.top_k
+    y_items = [items[pos[y]] if y in pos else g.node_item(y) for y in ys]
+    mids = [m["item_id"] for m in members]
+    col_of = {mid: c for c, mid in enumerate(mids)}
+    tie = np.argsort(np.argsort(np.asarray(mids, dtype=object))) if mids else np.zeros(0, np.intp)
+    if members:
+        kern = ScoringKernel(y_items + members)
+        rows, cols = np.arange(len(ys)), np.arange(len(ys), len(ys) + len(members))
+        fwd, bwd = kern.score_block(rows, cols), kern.score_block(cols, rows).T
+        pm = np.array([pos.get(mid, len(pos)) for mid in mids])
+        py = np.array([pos.get(y, -1) for y in ys])
+        W = np.where(pm[None, :] > py[:, None], fwd, bwd)
+        SW = g._as_stored(W)
+    for r, y in enumerate(ys):
+        cur = g.partners(y, cat)
+        extra: List[Tuple[float, str, Optional[float]]] = []
+        if members:
+            s, w = SW[r].copy(), W[r]
+            linked = np.zeros(len(mids), dtype=bool)
+            for mid, cw in cur.items():
+                c = col_of.get(mid)
+                if c is None:
+                    extra.append((-cw, mid, None))
+                else:
+                    s[c], linked[c] = cw, True
+            ok = linked | ((s > 0) & (s >= cfg.min_weight))
+            if y in col_of:
+                ok[col_of[y]] = False
+            idx = np.flatnonzero(ok)
+            idx = idx[np.lexsort((tie[idx], -s[idx]))][:k]
+            top: List[Tuple[float, str, Optional[float]]] = [
+                (-float(s[c]), mids[c], None if linked[c] else float(w[c])) for c in idx.tolist()]
+        else:
+            top = [(-cw, mid, None) for mid, cw in cur.items()]
+        top = sorted(top + extra)[:k]
+        for _, mid, wx in top:
+            if wx is not None:
+                g._set_edge(y, mid, wx)
+        _set_floor(g.floors, y, cat, top[-1][:2] if len(top) >= k else None)
+
+
+def _link_new(g, it: Item, others: List[Item], cfg: SparsifyConfig) -> None:
+    """Liga um item recém-limpo: o que ele quer (top-K por categoria) e quem passa a querê-lo."""
+    x, cx, k = it["item_id"], it.get("categoria"), cfg.top_k
+    floors = g.floors
+    if not others:
+        return
+    parts = list(iter_upsert_edges([it], others))
+    cols = np.concatenate([p[1] for p in parts]) - 1
+    w = np.concatenate([p[2] for p in parts])
+    sw = g._as_stored(w)
+    m = sw >= cfg.min_weight
+    cand = [(others[c]["item_id"], others[c].get("categoria"), wx, sx)
+            for c, wx, sx in zip(cols[m].tolist(), w[m].tolist(), sw[m].tolist())]
+
+    # o que x quer: top-K por categoria
+    per_cat: Dict[Any, List[Tuple[float, str, float]]] = {}
+    for y, cy, wx, sx in cand:
+        per_cat.setdefault(cy, []).append((-sx, y, wx))
+    for cy, lst in per_cat.items():
+        lst.sort()
+        chosen = lst[:k] if k else lst
+        for _, y, wx in chosen:
+            g._set_edge(x, y, wx)
+        if k and len(lst) >= k:
+            _set_floor(floors, x, cy, chosen[-1][:2])
+
+    # quem quer x: entra na lista de y e o K-ésimo antigo sai
+    for y, cy, wx, sx in cand:
+        f = floors.get(y, {}).get(cx)
+        if f is not None and (-sx, x) > f:
+            continue
+        g._set_edge(x, y, wx)
+        if not k:
+            continue
+        if f is not None:
+            z = f[1]
+            wz = g.adjacent(y).get(z)
+            if wz is not None and not _wants(floors, z, y, cy, wz):
+                g._del_edge(y, z)
+        _set_floor(floors, y, cx, _kth(g.partners(y, cx), k))
+
+
+def sparse_upsert(g, batch: Sequence[Item], items: Sequence[Item], cfg: SparsifyConfig) -> None:
+    """
+    Upserts no grafo esparsificado. Primeiro todos os itens do lote perdem
+    as arestas (parceiros que os desejavam com a lista cheia são
+    reabastecidos do catálogo); depois cada item é ligado contra o catálogo
+    e os itens anteriores do lote — o posterior é `a`, como no upsert denso.
+    """
+    last = {it["item_id"]: k for k, it in enumerate(batch)}
+    batch = [it for k, it in enumerate(batch) if last[it["item_id"]] == k]
+    floors, k = g.floors, cfg.top_k
+    refill: List[Tuple[str, Any]] = []
+    for it in batch:
+        x = it["item_id"]
+        if g.has_node(x):
+            old_cat = g.category(x)
+            for y, w in g.adjacent(x).items():
+                # y desejava x com a lista cheia: vai precisar de um substituto
+                if k and y not in last and old_cat in floors.get(y, {}) and _wants(floors, y, x, old_cat, w):
+                    refill.append((y, old_cat))
+            g._drop_edges(x)
+        floors.pop(x, None)
+        g._add_node(it)
+
+    _refill_all(g, refill, last, items, cfg)
+
+    rest = [o for o in items if o["item_id"] not in last and g.has_node(o["item_id"])]
+    for n, it in enumerate(batch):
+        _link_new(g, it, rest + batch[:n], cfg)
+
+
+def _refill_all(g, refill: List[Tuple[str, Any]], skip: Iterable[str], items: Sequence[Item],
+                cfg: SparsifyConfig) -> None:
+    """_refill agrupado por categoria; candidatos: itens do catálogo no grafo, fora de skip."""
+    if not refill:
+        return
+    skip = set(skip)
+    pos = {it["item_id"]: n for n, it in enumerate(items)}
+    by_cat: Dict[Any, List[Item]] = {}
+    for it in items:
+        if it["item_id"] not in skip and g.has_node(it["item_id"]):
+            by_cat.setdefault(it.get("categoria"), []).append(it)
+    per_cat: Dict[Any, List[str]] = {}
+    for y, cat in dict.fromkeys(refill):
+        per_cat.setdefault(cat, []).append(y)
+    for cat, ys in per_cat.items():
+        _refill(g, cat, ys, by_cat.get(cat, []), pos, items, cfg)
+
+
+def sparse_remove(g, ids: Iterable[str], items: Sequence[Item], cfg: SparsifyConfig) -> None:
+    """
+    Remove nós do grafo esparsificado com as arestas incidentes. Quem
+    desejava um deles com a lista cheia é reabastecido do catálogo (`items`,
+    já sem os removidos), como na primeira fase do sparse_upsert; o resto
+    custa O(grau).
+    """
+    gone = [x for x in dict.fromkeys(ids) if g.has_node(x)]
+    floors, k = g.floors, cfg.top_k
+    refill: List[Tuple[str, Any]] = []
+    removed = set(gone)
+    for x in gone:
+        cx = g.category(x)
+        for y, w in g.adjacent(x).items():
+            if k and y not in removed and cx in floors.get(y, {}) and _wants(floors, y, x, cx, w):
+                refill.append((y, cx))
+        g._remove_node(x)
+        floors.pop(x, None)
+    _refill_all(g, refill, removed, items, cfg)
@@ -0,0 +1,288 @@
+# infrastructure/observability/metrics.py
+"""
+Métricas do processo no formato texto do Prometheus (exposto em GET /metrics).
+
+Sem dependência externa: histogramas de buckets fixos, contadores e gauges
+calculados na coleta (tamanho do catálogo/grafo: nada no caminho quente).
+Observar custa um bisect e um incremento sob o lock da série (~1 µs): dá para
+deixar ligado em produção. LOOKKG_METRICS=0 desliga as observações (o
+endpoint continua respondendo, sem amostras).
+
+Cada worker do uvicorn tem o seu registro: com vários workers, cada coleta
+vê o processo que atendeu (agregue por instância/pid no Prometheus).
+
+Uso:
+    with metrics.stage("recommend.rank"): ...      # lookkg_stage_seconds{stage=...}
+    @metrics.stage("graph.upsert")                  # o mesmo, como decorator
+    sw = metrics.Stopwatch("recommend.rank")        # fases de uma função:
+    ...; sw.lap("filter"); ...; sw.lap("sort")      #   stage="recommend.rank.filter", ...
+"""
+from __future__ import annotations
+
+import bisect
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("LOOKKG_METRICS", "1") not in ("0", "false", "no")
+
+# segundos: de 100 µs (lookup no cache) a 10 s (varredura completa de catálogo grande)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# rebuild do grafo: segundos a dezenas de minutos
+REBUILD_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "lock")
+
+    def __init__(self, n: int):
+        self.counts = [0] * (n + 1)  # último: acima do maior bucket
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, labels: Labels) -> _HistogramSeries:
+        s = self._series.get(labels)
+        if s is None:
+            with self._lock:
+                s = self._series.setdefault(labels, _HistogramSeries(len(self.buckets)))
+        return s
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not ENABLED:
+            return
+        s = self._get(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with s.lock:
+            s.counts[i] += 1
+            s.sum += value
+
+    def time(self, *labels: str) -> "_Timed":
+        return _Timed(self, labels)
+
+    def render(self) -> List[str]:
+        out = self.header()
+        for labels, s in sorted(self._series.items()):
+            with s.lock:
+                counts, total = list(s.counts), s.sum
+            acc = 0
+            for le, c in zip(self.buckets + (math.inf,), counts):
+                acc += c
+                bucket = _labels(self.labelnames, labels, f'le="{_num(le)}"')
+                out.append(f"{self.name}_bucket{bucket} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, labels)} {acc}")
+        return out
+
+
+class _Timed:
+    """Context manager e decorator; como decorator é só um try/finally (sem objeto por chamada)."""
+    __slots__ = ("hist", "labels", "t0")
+
+    def __init__(self, hist: Histogram, labels: Labels):
+        self.hist, self.labels = hist, labels
+
+    def __enter__(self) -> "_Timed":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.hist.observe(time.perf_counter() - self.t0, *self.labels)
+
+    def __call__(self, fn: Callable) -> Callable:
+        hist, labels = self.hist, self.labels
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - t0, *labels)
+        return wrapper
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in values]
+
+
+class GaugeFunc(_Metric):
+    """Gauge lido na coleta: fn() devolve o valor, ou {rótulos: valor} com labelnames."""
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, fn: Callable[[], Any], labelnames: Sequence[str] = ()):
+        super().__init__(name, doc, labelnames)
+        self.fn = fn
+        self._failing = False
+
+    def render(self) -> List[str]:
+        try:
+            v = self.fn()
+        except Exception:
+            # coleta não pode derrubar o endpoint; loga a primeira falha (não uma por scrape)
+            if not self._failing:
+                logger.exception("métrica %s: falha ao ler o valor", self.name)
+            self._failing = True
+            return []
+        self._failing = False
+        if v is None:
+            return []
+        values = sorted(v.items()) if isinstance(v, dict) else [((), v)]
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(x)}" for k, x in values]
+
+
+class CounterFunc(GaugeFunc):
+    """Contador mantido por outro objeto (ex.: hits do cache de resultados), lido na coleta."""
+    kind = "counter"
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: M) -> M:
+        # mesmo nome substitui (ex.: gauge ligado a outra instância do serviço)
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "lookkg_http_request_duration_seconds", "Latência das requisições HTTP por rota.",
+    ("method", "route", "status")))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "lookkg_stage_seconds", "Duração das etapas internas (serviço de recomendação, grafo).", ("stage",)))
+SQLITE_LATENCY = REGISTRY.register(Histogram(
+    "lookkg_sqlite_query_seconds", "Duração das operações do catalog_repo no SQLite.", ("op",)))
+REBUILD_SECONDS = REGISTRY.register(Histogram(
+    "lookkg_graph_rebuild_seconds", "Duração dos rebuilds completos do grafo.", buckets=REBUILD_BUCKETS))
+REBUILDS = REGISTRY.register(Counter(
+    "lookkg_graph_rebuilds_total", "Rebuilds completos do grafo por resultado.", ("outcome",)))
+
+
+def stage(name: str):
+    """Context manager (e decorator) que mede uma etapa em lookkg_stage_seconds."""
+    return STAGE_LATENCY.time(name)
+
+
+def query(op: str):
+    """Mede uma operação do catalog_repo em lookkg_sqlite_query_seconds."""
+    return SQLITE_LATENCY.time(op)
+
+
+@contextmanager
+def rebuild() -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        REBUILDS.inc("error")
+        raise
+    REBUILD_SECONDS.observe(time.perf_counter() - t0)
+    REBUILDS.inc("ok")
+
+
+class Stopwatch:
+    """Fases de uma função sem reindentar: cada lap() registra o tempo desde o anterior."""
+    __slots__ = ("prefix", "t")
+
+    def __init__(self, prefix: str):
+        self.prefix, self.t = prefix, time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter()
+        STAGE_LATENCY.observe(now - self.t, f"{self.prefix}.{phase}")
+        self.t = now
+
+
+def gauge(name: str, doc: str, fn: Callable[[], Any], labelnames: Sequence[str] = ()) -> None:
+    REGISTRY.register(GaugeFunc(name, doc, fn, labelnames))
+
+
+def counter_func(name: str, doc: str, fn: Callable[[], Any], labelnames: Sequence[str] = ()) -> None:
+    REGISTRY.register(CounterFunc(name, doc, fn, labelnames))
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,168 @@
+# infrastructure/storage/catalog_cache.py
+"""
+Cache do catálogo em memória, versionado, compartilhado por routers e serviços.
+
+Leitores recebem um CatalogSnapshot imutável (ItemStore em ordem de item_id
++ índice por nome) sem tocar no disco. A validade é checada pela versão do
+catalog_repo: escritas deste processo sobem a versão na hora (sem SQL) e
+mudanças de outros processos aparecem via PRAGMA data_version, consultado no
+máximo a cada LOOKKG_CATALOG_POLL segundos (padrão 1.0).
+
+Escritas feitas pela camada de serviço podem ser aplicadas direto no cache
+(note_upsert/note_delete e as versões em lote), evitando recarregar a tabela inteira a cada upsert.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from domain.entities import Item
+from infrastructure.storage import catalog_repo
+from infrastructure.storage.item_store import ItemStore, as_item
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Foto imutável do catálogo: um ItemStore em ordem de item_id + índice por nome."""
+    version: int
+    store: ItemStore = field(repr=False)
+    _by_name: Mapping[str, Tuple[str, ...]] = field(repr=False)
+
+    @classmethod
+    def build(cls, version: int, items: Iterable[Mapping[str, Any]]) -> "CatalogSnapshot":
+        store = ItemStore(sorted(items, key=lambda it: it["item_id"]))
+        by_name: Dict[str, List[str]] = {}
+        for it in store:
+            by_name.setdefault(it.nome, []).append(it.item_id)
+        return cls(
+            version=version,
+            store=store,
+            _by_name=MappingProxyType({k: tuple(v) for k, v in by_name.items()}),
+        )
+
+    @property
+    def items(self) -> Tuple[Item, ...]:
+        return self.store.rows
+
+    def get(self, item_id: str) -> Optional[Item]:
+        return self.store.get(item_id)
+
+    def lookup(self, keys: Iterable[str]) -> List[Item]:
+        """Itens cujo nome ou item_id está em keys, na ordem do catálogo (item_id)."""
+        get = self.store.get
+        found: Dict[str, Item] = {}
+        for k in keys:
+            # depois de with_deletes o índice por nome ainda cita os removidos
+            for i in (k, *self._by_name.get(k, ())):
+                it = get(i)
+                if it is not None:
+                    found[i] = it
+        return [found[i] for i in sorted(found)]
+
+    def first_name_match(self, q: str) -> Optional[Item]:
+        """Primeiro item (ordem do catálogo) cujo nome contém q."""
+        return next((it for it in self.store if q in (it.nome or "")), None)
+
+    # --- cópias com uma escrita aplicada (usadas pelo cache) ---
+    def with_upserts(self, version: int, items: Iterable[Mapping[str, Any]]) -> "CatalogSnapshot":
+        # mesma semântica do upsert do catalog_repo: casa por item_id ou (nome, categoria)
+        by_id = {it.item_id: it for it in self.store}
+        by_key: Dict[Tuple[Any, Any], str] = {(it.nome, it.categoria): it.item_id for it in self.store}
+        for item in items:
+            key = (item.get("nome"), item.get("categoria"))
+            old = by_key.get(key)
+            if old is not None and old != item["item_id"]:
+                by_id.pop(old, None)
+            prev = by_id.get(item["item_id"])
+            if prev is not None:
+                by_key.pop((prev.get("nome"), prev.get("categoria")), None)
+            by_id[item["item_id"]] = as_item(item)
+            by_key[key] = item["item_id"]
+        return CatalogSnapshot.build(version, by_id.values())
+
+    def with_delete(self, version: int, item_id: str) -> "CatalogSnapshot":
+        return self.with_deletes(version, [item_id])
+
+    def with_deletes(self, version: int, item_ids: Iterable[str]) -> "CatalogSnapshot":
+        # O(removidos): o ItemStore sai preguiçoso e o índice por nome é reaproveitado
+        return CatalogSnapshot(version=version, store=self.store.without(item_ids), _by_name=self._by_name)
+
+
+class CatalogCache:
+    def __init__(self, poll_interval: Optional[float] = None):
+        if poll_interval is None:
+            poll_interval = float(os.environ.get("LOOKKG_CATALOG_POLL", "1.0"))
+        self.poll_interval = poll_interval
+        self._snap: Optional[CatalogSnapshot] = None
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> CatalogSnapshot:
+        now = time.monotonic()
+        check = now - self._last_poll >= self.poll_interval
+        if check:
+            self._last_poll = now
+        v = catalog_repo.version(check_external=check)
+        snap = self._snap
+        if snap is not None and snap.version == v:
+            return snap
+        with self._lock:
+            snap = self._snap
+            if snap is not None and snap.version == v:
+                return snap
+            # versão lida antes da carga: uma escrita concorrente só causa uma recarga a mais
+            snap = self._snap = CatalogSnapshot.build(v, catalog_repo.load_all())
+            return snap
+
+    def _apply(self, change) -> None:
+        with self._lock:
+            v = catalog_repo.version(check_external=False)
+            snap = self._snap
+            # só aplica se esta escrita for a única que o snapshot ainda não viu
+            if snap is not None and snap.version == v - 1:
+                self._snap = change(snap, v)
+            else:
+                self._snap = None
+
+    def note_upserts(self, items: Sequence[Mapping[str, Any]]) -> None:
+        """Chamado logo após catalog_repo.add_item/add_items (uma transação)."""
+        self._apply(lambda snap, v: snap.with_upserts(v, items))
+
+    def note_delete(self, item_id: str) -> None:
+        """Chamado logo após catalog_repo.delete_item(item_id)."""
+        self._apply(lambda snap, v: snap.with_delete(v, item_id))
+
+    def note_deletes(self, item_ids: List[str]) -> None:
+        """Chamado logo após catalog_repo.delete_items (uma transação)."""
+        self._apply(lambda snap, v: snap.with_deletes(v, item_ids))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snap = None
+
+
+_cache = CatalogCache()
+
+
+def snapshot() -> CatalogSnapshot:
+    return _cache.snapshot()
+
+
+def note_upsert(item: Mapping[str, Any]) -> None:
+    _cache.note_upserts([item])
+
+
+def note_upserts(items: Sequence[Mapping[str, Any]]) -> None:
+    _cache.note_upserts(items)
+
+
+def note_delete(item_id: str) -> None:
+    _cache.note_delete(item_id)
+
+
+def note_deletes(item_ids: List[str]) -> None:
+    _cache.note_deletes(item_ids)
@@ -6,9 +6,14 @@ import os
 import sqlite3
 import threading
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from uuid import uuid4
 
+from domain.entities import FIELDS
+from infrastructure.observability import metrics
+from infrastructure.storage.item_store import ItemStore, make_item
+from infrastructure.storage.sqlite_pool import SQLitePool
+
 # Base de storage: respeita env (DATA_DIR, KG_DATA_DIR, STORAGE_DIR), senão usa ./data
 _BASE = (
     os.environ.get("DATA_DIR")
@@ -23,6 +28,7 @@ CATALOG_PATH = BASE_DIR / "catalog.json"   # legado (JSON antigo)
 CATALOG_DB = BASE_DIR / "catalog.db"       # novo backend SQLite
 
 _lock = threading.RLock()
+_pools: Dict[str, SQLitePool] = {}
 
 # Schema do SQLite
 _SCHEMA = """
@@ -42,16 +48,97 @@ CREATE TABLE IF NOT EXISTS items (
 );
 """
 
+# Chave natural usada no upsert (nome + categoria). Criado à parte porque
+# bases antigas podem ter duplicatas que precisam ser resolvidas antes.
+_NATURAL_KEY_INDEX = """
+CREATE UNIQUE INDEX IF NOT EXISTS ux_items_nome_categoria ON items (nome, categoria);
+"""
+
+# mesma ordem dos campos de domain.entities.Item (make_item lê as linhas por posição)
+_COLUMNS = FIELDS
+
+# Índice full-text (FTS5, conteúdo externo = tabela items) mantido por triggers.
+# O rowid implícito de items é a ligação; INSERT OR REPLACE só dispara o
+# trigger de delete com recursive_triggers ligado (ver sqlite_pool.PRAGMAS).
+_SEARCH_COLUMNS = ("nome", "categoria", "cor", "material", "estilo", "ocasion", "clima", "padrao")
+_FTS_COLS = ", ".join(_SEARCH_COLUMNS)
+_FTS_NEW = ", ".join(f"new.{c}" for c in _SEARCH_COLUMNS)
+_FTS_OLD = ", ".join(f"old.{c}" for c in _SEARCH_COLUMNS)
+_FTS_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    {_FTS_COLS},
+    content='items', content_rowid='rowid',
+    tokenize="unicode61 remove_diacritics 2 tokenchars '-'"
+);
+
+CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts (rowid, {_FTS_COLS}) VALUES (new.rowid, {_FTS_NEW});
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, {_FTS_COLS}) VALUES ('delete', old.rowid, {_FTS_OLD});
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, {_FTS_COLS}) VALUES ('delete', old.rowid, {_FTS_OLD});
+    INSERT INTO items_fts (rowid, {_FTS_COLS}) VALUES (new.rowid, {_FTS_NEW});
+END;
+"""
+# Revisão persistente do catálogo: contador no próprio arquivo, somado por
+# triggers a cada linha inserida/alterada/removida (inclusive por outros
+# processos ou scripts de ops). Serve para validar artefatos derivados do
+# catálogo entre reinícios (ex.: snapshot do grafo).
+_META_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('revision', 0);
+
+CREATE TRIGGER IF NOT EXISTS items_rev_ai AFTER INSERT ON items BEGIN
+    UPDATE catalog_meta SET value = value + 1 WHERE key = 'revision';
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_rev_ad AFTER DELETE ON items BEGIN
+    UPDATE catalog_meta SET value = value + 1 WHERE key = 'revision';
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_rev_au AFTER UPDATE ON items BEGIN
+    UPDATE catalog_meta SET value = value + 1 WHERE key = 'revision';
+END;
+"""
+
+# Pesos do bm25 por coluna (mesma ordem de _SEARCH_COLUMNS): nome pesa mais
+_BM25_WEIGHTS = (4.0, 2.0, 1.5, 1.0, 1.0, 1.0, 1.0, 1.0)
+
+# Bancos (por caminho) em que o FTS5 está disponível; sem ele a busca cai para LIKE
+_fts_enabled: Dict[str, bool] = {}
+
 
 def _norm_name(s: Optional[str]) -> str:
     return (s or "").strip().lower()
 
 
-def _get_conn() -> sqlite3.Connection:
-    BASE_DIR.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(CATALOG_DB))
-    conn.row_factory = sqlite3.Row
-    return conn
+def _pool() -> SQLitePool:
+    """Pool do arquivo atual (CATALOG_DB pode ser trocado em testes/scripts)."""
+    key = str(CATALOG_DB)
+    pool = _pools.get(key)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = SQLitePool(CATALOG_DB, init=_init_db)
+    return pool
+
+
+def version(check_external: bool = True) -> int:
+    """
+    Versão monotônica do catálogo neste processo: sobe a cada escrita feita
+    por este módulo e, com check_external, quando outro processo alterou o
+    catalog.db (uma consulta PRAGMA; sem ela, nenhum acesso ao banco).
+    """
+    pool = _pool()
+    return pool.poll_version() if check_external else pool.version
 
 
 def _maybe_import_from_json(conn: sqlite3.Connection) -> None:
@@ -116,17 +203,52 @@ def _maybe_import_from_json(conn: sqlite3.Connection) -> None:
     conn.commit()
 
 
-def _ensure_db() -> None:
-    """Garante que o arquivo catalog.db e a tabela items existam; migra do JSON se necessário."""
-    with _lock:
-        BASE_DIR.mkdir(parents=True, exist_ok=True)
-        conn = sqlite3.connect(str(CATALOG_DB))
-        try:
-            conn.executescript(_SCHEMA)
-            conn.commit()
-            _maybe_import_from_json(conn)
-        finally:
-            conn.close()
+def _ensure_natural_key(conn: sqlite3.Connection) -> None:
+    """
+    Cria o índice único (nome, categoria). Se a base tiver duplicatas dessa
+    chave (gravadas antes do índice existir), mantém só a linha mais recente
+    de cada uma — a mesma que o upsert antigo teria deixado.
+    """
+    cur = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_items_nome_categoria'"
+    )
+    if cur.fetchone():
+        return
+    conn.execute(
+        """
+        DELETE FROM items
+        WHERE rowid NOT IN (SELECT MAX(rowid) FROM items GROUP BY nome, categoria)
+        """
+    )
+    conn.executescript(_NATURAL_KEY_INDEX)
+    conn.commit()
+
+
+def _ensure_fts(conn: sqlite3.Connection) -> bool:
+    """Cria items_fts + triggers; na criação, indexa as linhas já existentes."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'"
+    ).fetchone()
+    try:
+        conn.executescript(_FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        # SQLite compilado sem FTS5
+        return False
+    if not exists:
+        conn.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+
+def _init_db(conn: sqlite3.Connection) -> None:
+    """Schema + migração do JSON + índices; roda uma vez por processo (via pool)."""
+    conn.executescript(_SCHEMA)
+    conn.commit()
+    _maybe_import_from_json(conn)
+    _ensure_natural_key(conn)
+    conn.executescript(_META_SCHEMA)
+    conn.commit()
+    _fts_enabled[str(CATALOG_DB)] = _ensure_fts(conn)
 
 
 def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
@@ -144,141 +266,294 @@ def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
     }
 
 
-def load_all() -> List[Dict[str, Any]]:
+@metrics.query("load_all")
+def load_all() -> ItemStore:
     """
-    Carrega todos os itens do SQLite.
-    Retorna lista de dicionários com as mesmas chaves de antes.
+    Carrega todos os itens do SQLite, em ordem de item_id.
+    Retorna um ItemStore (sequência de Items, que leem como os dicts de antes).
     """
-    _ensure_db()
-    conn = _get_conn()
+    cur = _pool().reader().execute(
+        """
+        SELECT
+            item_id, nome, categoria, cor,
+            padrao, material, estilo, ocasion,
+            clima, paleta
+        FROM items
+        ORDER BY item_id
+        """
+    )
+    return ItemStore(map(make_item, cur.fetchall()))
+
+
+def _revision(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'revision'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def revision() -> int:
+    """Revisão persistente do catalog.db (sobe a cada linha escrita, por qualquer processo)."""
+    return _revision(_pool().reader())
+
+
+@metrics.query("load_all_with_revision")
+def load_all_with_revision() -> Tuple[int, ItemStore]:
+    """(revisão, itens) lidos na mesma transação de leitura — um par consistente."""
+    conn = _pool().reader()
+    conn.execute("BEGIN")
     try:
-        cur = conn.execute(
-            """
-            SELECT
-                item_id, nome, categoria, cor,
-                padrao, material, estilo, ocasion,
-                clima, paleta
-            FROM items
-            ORDER BY item_id
-            """
-        )
-        return [_row_to_dict(row) for row in cur.fetchall()]
+        rev = _revision(conn)
+        items = load_all()
     finally:
-        conn.close()
+        conn.execute("COMMIT")
+    return rev, items
 
 
+@metrics.query("save_all")
 def save_all(items: List[Dict[str, Any]]) -> None:
     """
     Substitui todo o conteúdo da tabela items pelo conteúdo da lista.
     Mantém a semântica do save_all antigo, mas agora em cima do SQLite.
     """
-    _ensure_db()
-    with _lock:
-        conn = _get_conn()
-        try:
-            conn.execute("DELETE FROM items")
-            for it in items:
-                if not it.get("item_id"):
-                    prefix = _norm_name(it.get("categoria") or "item")[:10] or "item"
-                    it["item_id"] = f"{prefix}_{uuid4().hex[:8]}"
-
-                conn.execute(
-                    """
-                    INSERT OR REPLACE INTO items (
-                        item_id, nome, categoria, cor,
-                        padrao, material, estilo, ocasion,
-                        clima, paleta
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        it.get("item_id"),
-                        it.get("nome"),
-                        it.get("categoria"),
-                        it.get("cor"),
-                        it.get("padrao"),
-                        it.get("material"),
-                        it.get("estilo"),
-                        it.get("ocasion"),
-                        it.get("clima"),
-                        it.get("paleta"),
-                    ),
+    with _pool().writer() as conn:
+        conn.execute("DELETE FROM items")
+        for it in items:
+            if not it.get("item_id"):
+                prefix = _norm_name(it.get("categoria") or "item")[:10] or "item"
+                it["item_id"] = f"{prefix}_{uuid4().hex[:8]}"
+
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO items (
+                    item_id, nome, categoria, cor,
+                    padrao, material, estilo, ocasion,
+                    clima, paleta
                 )
-            conn.commit()
-        finally:
-            conn.close()
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    it.get("item_id"),
+                    it.get("nome"),
+                    it.get("categoria"),
+                    it.get("cor"),
+                    it.get("padrao"),
+                    it.get("material"),
+                    it.get("estilo"),
+                    it.get("ocasion"),
+                    it.get("clima"),
+                    it.get("paleta"),
+                ),
+            )
+
+
+def _new_item_id(item: Dict[str, Any]) -> str:
+    prefix = _norm_name(item.get("categoria") or "item")[:10] or "item"
+    return f"{prefix}_{uuid4().hex[:8]}"
+
 
+def _upsert(conn: sqlite3.Connection, item: Dict[str, Any]) -> str:
+    """INSERT ... ON CONFLICT de um item; devolve o item_id que ficou gravado."""
+    explicit_id = bool(item.get("item_id"))
+    if not explicit_id:
+        item["item_id"] = _new_item_id(item)
 
+    cols = ", ".join(_COLUMNS)
+    marks = ", ".join("?" for _ in _COLUMNS)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in _COLUMNS if c != "item_id")
+    keep_id = "excluded.item_id" if explicit_id else "items.item_id"
+    row = conn.execute(
+        f"""
+        INSERT INTO items ({cols}) VALUES ({marks})
+        ON CONFLICT (item_id) DO UPDATE SET {updates}
+        ON CONFLICT (nome, categoria) DO UPDATE SET item_id = {keep_id}, {updates}
+        RETURNING item_id
+        """,
+        tuple(item.get(c) for c in _COLUMNS),
+    ).fetchall()[0]
+    return row["item_id"]
+
+
+@metrics.query("add_item")
 def add_item(item: Dict[str, Any]) -> Dict[str, Any]:
     """
     Upsert por (item_id) ou (nome+categoria). Gera item_id se não existir.
     Retorna o item salvo (com item_id).
 
-    A lógica de upsert é mantida igual à versão antiga, só mudamos
-    o backend de persistência (JSON -> SQLite).
+    Um único INSERT ... ON CONFLICT: o índice da PK e o índice único
+    (nome, categoria) resolvem o upsert em O(log n), sem reescrever a tabela.
+    Quando o casamento é pela chave natural e o item_id foi gerado aqui, a
+    linha existente mantém o seu item_id (o grafo continua apontando para ela);
+    um item_id explícito substitui o antigo, como antes.
     """
-    with _lock:
-        items = load_all()
+    try:
+        with _pool().writer() as conn:
+            item_id = _upsert(conn, item)
+    except sqlite3.IntegrityError as e:
+        raise ValueError(f"conflito ao salvar item: {e}") from e
 
-        # Garante item_id
-        if not item.get("item_id"):
-            prefix = _norm_name(item.get("categoria") or "item")[:10] or "item"
-            item["item_id"] = f"{prefix}_{uuid4().hex[:8]}"
-
-        # Upsert por item_id
-        by_id = next((i for i, it in enumerate(items) if it.get("item_id") == item["item_id"]), None)
-        if by_id is not None:
-            items[by_id] = item
-            save_all(items)
-            return item
-
-        # Upsert por (nome + categoria)
-        nm = _norm_name(item.get("nome"))
-        cat = _norm_name(item.get("categoria"))
-        for i, it in enumerate(items):
-            if _norm_name(it.get("nome")) == nm and _norm_name(it.get("categoria")) == cat:
-                items[i] = item
-                save_all(items)
-                return item
-
-        # Novo item
-        items.append(item)
-        save_all(items)
-        return item
+    item["item_id"] = item_id
+    return item
 
 
+@metrics.query("add_items")
+def add_items(items: List[Dict[str, Any]]) -> List[Optional[str]]:
+    """
+    Upsert em lote numa única transação (mesma semântica de add_item).
+    Cada item roda sob um SAVEPOINT: um conflito descarta só aquele item.
+    Devolve, por posição, None se gravou ou a mensagem de erro.
+    """
+    errors: List[Optional[str]] = []
+    with _pool().writer() as conn:
+        conn.execute("BEGIN")
+        for item in items:
+            conn.execute("SAVEPOINT bulk_item")
+            try:
+                item["item_id"] = _upsert(conn, item)
+            except sqlite3.IntegrityError as e:
+                conn.execute("ROLLBACK TO bulk_item")
+                errors.append(f"conflito ao salvar item: {e}")
+            else:
+                errors.append(None)
+            conn.execute("RELEASE bulk_item")
+    return errors
+
+
+@metrics.query("get_item")
 def get_item(item_id: str) -> Optional[Dict[str, Any]]:
-    items = load_all()
-    return next((it for it in items if it.get("item_id") == item_id), None)
+    row = _pool().reader().execute(
+        f"SELECT {', '.join(_COLUMNS)} FROM items WHERE item_id = ?", (item_id,)
+    ).fetchone()
+    return _row_to_dict(row) if row else None
 
 
+@metrics.query("delete_item")
 def delete_item(item_id: str) -> bool:
-    with _lock:
-        items = load_all()
-        new_items = [it for it in items if it.get("item_id") != item_id]
-        changed = len(new_items) != len(items)
-        if changed:
-            save_all(new_items)
-        return changed
+    with _pool().writer() as conn:
+        cur = conn.execute("DELETE FROM items WHERE item_id = ?", (item_id,))
+        return cur.rowcount > 0
+
+
+@metrics.query("delete_items")
+def delete_items(item_ids: Iterable[str]) -> List[str]:
+    """Remove vários itens numa única transação; devolve os item_id que existiam (na ordem dada)."""
+    deleted: List[str] = []
+    with _pool().writer() as conn:
+        conn.execute("BEGIN")
+        for item_id in dict.fromkeys(item_ids):
+            if conn.execute("DELETE FROM items WHERE item_id = ?", (item_id,)).rowcount:
+                deleted.append(item_id)
+    return deleted
 
 
-def search(query: str = "", limit: int = 200) -> List[Dict[str, Any]]:
+def _fts_query(q: str) -> str:
+    """Cada termo vira uma frase com prefixo ("termo"*), todos obrigatórios (AND)."""
+    terms = [t.replace('"', '""') for t in q.split()]
+    return " ".join(f'"{t}"*' for t in terms if t)
+
+
+@metrics.query("search")
+def search(query: str = "", limit: int = 200, offset: int = 0) -> List[Dict[str, Any]]:
     """
-    Busca simples por substring em nome/categoria/cor/estilo/material/ocasião.
-    A semântica é a mesma da versão original: normaliza e filtra em Python.
+    Busca em nome/categoria/cor/material/estilo/ocasião/clima/padrão.
+
+    Com FTS5: termos por prefixo (todos obrigatórios), resultados ordenados
+    por relevância (bm25). Sem termos, lista em ordem de item_id. limit/offset
+    vão direto para o SQL — nada de carregar a tabela inteira.
     """
     q = _norm_name(query)
-    items = load_all()
-    if not q:
-        return items[:limit]
-    out: List[Dict[str, Any]] = []
-    for it in items:
-        hay = " ".join(
-            _norm_name(it.get(k))
-            for k in ["nome", "categoria", "cor", "material", "estilo", "ocasion", "clima", "padrao"]
+    limit, offset = max(0, int(limit)), max(0, int(offset))
+    conn = _pool().reader()
+    select = f"SELECT {', '.join('items.' + c for c in _COLUMNS)} FROM items"
+
+    match = _fts_query(q)
+    if not match:
+        cur = conn.execute(f"{select} ORDER BY item_id LIMIT ? OFFSET ?", (limit, offset))
+    elif _fts_enabled.get(str(CATALOG_DB)):
+        weights = ", ".join(str(w) for w in _BM25_WEIGHTS)
+        cur = conn.execute(
+            f"""
+            {select}
+            JOIN items_fts ON items_fts.rowid = items.rowid
+            WHERE items_fts MATCH ?
+            ORDER BY bm25(items_fts, {weights}), items.item_id
+            LIMIT ? OFFSET ?
+            """,
+            (match, limit, offset),
         )
-        if q in hay:
-            out.append(it)
-        if len(out) >= limit:
-            break
-    return out
+    else:
+        # fallback sem FTS5: substring no SQL, como a busca antiga
+        hay = " || ' ' || ".join(f"lower(coalesce({c}, ''))" for c in _SEARCH_COLUMNS)
+        like = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        cur = conn.execute(
+            f"{select} WHERE ({hay}) LIKE ? ESCAPE '\\' ORDER BY item_id LIMIT ? OFFSET ?",
+            (like, limit, offset),
+        )
+    return [_row_to_dict(row) for row in cur.fetchall()]
+
+
+# linhas por consulta na exportação: a memória de uma exportação é O(lote),
+# não O(catálogo)
+EXPORT_CHUNK = 500
+
+
+def _projection(fields: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    if fields is None:
+        return _COLUMNS
+    wanted = set(fields)
+    unknown = wanted - set(_COLUMNS)
+    if unknown:
+        raise ValueError(f"campos desconhecidos: {', '.join(sorted(unknown))} (use {', '.join(_COLUMNS)})")
+    if not wanted:
+        raise ValueError("nenhum campo pedido")
+    return tuple(c for c in _COLUMNS if c in wanted)
+
+
+@metrics.query("export_page")
+def export_page(after: Optional[str], limit: int) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Limites de uma página da exportação (keyset em item_id): (último item_id
+    da página, cursor da próxima página). Último None: a página vai até o fim
+    do catálogo; cursor None: não há próxima página. Só lê o índice da PK.
+    """
+    if limit <= 0:
+        return None, None
+    rows = _pool().reader().execute(
+        "SELECT item_id FROM items WHERE item_id > ? ORDER BY item_id LIMIT 2 OFFSET ?",
+        (after or "", limit - 1),
+    ).fetchall()
+    if not rows:
+        return None, None
+    last = rows[0][0]
+    return last, (last if len(rows) > 1 else None)
+
+
+def export_items(after: Optional[str] = None, until: Optional[str] = None,
+                 fields: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Itens com after < item_id <= until (sem limites: todos), em ordem de
+    item_id, como dicts só com os campos pedidos. ValueError (campo que não
+    existe) sai já na chamada, antes de ler o banco.
+
+    Lê em lotes de EXPORT_CHUNK linhas por keyset (item_id > último lido), cada
+    lote numa consulta curta: nada de transação de leitura aberta durante a
+    exportação (não segura o checkpoint do WAL) e cada lote pode rodar numa
+    thread diferente. Escritas concorrentes podem ou não aparecer, mas nenhum
+    item sai duas vezes nem fora de ordem.
+    """
+    cols = _projection(fields)
+    select = ", ".join(("item_id",) + tuple(c for c in cols if c != "item_id"))
+    bound = "" if until is None else " AND item_id <= ?"
+    sql = f"SELECT {select} FROM items WHERE item_id > ?{bound} ORDER BY item_id LIMIT ?"
+    tail = (() if until is None else (until,)) + (EXPORT_CHUNK,)
+
+    def rows() -> Iterator[Dict[str, Any]]:
+        cursor = after or ""
+        while True:
+            with metrics.query("export_chunk"):
+                chunk = _pool().reader().execute(sql, (cursor,) + tail).fetchall()
+            for row in chunk:
+                yield {c: row[c] for c in cols}
+            if len(chunk) < EXPORT_CHUNK:
+                return
+            cursor = chunk[-1]["item_id"]
+
+    return rows()
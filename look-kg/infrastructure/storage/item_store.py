@@ -0,0 +1,148 @@
+# infrastructure/storage/item_store.py
+"""
+Tabela de itens em memória: linhas domain.entities.Item (com __slots__) e
+colunas de códigos inteiros por atributo categórico.
+
+- cada valor categórico (categoria, cor, padrao, material, estilo, ocasion,
+  clima, paleta) é internado num Vocabulary do processo: todos os itens
+  apontam para o mesmo objeto str e o código do valor é estável enquanto o
+  processo vive (None = 0; vocabulários só crescem);
+- um Item ocupa ~1/3 do dict equivalente (sem tabela de hash e sem cópias das
+  strings repetidas); o catálogo, o grafo e os caches de recomendação
+  compartilham os mesmos objetos em vez de copiá-los;
+- ItemStore é uma sequência imutável de Items com índice item_id -> linha
+  estável e colunas int32 (column()), calculadas na primeira leitura, que os
+  kernels vetorizados (graph_builder.scoring_kernel) usam direto.
+"""
+from __future__ import annotations
+
+import threading
+from functools import cached_property
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union, overload
+
+import numpy as np
+
+from domain.entities import FIELDS, Item
+
+# colunas categóricas (internadas e codificadas), na ordem de FIELDS
+CODED = FIELDS[2:]
+
+
+class Vocabulary:
+    """Valores de um atributo -> código inteiro; só cresce (códigos nunca mudam)."""
+
+    def __init__(self):
+        self.values: List[Any] = [None]
+        self.codes: Dict[Any, int] = {None: 0}
+        self._lock = threading.Lock()
+
+    def code(self, v: Any) -> int:
+        c = self.codes.get(v)
+        if c is None:
+            with self._lock:
+                c = self.codes.get(v)
+                if c is None:
+                    self.values.append(v)
+                    c = self.codes[v] = len(self.values) - 1
+        return c
+
+    def intern(self, v: Any) -> Any:
+        """O objeto canônico do valor (o primeiro igual a ele que o vocabulário viu)."""
+        return self.values[self.code(v)]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+VOCABS: Dict[str, Vocabulary] = {f: Vocabulary() for f in CODED}
+_INTERNERS = tuple(VOCABS[f].intern for f in CODED)
+
+
+def make_item(values: Sequence[Any]) -> Item:
+    """Item a partir dos valores na ordem de FIELDS (ex.: linha do SQLite), com os categóricos internados."""
+    return Item(values[0], values[1], *[intern(v) for intern, v in zip(_INTERNERS, values[2:])])
+
+
+def as_item(it: Mapping[str, Any]) -> Item:
+    """O próprio Item, ou um Item novo a partir de um dict (campos ausentes => None)."""
+    if isinstance(it, Item):
+        return it
+    return make_item([it.get(f) for f in FIELDS])
+
+
+class ItemStore(Sequence[Item]):
+    """
+    Sequência imutável de Items (na ordem dada) com índice por item_id e
+    colunas de códigos. item_id repetido: o índice aponta para a última linha.
+
+    without() devolve a cópia sem alguns item_ids em O(removidos): get() e
+    len() já respondem por ela, e linhas/índice só são montados na primeira
+    leitura que precisa da sequência inteira.
+    """
+
+    def __init__(self, items: Iterable[Mapping[str, Any]] = ()):
+        self.rows = tuple(as_item(it) for it in items)
+        self.index = {it.item_id: k for k, it in enumerate(self.rows)}
+        self._columns: Dict[str, np.ndarray] = {}
+        # cópia de without(): as linhas de _base menos as de _gone
+        self._base: Optional[ItemStore] = None
+        self._gone: FrozenSet[str] = frozenset()
+
+    def without(self, item_ids: Iterable[str]) -> "ItemStore":
+        """Cópia sem as linhas desses item_ids (os ausentes são ignorados)."""
+        base, gone = (self, frozenset()) if self._base is None else (self._base, self._gone)
+        gone = gone.union(i for i in item_ids if base.get(i) is not None)
+        if len(base.index) != len(base.rows) or len(gone) > len(base) // 4:
+            # item_id repetido na base, ou a cópia já diverge muito dela: monta agora
+            return ItemStore(it for it in base.rows if it.item_id not in gone)
+        store = ItemStore.__new__(ItemStore)
+        store._columns, store._base, store._gone = {}, base, gone
+        return store
+
+    # só cópias de without() chegam aqui: as demais recebem rows e index no __init__
+    @cached_property
+    def rows(self) -> Tuple[Item, ...]:
+        base, gone = self._base, self._gone
+        return tuple(it for it in base.rows if it.item_id not in gone) if base is not None else ()
+
+    @cached_property
+    def index(self) -> Dict[str, int]:  # type: ignore[override]  # dict, não o index() de Sequence
+        return {it.item_id: k for k, it in enumerate(self.rows)}
+
+    @overload
+    def __getitem__(self, k: int) -> Item: ...
+    @overload
+    def __getitem__(self, k: slice) -> Tuple[Item, ...]: ...
+    def __getitem__(self, k: Union[int, slice]):
+        return self.rows[k]
+
+    def __len__(self) -> int:
+        if self._base is not None:
+            return len(self._base) - len(self._gone)
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Item]:
+        return iter(self.rows)
+
+    def get(self, item_id: str) -> Optional[Item]:
+        if self._base is not None:
+            return None if item_id in self._gone else self._base.get(item_id)
+        k = self.index.get(item_id)
+        return None if k is None else self.rows[k]
+
+    def position(self, item_id: str) -> Optional[int]:
+        return self.index.get(item_id)
+
+    @staticmethod
+    def vocab(field: str) -> Vocabulary:
+        return VOCABS[field]
+
+    def column(self, field: str) -> np.ndarray:
+        """Códigos (VOCABS[field]) do atributo, uma posição por linha."""
+        col = self._columns.get(field)
+        if col is None:
+            code = VOCABS[field].code
+            col = np.fromiter((code(getattr(it, field)) for it in self.rows), dtype=np.int32, count=len(self.rows))
+            col.flags.writeable = False
+            self._columns[field] = col  # corrida entre leitores só recalcula o mesmo array
+        return col
@@ -0,0 +1,145 @@
+# infrastructure/storage/sqlite_pool.py
+"""
+Conexões SQLite de longa duração para o catálogo.
+
+- WAL + pragmas ajustados: leitores não bloqueiam o escritor (e vice-versa);
+- uma conexão de leitura por thread (o threadpool do FastAPI reaproveita threads);
+- uma única conexão de escrita, serializada por lock;
+- o init (schema/migrações) roda uma vez por processo, na primeira conexão;
+- `version` sobe a cada escrita pelo pool que mudou linhas e, via poll_version(),
+  quando outro processo altera o arquivo (PRAGMA data_version de uma conexão
+  vigia, que nunca escreve e não disputa o lock do escritor).
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+# Pragmas por conexão (journal_mode=WAL é persistido no arquivo)
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",      # seguro com WAL; fsync só no checkpoint
+    "PRAGMA cache_size = -20000",       # ~20 MB de page cache por conexão
+    "PRAGMA mmap_size = 268435456",     # 256 MB mapeados
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA recursive_triggers = ON",   # REPLACE dispara triggers de delete (índices derivados)
+)
+
+
+def _read_data_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+class SQLitePool:
+    def __init__(self, path: Path, init: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.path = Path(path)
+        self._init = init
+        self._ready = False
+        self._init_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._watcher: Optional[sqlite3.Connection] = None
+        self._poll_lock = threading.Lock()  # version e _data_version
+        self._local = threading.local()
+        self._all: List[sqlite3.Connection] = []
+        self.version = 0
+        self._data_version: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # check_same_thread=False: o escritor é compartilhado (sempre sob _write_lock)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for p in PRAGMAS:
+            conn.execute(p)
+        with self._init_lock:
+            self._all.append(conn)
+        return conn
+
+    def ensure_ready(self) -> None:
+        """Roda o init (schema, migrações) uma única vez por processo."""
+        if self._ready:
+            return
+        with self._write_lock:
+            if self._ready:
+                return
+            if self._init is not None:
+                conn = self._writer_conn()
+                self._init(conn)
+                conn.commit()
+            self._ready = True
+
+    def _writer_conn(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    def _watcher_conn(self) -> sqlite3.Connection:
+        if self._watcher is None:
+            self._watcher = self._connect()
+        return self._watcher
+
+    def reader(self) -> sqlite3.Connection:
+        """Conexão de leitura da thread atual (criada na primeira chamada)."""
+        self.ensure_ready()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Conexão única de escrita; commit ao sair, rollback em erro. `version` só sobe se alguma linha mudou."""
+        self.ensure_ready()
+        with self._write_lock:
+            conn = self._writer_conn()
+            before = conn.total_changes
+            try:
+                yield conn
+                if conn.total_changes == before:
+                    conn.commit()
+                    return
+                # até o commit o arquivo segue travado para escrita: o vigia ainda não viu
+                # este commit, e o data_version do escritor (cego às próprias escritas)
+                # acusa outro processo que grave entre o commit e a releitura do vigia
+                dv = _read_data_version(conn)
+                with self._poll_lock:
+                    self._poll()
+                    conn.commit()
+                    self._data_version = _read_data_version(self._watcher_conn())
+                    self.version += 1 if _read_data_version(conn) == dv else 2
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def poll_version(self) -> int:
+        """Versão atual, contando também commits de outras conexões/processos (sem esperar o escritor)."""
+        self.ensure_ready()
+        with self._poll_lock:
+            self._poll()
+            return self.version
+
+    def _poll(self) -> None:
+        # o data_version do vigia muda a cada commit de outra conexão, inclusive do
+        # nosso escritor; writer() relê o vigia após o commit para não contar duas vezes
+        dv = _read_data_version(self._watcher_conn())
+        if self._data_version is not None and dv != self._data_version:
+            self.version += 1
+        self._data_version = dv
+
+    def close(self) -> None:
+        with self._write_lock, self._init_lock:
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all.clear()
+            self._writer = self._watcher = None
+            self._local = threading.local()
+            self._ready = False
@@ -0,0 +1,49 @@
+# ops/bench/catalog_gen.py
+"""
+Catálogo sintético determinístico a partir dos vocabulários do rules_engine.
+
+Mesma semente => mesmos itens em qualquer máquina: o k-ésimo item não depende
+do tamanho pedido (o catálogo de 1k é prefixo do de 10k). Itens já passam por
+normalize_item (paleta preenchida, valores válidos) e o nome é único por
+categoria, então servem direto para catalog_repo.add_items e para o grafo.
+"""
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List
+
+from infrastructure.graph_builder import rules_engine as re
+
+# tamanhos nomeados aceitos por --sizes (run.py)
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+# fração de itens sem material (campo opcional no catálogo real)
+NO_MATERIAL = 0.1
+
+Item = Dict[str, Any]
+
+
+def parse_size(s: str) -> int:
+    return SIZES.get(s.strip().lower()) or int(s)
+
+
+def generate_catalog(n: int, seed: int = 0, prefix: str = "it") -> List[Item]:
+    """n itens com ids f"{prefix}{k:06d}"; semente/prefixo diferentes geram lotes disjuntos."""
+    rnd = random.Random(seed)
+    out: List[Item] = []
+    for k in range(n):
+        cat = rnd.choice(re.CATEGORIES)
+        cor = rnd.choice(re.COLORS)
+        estilo = rnd.choice(re.STYLES)
+        out.append(re.normalize_item({
+            "item_id": f"{prefix}{k:06d}",
+            "nome": f"{cat} {cor} {estilo} {prefix}{k}",
+            "categoria": cat,
+            "cor": cor,
+            "padrao": rnd.choice(re.PATTERNS),
+            "material": None if rnd.random() < NO_MATERIAL else rnd.choice(re.MATERIALS),
+            "estilo": estilo,
+            "ocasion": rnd.choice(re.OCCASIONS),
+            "clima": rnd.choice(re.CLIMES),
+        }))
+    return out
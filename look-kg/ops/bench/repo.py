@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência do catalog_repo: conexão por chamada (como era antes)
+vs. pool de conexões (WAL, leitores por thread, escritor único).
+
+Roda offline, num catalog.db temporário:
+
+    python3 ops/bench/repo.py [--items 5000] [--ops 2000] [--threads 8]
+
+O modo "antes" reproduz o padrão antigo de cada chamada: abre uma conexão,
+roda o schema e a checagem de migração, fecha, abre outra para a consulta.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    from ops.bench.stats import percentile
+    s = sorted(samples)
+    return {"mean_ms": statistics.fmean(s) * 1e3, "p50_ms": percentile(s, 0.50) * 1e3,
+            "p95_ms": percentile(s, 0.95) * 1e3}
+
+
+def _run(fn: Callable[[int], None], ops: int, threads: int) -> Dict[str, float]:
+    samples: List[float] = []
+    lock = threading.Lock()
+
+    def worker(tid: int) -> None:
+        local = []
+        for k in range(ops // threads):
+            t0 = time.perf_counter()
+            fn(tid * ops + k)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            samples.extend(local)
+
+    ts = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return _percentiles(samples)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=5000)
+    ap.add_argument("--ops", type=int, default=2000)
+    ap.add_argument("--threads", type=int, default=8)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="lookkg-bench-")
+    os.environ["DATA_DIR"] = tmp
+    from infrastructure.storage import catalog_repo as repo
+
+    rnd = random.Random(42)
+    cats = ["blusa", "saia", "calca", "sapato", "bolsa", "acessorio", "jaqueta"]
+    repo.save_all([
+        {"item_id": f"it{i:06d}", "nome": f"peca {i}", "categoria": rnd.choice(cats), "cor": "preto"}
+        for i in range(args.items)
+    ])
+    ids = [f"it{i:06d}" for i in range(args.items)]
+
+    def legacy_conn() -> sqlite3.Connection:
+        # padrão antigo: _ensure_db() (connect + schema + checagem de migração) + _get_conn()
+        c = sqlite3.connect(str(repo.CATALOG_DB))
+        c.executescript(repo._SCHEMA)
+        c.commit()
+        c.execute("SELECT COUNT(*) AS n FROM items").fetchone()
+        c.close()
+        c = sqlite3.connect(str(repo.CATALOG_DB))
+        c.row_factory = sqlite3.Row
+        return c
+
+    def legacy_get(k: int) -> None:
+        c = legacy_conn()
+        try:
+            c.execute("SELECT * FROM items WHERE item_id = ?", (ids[k % len(ids)],)).fetchone()
+        finally:
+            c.close()
+
+    legacy_write_lock = threading.Lock()
+
+    def legacy_add(k: int) -> None:
+        with legacy_write_lock:
+            c = legacy_conn()
+            try:
+                c.execute("UPDATE items SET cor = ? WHERE item_id = ?", ("branco", ids[k % len(ids)]))
+                c.commit()
+            finally:
+                c.close()
+
+    def pooled_get(k: int) -> None:
+        repo.get_item(ids[k % len(ids)])
+
+    def pooled_add(k: int) -> None:
+        it = repo.get_item(ids[k % len(ids)])
+        it["cor"] = "branco"
+        repo.add_item(it)
+
+    rows = []
+    for name, fn_legacy, fn_pool in [("get_item", legacy_get, pooled_get),
+                                     ("add_item", legacy_add, pooled_add)]:
+        for threads in (1, args.threads):
+            before = _run(fn_legacy, args.ops, threads)
+            after = _run(fn_pool, args.ops, threads)
+            rows.append((name, threads, before, after))
+
+    print(f"catalog: {args.items} itens em {tmp}")
+    print("latência em ms")
+    print(f"{'op':<10}{'thr':>4}  {'antes p50':>10}{'antes p95':>10}  {'depois p50':>11}{'depois p95':>11}")
+    for name, threads, b, a in rows:
+        print(f"{name:<10}{threads:>4}  {b['p50_ms']:>10.3f}{b['p95_ms']:>10.3f}  "
+              f"{a['p50_ms']:>11.3f}{a['p95_ms']:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
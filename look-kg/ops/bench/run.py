@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline, em processo: catálogo sintético + cenários de ops/bench/scenarios.py.
+
+    python3 ops/bench/run.py [--sizes 1k,10k] [--ops 200] [--seed 0]
+                             [--graph-max 10000] [--only graph.rebuild,...]
+                             [--out bench.json] [--baseline baseline.json]
+                             [--tolerance 0.25]
+
+Roda num DATA_DIR temporário (catalog.db, snapshot e grafo compartilhado
+descartáveis), sem rede. O grafo segue as mesmas variáveis da API
+(LOOKKG_GRAPH_BACKEND, LOOKKG_GRAPH_TOPK, LOOKKG_GRAPH_WEIGHTS, ...), que vão
+registradas no JSON; o cache de resultados fica desligado. Tamanhos acima de
+--graph-max só rodam os cenários do catálogo (o rebuild é O(n²): 100k itens
+pedem esparsificação e tempo). Grafo denso de 10k: ~4 GB no backend csr e
+bem mais no backend dict; use LOOKKG_GRAPH_BACKEND=csr e/ou LOOKKG_GRAPH_TOPK.
+
+Saída: JSON com ambiente, parâmetros e {tamanho: {cenário: métricas}}. Com
+--baseline, compara a métrica principal de cada cenário (p50 ou segundos) e
+sai com código 1 se alguma piorou mais que --tolerance (fração).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+FORMAT = 1
+# diferenças abaixo disto (ms) são ruído, mesmo acima da tolerância
+MIN_DELTA_MS = 0.05
+
+
+def _environment() -> Dict[str, Any]:
+    import numpy
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": numpy.__version__,
+            "config": {k: v for k, v in sorted(os.environ.items()) if k.startswith("LOOKKG_")}}
+
+
+def run(sizes: List[int], ops: int, seed: int, graph_max: int, only: Optional[List[str]]) -> Dict[str, Any]:
+    from application.services import RecommendationService
+    from ops.bench import scenarios
+
+    if only:
+        unknown = set(only) - {name for name, _, _ in scenarios.SCENARIOS}
+        if unknown:
+            raise SystemExit(f"cenário desconhecido: {', '.join(sorted(unknown))}")
+    svc = RecommendationService()
+    results: Dict[str, Dict[str, Any]] = {}
+    for n in sizes:
+        b = scenarios.Bench(n, ops, seed, svc)
+        wanted = [(name, fn, g) for name, fn, g in scenarios.SCENARIOS if not only or name in only]
+        graph = n <= graph_max and any(g for _, _, g in wanted)
+        out = results[str(n)] = {}
+        for name, fn, needs_graph in scenarios.SCENARIOS:
+            # pré-requisitos rodam mesmo fora de --only: a carga do catálogo e, com cenários do grafo, o rebuild
+            required = name == "catalog.add_items" or (name == "graph.rebuild" and graph)
+            if not required and only and name not in only:
+                continue
+            if needs_graph and not graph:
+                out[name] = {"skipped": f"n > graph-max ({graph_max})"}
+                continue
+            t0 = time.perf_counter()
+            out[name] = fn(b)
+            print(f"[{n}] {name}: {_summary(out[name])} ({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+    return {"format": FORMAT, "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "env": _environment(),
+            "params": {"sizes": sizes, "ops": ops, "seed": seed, "graph_max": graph_max, "only": only},
+            "results": results}
+
+
+def _summary(r: Dict[str, Any]) -> str:
+    if "p50_ms" in r:
+        return f"p50 {r['p50_ms']:.3f} ms, p95 {r['p95_ms']:.3f} ms"
+    if "seconds" in r:
+        return f"{r['seconds']:.3f} s"
+    return r.get("skipped", "")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Imprime a comparação com o baseline (stderr, o stdout pode ser o JSON); devolve os cenários que pioraram além da tolerância."""
+    from ops.bench.scenarios import primary_metric
+
+    worse = []
+    print(f"{'tamanho':>8}  {'cenário':<32}{'métrica':>9}{'baseline':>12}{'atual':>12}{'razão':>8}", file=sys.stderr)
+    for size, scen in current["results"].items():
+        for name, r in scen.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base or "skipped" in r or "skipped" in base:
+                continue
+            metric, value = primary_metric(r)
+            ref = base.get(metric)
+            if ref is None:
+                continue
+            ratio = value / ref if ref else float("inf")
+            delta_ms = (value - ref) * (1e3 if metric == "seconds" else 1.0)
+            flag = ""
+            if ratio > 1 + tolerance and delta_ms > MIN_DELTA_MS:
+                worse.append(f"{size}/{name}")
+                flag = "  PIOROU"
+            print(f"{size:>8}  {name:<32}{metric:>9}{ref:>12.3f}{value:>12.3f}{ratio:>8.2f}{flag}", file=sys.stderr)
+    return worse
+
+
+def main() -> None:
+    from ops.bench.catalog_gen import parse_size
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1k,10k", help="tamanhos do catálogo (1k, 10k, 100k ou número)")
+    ap.add_argument("--ops", type=int, default=200, help="repetições por cenário cronometrado")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--graph-max", type=int, default=10_000, help="maior catálogo com cenários do grafo")
+    ap.add_argument("--only", default="", help="cenários separados por vírgula (padrão: todos)")
+    ap.add_argument("--out", type=Path, help="grava o resultado em JSON (senão, stdout)")
+    ap.add_argument("--baseline", type=Path, help="JSON de uma rodada anterior para comparar")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="lookkg-bench-")
+    os.environ["DATA_DIR"] = tmp
+    os.environ["LOOKKG_RESULT_CACHE_SIZE"] = "0"
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    only = [s.strip() for s in args.only.split(",") if s.strip()] or None
+    result = run(sizes, args.ops, args.seed, args.graph_max, only)
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(text + "\n", encoding="utf-8")
+        print(f"resultado em {args.out}", file=sys.stderr)
+    else:
+        print(text)
+    if args.baseline:
+        worse = compare(result, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        if worse:
+            print(f"pioraram mais de {args.tolerance:.0%}: {', '.join(worse)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
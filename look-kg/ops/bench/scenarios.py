@@ -0,0 +1,142 @@
+# ops/bench/scenarios.py
+"""
+Cenários cronometrados, em processo, sobre um catálogo sintético (catalog_gen).
+
+Cada cenário recebe o Bench do tamanho corrente e devolve um dict de métricas:
+operações repetidas viram {"n", "mean_ms", "p50_ms", "p95_ms", "max_ms"};
+operações únicas (carga, rebuild) viram {"seconds"}. O primeiro campo de
+METRICS presente é o que run.py compara com o baseline.
+
+Os cenários rodam na ordem de SCENARIOS e dependem dela: a carga do catálogo
+vem antes da busca, o rebuild antes das recomendações, e as escritas (upsert no
+grafo, add_item no catálogo) ficam por último para não mudar o que os
+anteriores medem. Configuração do grafo e do cache vem do ambiente, como na
+API (LOOKKG_GRAPH_BACKEND, LOOKKG_GRAPH_TOPK, ...); run.py desliga o cache de
+resultados para medir o cálculo.
+"""
+from __future__ import annotations
+
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from application.services import RecommendationService
+from infrastructure.graph_builder import rules_engine as re
+from infrastructure.storage import catalog_repo
+
+from ops.bench.catalog_gen import generate_catalog
+from ops.bench.stats import percentile
+
+Item = Dict[str, Any]
+
+# métrica comparada com o baseline, na ordem de preferência
+METRICS = ("p50_ms", "seconds")
+
+
+def _stats(samples: List[float]) -> Dict[str, Any]:
+    s = sorted(samples)
+    return {"n": len(s), "mean_ms": statistics.fmean(s) * 1e3, "p50_ms": percentile(s, 0.50) * 1e3,
+            "p95_ms": percentile(s, 0.95) * 1e3, "max_ms": s[-1] * 1e3}
+
+
+def _timed(fn: Callable[[Any], Any], args: Iterable[Any]) -> Dict[str, Any]:
+    samples = []
+    for a in args:
+        t0 = time.perf_counter()
+        fn(a)
+        samples.append(time.perf_counter() - t0)
+    return _stats(samples)
+
+
+class Bench:
+    """Estado de um tamanho de catálogo, compartilhado pelos cenários em sequência."""
+
+    def __init__(self, n: int, ops: int, seed: int, svc: RecommendationService):
+        self.n, self.ops, self.seed, self.svc = n, ops, seed, svc
+        self.items = generate_catalog(n, seed)
+        self.catalog: List[Item] = []  # como gravado no catalog.db (após catalog.add_items)
+
+    def rnd(self, salt: str) -> random.Random:
+        # sorteio por cenário: rodar só um deles (--only) não muda as entradas dos outros
+        return random.Random(f"{self.seed}:{self.n}:{salt}")
+
+    def contexts(self, salt: str) -> List[Item]:
+        rnd = self.rnd(salt)
+        return [rnd.choice(self.catalog) for _ in range(self.ops)]
+
+
+def catalog_add_items(b: Bench) -> Dict[str, Any]:
+    """Carga do catálogo inteiro numa transação (catalog_repo.add_items) sobre a tabela vazia."""
+    catalog_repo.save_all([])
+    t0 = time.perf_counter()
+    errors = catalog_repo.add_items([dict(it) for it in b.items])
+    elapsed = time.perf_counter() - t0
+    b.catalog = catalog_repo.load_all()
+    return {"seconds": elapsed, "items": len(b.catalog), "errors": sum(e is not None for e in errors)}
+
+
+def catalog_search(b: Bench) -> Dict[str, Any]:
+    rnd = b.rnd("search")
+    words = re.CATEGORIES + re.COLORS + re.STYLES + re.MATERIALS
+    queries = [" ".join(rnd.sample(words, rnd.choice((1, 1, 2)))) for _ in range(b.ops)]
+    return _timed(lambda q: catalog_repo.search(q, limit=20), queries)
+
+
+def graph_rebuild(b: Bench) -> Dict[str, Any]:
+    rev, items = catalog_repo.load_all_with_revision()
+    t0 = time.perf_counter()
+    res = b.svc.graph.rebuild(items, revision=rev)
+    return {"seconds": time.perf_counter() - t0, **res}
+
+
+def suggest_complements(b: Bench) -> Dict[str, Any]:
+    return _timed(lambda it: b.svc.suggest_complements([it], top_k=10), b.contexts("complementar"))
+
+
+def complete_look(b: Bench) -> Dict[str, Any]:
+    rnd = b.rnd("completar-alvos")
+
+    def targets(it: Item) -> List[str]:
+        return rnd.sample([c for c in re.CATEGORIES if c != it["categoria"]], 2)
+
+    calls = [(it, targets(it)) for it in b.contexts("completar")]
+    return _timed(lambda c: b.svc.complete_look([c[0]], c[1], top_k=1), calls)
+
+
+def graph_upsert_item(b: Bench) -> Dict[str, Any]:
+    """Itens novos entrando no grafo um a um (GraphManager.upsert_item); o catálogo não é tocado."""
+    items = list(b.catalog)
+
+    def upsert(it: Item) -> None:
+        items.append(it)
+        b.svc.graph.upsert_item(it, items)
+
+    return _timed(upsert, generate_catalog(b.ops, b.seed + 1, prefix="up"))
+
+
+def catalog_add_item(b: Bench) -> Dict[str, Any]:
+    """Metade atualiza itens existentes (outra cor), metade insere itens novos."""
+    rnd = b.rnd("add_item")
+    fresh = generate_catalog(b.ops - b.ops // 2, b.seed + 2, prefix="add")
+    updates = [dict(rnd.choice(b.catalog), cor=rnd.choice(re.COLORS)) for _ in range(b.ops // 2)]
+    return _timed(lambda it: catalog_repo.add_item(dict(it)), updates + fresh)
+
+
+# (nome, função, precisa do grafo)
+SCENARIOS: List[Tuple[str, Callable[[Bench], Dict[str, Any]], bool]] = [
+    ("catalog.add_items", catalog_add_items, False),
+    ("catalog.search", catalog_search, False),
+    ("graph.rebuild", graph_rebuild, True),
+    ("recommend.suggest_complements", suggest_complements, True),
+    ("recommend.complete_look", complete_look, True),
+    ("graph.upsert_item", graph_upsert_item, True),
+    ("catalog.add_item", catalog_add_item, False),
+]
+
+
+def primary_metric(result: Dict[str, Any]) -> Tuple[str, float]:
+    for m in METRICS:
+        if m in result:
+            return m, result[m]
+    raise KeyError("cenário sem métrica comparável")
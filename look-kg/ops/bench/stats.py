@@ -0,0 +1,10 @@
+# ops/bench/stats.py
+"""Estatística dos benchmarks (scenarios.py e repo.py)."""
+from __future__ import annotations
+
+from typing import Sequence
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Percentil q (0..1) por posição, sobre amostras já ordenadas."""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -12,3 +12,48 @@ CREATE TABLE IF NOT EXISTS items (
     clima     TEXT,
     paleta    TEXT
 );
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_items_nome_categoria ON items (nome, categoria);
+
+-- Revisão persistente do catálogo (ver catalog_repo._META_SCHEMA)
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('revision', 0);
+
+CREATE TRIGGER IF NOT EXISTS items_rev_ai AFTER INSERT ON items BEGIN
+    UPDATE catalog_meta SET value = value + 1 WHERE key = 'revision';
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_rev_ad AFTER DELETE ON items BEGIN
+    UPDATE catalog_meta SET value = value + 1 WHERE key = 'revision';
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_rev_au AFTER UPDATE ON items BEGIN
+    UPDATE catalog_meta SET value = value + 1 WHERE key = 'revision';
+END;
+
+-- Busca full-text (FTS5) sincronizada por triggers; ver catalog_repo._FTS_SCHEMA
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    nome, categoria, cor, material, estilo, ocasion, clima, padrao,
+    content='items', content_rowid='rowid',
+    tokenize="unicode61 remove_diacritics 2 tokenchars '-'"
+);
+
+CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts (rowid, nome, categoria, cor, material, estilo, ocasion, clima, padrao)
+    VALUES (new.rowid, new.nome, new.categoria, new.cor, new.material, new.estilo, new.ocasion, new.clima, new.padrao);
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, nome, categoria, cor, material, estilo, ocasion, clima, padrao)
+    VALUES ('delete', old.rowid, old.nome, old.categoria, old.cor, old.material, old.estilo, old.ocasion, old.clima, old.padrao);
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, nome, categoria, cor, material, estilo, ocasion, clima, padrao)
+    VALUES ('delete', old.rowid, old.nome, old.categoria, old.cor, old.material, old.estilo, old.ocasion, old.clima, old.padrao);
+    INSERT INTO items_fts (rowid, nome, categoria, cor, material, estilo, ocasion, clima, padrao)
+    VALUES (new.rowid, new.nome, new.categoria, new.cor, new.material, new.estilo, new.ocasion, new.clima, new.padrao);
+END;
@@ -15,6 +15,9 @@ def init_db(conn: sqlite3.Connection) -> None:
     with open(SCHEMA_SQL, "r", encoding="utf-8") as f:
         schema_sql = f.read()
     conn.executescript(schema_sql)
+    # A base pode ser anterior ao índice full-text: sincroniza com items antes de
+    # qualquer DELETE/INSERT (os triggers assumem índice e tabela em acordo)
+    conn.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
     conn.commit()
 
 
@@ -6,7 +6,7 @@ import json
 import urllib.request
 import time
 from pathlib import Path
-from typing import Dict, Any, Iterable
+from typing import Dict, Any, Iterable, List
 
 # URL da API (pode ser sobrescrita por variável de ambiente)
 API = os.getenv("API_URL", "http://localhost:8000")
@@ -26,11 +26,17 @@ def wait_api(url, tries=20):
     return False
 
 
-def post(path: str, data: Dict[str, Any]):
-    req = urllib.request.Request(API + path, method="POST")
-    req.add_header("Content-Type", "application/json")
-    body = json.dumps(data).encode("utf-8")
-    urllib.request.urlopen(req, body, timeout=10).read()
+# Itens por requisição ao /v1/items/bulk
+BATCH_SIZE = int(os.getenv("SEED_BATCH", "500"))
+
+
+def post_bulk(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Envia um lote como NDJSON; a API grava tudo numa transação e devolve erros por item."""
+    req = urllib.request.Request(API + "/v1/items/bulk", method="POST")
+    req.add_header("Content-Type", "application/x-ndjson")
+    body = "\n".join(json.dumps(it, ensure_ascii=False) for it in items).encode("utf-8")
+    with urllib.request.urlopen(req, body, timeout=120) as resp:
+        return json.loads(resp.read().decode("utf-8"))
 
 
 def load_items_from_db() -> Iterable[Dict[str, Any]]:
@@ -186,12 +192,26 @@ def main():
     if not wait_api(API + "/health"):
         raise SystemExit("API não respondeu no tempo esperado.")
 
-    count = 0
+    count, saved, batch = 0, 0, []
     for item in iter_seed_items():
-        post("/v1/items", item)
-        count += 1
-        print(f"[SEED] item: {item.get('item_id') or item.get('nome')}")
-    print(f"Seed OK. Total de itens enviados: {count}")
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            saved += _send(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        saved += _send(batch)
+        count += len(batch)
+    print(f"Seed OK. Total de itens enviados: {count} (gravados: {saved})")
+
+
+def _send(batch: List[Dict[str, Any]]) -> int:
+    res = post_bulk(batch)
+    for err in res.get("errors", []):
+        it = batch[err["index"]]
+        print(f"[SEED] rejeitado: {it.get('item_id') or it.get('nome')} -> {err['error']}")
+    print(f"[SEED] lote: {res.get('saved', 0)}/{len(batch)} itens gravados")
+    return res.get("saved", 0)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,47 @@
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from infrastructure.observability import metrics
 from presentation.api import routers
 
-app = FastAPI(title="Look-KG API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # snapshot válido => grafo pronto já no startup; senão rebuild em background
+    routers.svc.warm_start()
+    yield
+    routers.svc.save_graph_snapshot()
+
+class RequestMetrics:
+    """
+    Latência por rota (ASGI puro: não bufferiza respostas em streaming).
+    O rótulo é o template da rota ("/v1/items/{item_id}"), não o path: a
+    cardinalidade fica limitada às rotas declaradas.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = 500  # exceção antes do início da resposta
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - t0, scope["method"], route, str(status))
+
+app = FastAPI(title="Look-KG API", version="0.1.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -10,8 +49,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetrics)
 app.include_router(routers.router)
 
 @app.get("/health")
 def health():
     return {"status":"ok"}
+
+@app.get("/ready")
+def ready():
+    # processo vivo != grafo carregado: 503 enquanto o rebuild não termina
+    st = routers.svc.graph_status()
+    return st if st["status"] == "ready" else JSONResponse(st, status_code=503)
+
+@app.get("/metrics")
+def prometheus_metrics():
+    # formato texto do Prometheus; métricas deste processo (um registro por worker)
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,9 +1,15 @@
 # presentation/api/routers.py
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from itertools import islice
+from typing import List, Dict, Any, Iterator, Literal, Optional, Tuple, Union
 from application.services import RecommendationService
-from presentation.api.schemas import ItemCreate, RecommendComplementarIn, RecommendCompletarIn
-from infrastructure.storage import catalog_repo
+from domain.entities import Item
+from presentation.api.schemas import (ItemCreate, ItemsDeleteIn, RecommendBatchIn, RecommendComplementarIn,
+                                      RecommendCompletarIn, RecommendLooksIn, RecommendSeed)
+from infrastructure.storage import catalog_repo, catalog_cache
 from infrastructure.graph_builder import rules_engine as re
 
 router = APIRouter(prefix="/v1")
@@ -22,6 +28,45 @@ def rebuild_graph():
     res = svc.rebuild_graph()
     return {"ok": True, **res}
 
+def _json_batches(rows: Iterator[Dict[str, Any]]) -> Iterator[List[str]]:
+    # um bloco por lote do catalog_repo: cada next() do StreamingResponse é um salto de thread
+    while True:
+        batch = [json.dumps(r, ensure_ascii=False) for r in islice(rows, catalog_repo.EXPORT_CHUNK)]
+        if not batch:
+            return
+        yield batch
+
+def _ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    for batch in _json_batches(rows):
+        yield ("\n".join(batch) + "\n").encode("utf-8")
+
+def _json_array(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    yield b"["
+    sep = ""
+    for batch in _json_batches(rows):
+        yield (sep + ",".join(batch)).encode("utf-8")
+        sep = ","
+    yield b"]"
+
+# antes de /items/{item_id}: senão "catalog" casa como item_id
+@router.get("/items/catalog")
+def items_catalog(after: Optional[str] = None, limit: int = Query(0, ge=0), fields: Optional[str] = None,
+                  fmt: Literal["json", "ndjson"] = Query("json", alias="format")):
+    # exportação em streaming, em ordem de item_id, memória constante: `after` é
+    # o cursor (último item_id já lido), `limit` o tamanho da página (0 = até o
+    # fim), `fields` a projeção (ex.: item_id,nome); a próxima página vem no
+    # header X-Next-Cursor (ausente na última)
+    cols = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    last, cursor = catalog_repo.export_page(after, limit)
+    try:
+        rows = catalog_repo.export_items(after, last, cols)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    headers = {"X-Next-Cursor": cursor} if cursor else {}
+    if fmt == "ndjson":
+        return StreamingResponse(_ndjson(rows), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(_json_array(rows), media_type="application/json", headers=headers)
+
 @router.get("/items/{item_id}")
 def get_item(item_id: str):
     it = catalog_repo.get_item(item_id)
@@ -32,40 +77,99 @@ def get_item(item_id: str):
 @router.post("/items/search")
 def search_items(body: Dict[str, Any]):
     query = (body or {}).get("query",""); limit = (body or {}).get("limit", 100)
-    return svc.search_items(query, limit=limit)
+    offset = (body or {}).get("offset", 0)
+    return svc.search_items(query, limit=limit, offset=offset)
+
+def _explained(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # cópias: as linhas podem estar no cache de resultados
+    return [{**r, "rationale": re.reason_texts(r["reasons"])} for r in rows]
+
+@router.get("/recommend/reasons")
+def recommend_reasons():
+    # tabela dos códigos em "reasons" (só cresce: códigos antigos não mudam de texto)
+    return {"reasons": dict(enumerate(re.REASONS))}
 
 @router.post("/recommend/complementar")
 def recommend_complementar(body: RecommendComplementarIn):
-    selected: List[Dict[str, Any]] = []
-    all_items = catalog_repo.load_all()
+    selected: List[Item] = []
+    snap = catalog_cache.snapshot()  # sem SQL enquanto o catálogo não muda
     if body.item_id:
-        it = catalog_repo.get_item(body.item_id)
+        it = snap.get(body.item_id)
         if it: selected.append(it)
     elif body.itens:
         names = set([s.strip().lower() for s in body.itens])
-        for it in all_items:
-            if it.get("nome") in names or it.get("item_id") in names:
-                selected.append(it)
+        selected = snap.lookup(names)
     elif body.query:
         q = body.query.strip().lower()
-        for it in all_items:
-            if q in it.get("nome",""):
-                selected.append(it); break
-    if not selected and all_items:
-        selected = [all_items[0]]
+        it = snap.first_name_match(q)
+        if it: selected.append(it)
+    if not selected and snap.items:
+        selected = [snap.items[0]]
 
     res = svc.suggest_complements(selected, top_k=body.top_k, threshold=body.threshold, constraints=body.constraints)
+    if body.explain:
+        res["results"] = _explained(res["results"])
     return res
 
+def _seed_context(snap: catalog_cache.CatalogSnapshot, seed: Union[str, RecommendSeed]) -> Optional[List[Item]]:
+    if isinstance(seed, str):
+        it = snap.get(seed)
+        return [it] if it else None
+    if seed.item_id:
+        it = snap.get(seed.item_id)
+        return [it] if it else None
+    if seed.itens:
+        return snap.lookup(set([s.strip().lower() for s in seed.itens])) or None
+    return None
+
+@router.post("/recommend/complementar/batch")
+def recommend_complementar_batch(body: RecommendBatchIn):
+    # uma linha NDJSON por semente, na ordem: {"index", "results"} ou {"index", "error"};
+    # candidatos e scores por par são compartilhados entre as sementes
+    snap = catalog_cache.snapshot()
+    contexts = [_seed_context(snap, seed) for seed in body.seeds]
+    found = [ctx for ctx in contexts if ctx]
+
+    def lines() -> Iterator[bytes]:
+        results = svc.suggest_complements_batch(found, top_k=body.top_k, threshold=body.threshold,
+                                                constraints=body.constraints)
+        for idx, ctx in enumerate(contexts):
+            row: Dict[str, Any] = {"index": idx, **next(results)} if ctx else {"index": idx, "error": "semente não encontrada no catálogo"}
+            if body.explain and "results" in row:
+                row["results"] = _explained(row["results"])
+            yield (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/recommend/cache")
+def recommend_cache_stats():
+    # hits/misses/evicções do cache de resultados (complementar e completar)
+    return svc.cache_stats()
+
 @router.post("/recommend/completar")
 def recommend_completar(body: RecommendCompletarIn):
     names = set([s.strip().lower() for s in body.itens])
-    sels = [it for it in catalog_repo.load_all() if it.get("nome") in names or it.get("item_id") in names]
+    sels = catalog_cache.snapshot().lookup(names)
     res = svc.complete_look(sels, body.targets, top_k=body.top_k)
+    if body.explain:
+        res["targets"] = {t: _explained(rows) for t, rows in res["targets"].items()}
     if res.get("missing"):
         res["message"] = "Alguns alvos não puderam ser sugeridos (já existem no look, papel único ocupado ou sem item compatível)."
     return res
 
+@router.post("/recommend/looks")
+def recommend_looks(body: RecommendLooksIn):
+    # N looks completos numa chamada, no lugar de várias /recommend/completar
+    names = set([s.strip().lower() for s in body.itens])
+    sels = catalog_cache.snapshot().lookup(names)
+    res = svc.search_looks(sels, body.targets, n=body.n, max_expansions=body.max_expansions,
+                           time_budget_ms=body.time_budget_ms)
+    if body.explain:
+        res["looks"] = [{**look, "items": _explained(look["items"])} for look in res["looks"]]
+    if res.get("missing"):
+        res["message"] = "Alguns alvos ficaram fora dos looks (já existem no look, papel único ocupado ou sem item compatível)."
+    return res
+
 @router.post("/items")
 def items_create(payload: ItemCreate):
     try:
@@ -74,14 +178,47 @@ def items_create(payload: ItemCreate):
         raise HTTPException(status_code=422, detail=str(e))
     return item
 
+def _parse_bulk(raw: bytes, content_type: str) -> Tuple[List[Tuple[int, Any]], List[Dict[str, Any]]]:
+    """Array JSON ou NDJSON (uma linha por item) -> [(índice, objeto)], erros de parse por linha."""
+    text = raw.decode("utf-8").strip()
+    if "ndjson" not in content_type and text.startswith("["):
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido: {e}")
+        return list(enumerate(data)), []
+    entries, errors = [], []
+    for idx, line in enumerate(line for line in text.splitlines() if line.strip()):
+        try:
+            entries.append((idx, json.loads(line)))
+        except json.JSONDecodeError as e:
+            errors.append({"index": idx, "error": f"JSON inválido: {e}"})
+    return entries, errors
+
+@router.post("/items/bulk")
+async def items_bulk(request: Request):
+    try:
+        entries, parse_errors = _parse_bulk(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # validação, gravação e grafo são síncronos: fora do event loop
+    res = await run_in_threadpool(svc.bulk_upsert_items, [obj for _, obj in entries])
+    pos = [idx for idx, _ in entries]
+    res["items"] = [{**it, "index": pos[it["index"]]} for it in res["items"]]
+    res["errors"] = sorted(parse_errors + [{**e, "index": pos[e["index"]]} for e in res["errors"]],
+                           key=lambda e: e["index"])
+    return res
+
 @router.delete("/items/{item_id}")
 def items_delete(item_id: str):
-    ok = catalog_repo.remove_item(item_id)
-    svc.rebuild_graph()
-    if not ok:
+    # remoção incremental no grafo (sem rebuild)
+    res = svc.delete_items([item_id])
+    if not res["deleted"]:
         raise HTTPException(404, "Item não encontrado")
-    return {"ok": True}
+    return {"ok": True, "graph": res["graph"]}
+
+@router.post("/items/delete")
+def items_delete_bulk(body: ItemsDeleteIn):
+    # remoção em lote: uma transação no catálogo e um único delta no grafo
+    return svc.delete_items(body.item_ids)
 
-@router.get("/items/catalog")
-def items_catalog():
-    return catalog_repo.load_all()
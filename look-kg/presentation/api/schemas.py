@@ -1,4 +1,4 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 from pydantic import BaseModel
 
 class ItemCreate(BaseModel):
@@ -11,6 +11,9 @@ class ItemCreate(BaseModel):
     ocasion: Optional[str] = "casual"
     clima: Optional[str] = "quente"
 
+class ItemsDeleteIn(BaseModel):
+    item_ids: List[str]
+
 class RecommendComplementarIn(BaseModel):
     query: Optional[str] = None
     item_id: Optional[str] = None
@@ -18,8 +21,30 @@ class RecommendComplementarIn(BaseModel):
     top_k: int = 10
     threshold: float = 0.0
     constraints: Optional[Dict[str, str]] = None
+    explain: bool = False  # além dos códigos em "reasons", os textos em "rationale"
+
+class RecommendSeed(BaseModel):
+    item_id: Optional[str] = None
+    itens: Optional[List[str]] = None
+
+class RecommendBatchIn(BaseModel):
+    # semente = item_id (string) ou contexto {"item_id"} / {"itens": [nomes ou ids]}
+    seeds: List[Union[str, RecommendSeed]]
+    top_k: int = 10
+    threshold: float = 0.0
+    constraints: Optional[Dict[str, str]] = None
+    explain: bool = False
 
 class RecommendCompletarIn(BaseModel):
     itens: List[str]
     top_k: int = 1
     targets: List[str] = ["sapato","bolsa","acessorio"]
+    explain: bool = False
+
+class RecommendLooksIn(BaseModel):
+    itens: List[str]
+    targets: List[str] = ["sapato","bolsa","acessorio"]
+    n: int = 5
+    max_expansions: Optional[int] = None
+    time_budget_ms: Optional[int] = None
+    explain: bool = False
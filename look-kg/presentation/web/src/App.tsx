@@ -1,7 +1,7 @@
 import React, { useEffect, useMemo, useState } from "react";
 import {
   apiSearch, apiCreateItem, apiDeleteItem, apiRecommendComplementar,
-  apiRecommendCompletar, apiRebuild, apiListCatalog, apiGetItem
+  apiRecommendCompletar, apiRebuild, apiListCatalog, apiGetItem, apiReasons
 } from "./api";
 import {
   CATEGORIES, PATTERNS, STYLES, OCCASIONS, CLIMES, COLORS, MATERIALS, Category
@@ -35,12 +35,13 @@ export default function App(){
   const [targets, setTargets] = useState<Category[]>([]);
   const [results, setResults] = useState<any>(null);
   const [loading, setLoading] = useState(false);
+  const [reasons, setReasons] = useState<Record<string, string>>({});
 
   const [form, setForm] = useState<Item>({
     nome:"", categoria:"", cor:"", padrao:"", material:"", estilo:"", ocasion:"", clima:""
   });
 
-  useEffect(()=>{ refreshCatalog(); }, []);
+  useEffect(()=>{ refreshCatalog(); apiReasons().then(setReasons).catch(()=>{}); }, []);
   async function refreshCatalog(){
     try {
       const list = await apiListCatalog();
@@ -276,7 +277,7 @@ export default function App(){
         <div>
           <h2>Look</h2>
           <Selected items={look} onRemove={removeFromLook} keyOf={keyOf}/>
-          {results && <Results block={results} onAddFromResult={addFromResult} lookCats={lookCats}/>}
+          {results && <Results block={results} onAddFromResult={addFromResult} lookCats={lookCats} reasons={reasons}/>}
         </div>
       </div>
     </div>
@@ -315,7 +316,7 @@ function Selected({items, onRemove, keyOf}:{items:Item[]; onRemove:(i:Item)=>voi
   );
 }
 
-function Results({block, onAddFromResult, lookCats}:{block:any; onAddFromResult:(r:any)=>void; lookCats:Set<string>}){
+function Results({block, onAddFromResult, lookCats, reasons}:{block:any; onAddFromResult:(r:any)=>void; lookCats:Set<string>; reasons:Record<string, string>}){
   if (block.tipo === "sugerir"){
     const arr = block.data?.results || [];
     if (!arr.length) return <div style={{marginTop:12}}>Sem sugestões no threshold atual.</div>;
@@ -326,7 +327,7 @@ function Results({block, onAddFromResult, lookCats}:{block:any; onAddFromResult:
           <div key={r.item_id || `${r.nome}-${r.categoria}-${i}`} style={{border:"1px solid #eee", borderRadius:8, padding:8, marginBottom:8, display:"flex", justifyContent:"space-between", gap:12}}>
             <div>
               <b>{r.nome}</b> <em>({r.categoria})</em> — score: {r.score?.toFixed?.(2)}
-              {r.rationale && <div style={{fontSize:12, color:"#444"}}>{r.rationale.join("; ")}</div>}
+              {r.reasons && <div style={{fontSize:12, color:"#444"}}>{r.reasons.map((c:number)=>reasons[c] ?? `#${c}`).join("; ")}</div>}
             </div>
             <div>
               <button type="button" onClick={()=>onAddFromResult(r)}>Adicionar ao look</button>
@@ -47,6 +47,11 @@ export async function apiRecommendCompletar(payload: any){
   });
   return res.json();
 }
+export async function apiReasons(){
+  // código (campo "reasons" dos resultados) -> texto
+  const res = await fetch(`${API}/v1/recommend/reasons`);
+  return (await res.json()).reasons as Record<string, string>;
+}
 export async function apiRebuild(){
   const res = await fetch(`${API}/v1/graph/rebuild`, { method: "POST" });
   return res.json();
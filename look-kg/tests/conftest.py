@@ -0,0 +1,43 @@
+# tests/conftest.py
+"""Catálogos sintéticos pequenos (os mesmos do benchmark, ops/bench/catalog_gen) e um catalog.db temporário."""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import pytest
+
+from infrastructure.storage import catalog_cache, catalog_repo
+from ops.bench.catalog_gen import generate_catalog
+
+
+@pytest.fixture
+def catalog() -> List[Dict[str, Any]]:
+    return generate_catalog(160, seed=7)
+
+
+@pytest.fixture
+def raw_items() -> List[Dict[str, Any]]:
+    """Dicts crus, sem normalize_item: campos ausentes e valores fora das tabelas."""
+    return [
+        {"item_id": "raw-1", "categoria": "blusa"},
+        {"item_id": "raw-2", "categoria": "saia", "cor": "roxo", "estilo": "gotico", "material": "bambu",
+         "padrao": "animal"},
+        {"item_id": "raw-3", "categoria": "vestido", "cor": "preto", "padrao": "xadrez", "clima": "frio"},
+        {"item_id": "raw-4", "categoria": "sapato", "cor": "azul", "ocasion": "noite", "material": "couro",
+         "padrao": "poa"},
+    ]
+
+
+@pytest.fixture
+def catalog_db(tmp_path, monkeypatch):
+    """catalog_repo apontando para um catalog.db vazio em tmp_path (sem o catalog.json legado)."""
+    db = tmp_path / "catalog.db"
+    monkeypatch.setattr(catalog_repo, "CATALOG_DB", db)
+    monkeypatch.setattr(catalog_repo, "CATALOG_PATH", tmp_path / "catalog.json")
+    monkeypatch.delenv("LOOKKG_GRAPH_SNAPSHOT", raising=False)  # snapshot do grafo também em tmp_path
+    catalog_cache._cache.invalidate()
+    yield catalog_repo
+    catalog_cache._cache.invalidate()
+    pool = catalog_repo._pools.pop(str(db), None)
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,104 @@
+# tests/test_api.py
+"""Rotas /v1 pelo TestClient, sobre um catalog.db temporário (sem o lifespan da API)."""
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from application.result_cache import ResultCache
+from infrastructure.graph.dict_repo import GraphManager
+from presentation.api import routers
+
+
+@pytest.fixture
+def client(catalog_db, catalog, monkeypatch):
+    catalog_db.add_items(catalog)
+    monkeypatch.setattr(routers.svc, "graph", GraphManager(workers=1))
+    monkeypatch.setattr(routers.svc, "results", ResultCache(max_entries=64))
+    routers.svc.rebuild_graph()
+    app = FastAPI()
+    app.include_router(routers.router)
+    with TestClient(app) as c:
+        yield c
+
+
+def item(item_id, **kw):
+    return {"item_id": item_id, "nome": f"Item {item_id}", "categoria": "blusa", "cor": "azul", **kw}
+
+
+def test_bulk_json_array(client):
+    body = [item("bulk-1"), "nao-e-objeto", item("bulk-2", cor="furta-cor"), item("bulk-3", categoria="saia")]
+    res = client.post("/v1/items/bulk", json=body).json()
+    assert res["saved"] == 2
+    assert res["items"] == [{"index": 0, "item_id": "bulk-1"}, {"index": 3, "item_id": "bulk-3"}]
+    assert [(e["index"], e["error"]) for e in res["errors"]] == [
+        (1, "item deve ser um objeto JSON"), (2, "cor inválida: furta-cor")]
+    assert client.get("/v1/items/bulk-3").json()["categoria"] == "saia"
+    assert client.get("/v1/items/bulk-2").status_code == 404
+    view = routers.svc.graph.view()
+    assert view.has_node("bulk-1") and view.has_node("bulk-3") and view.adjacent("bulk-3")
+
+
+def test_bulk_ndjson_keeps_line_indices(client):
+    lines = [json.dumps(item("nd-1")), "{quebrado", "", json.dumps(item("nd-2", estilo="barroco")),
+             json.dumps(item("nd-3"))]
+    res = client.post("/v1/items/bulk", content="\n".join(lines),
+                      headers={"content-type": "application/x-ndjson"}).json()
+    # linhas em branco não contam: índice = posição entre as linhas com conteúdo
+    assert [it["index"] for it in res["items"]] == [0, 3]
+    assert [e["index"] for e in res["errors"]] == [1, 2]
+    assert res["errors"][0]["error"].startswith("JSON inválido")
+    assert res["errors"][1]["error"] == "estilo inválido: barroco"
+
+    assert client.post("/v1/items/bulk", content="[{", headers={"content-type": "application/json"}).status_code == 422
+
+
+def test_complementar_batch_matches_single_calls(client, catalog):
+    seeds = [catalog[0]["item_id"], "nao-existe", {"item_id": catalog[7]["item_id"]},
+             {"itens": [catalog[3]["nome"], catalog[40]["item_id"]]}, {"itens": ["ninguem"]}]
+    for constraints in (None, {"ocasion": "noite"}):
+        body = {"seeds": seeds, "top_k": 5, "threshold": 0.2, "constraints": constraints}
+        res = client.post("/v1/recommend/complementar/batch", json=body)
+        assert res.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in res.text.splitlines()]
+        assert [r["index"] for r in rows] == list(range(len(seeds)))
+        assert [("error" in r) for r in rows] == [False, True, False, False, True]
+        assert all(r["results"] for r in rows if "error" not in r)
+
+        single = {"top_k": 5, "threshold": 0.2, "constraints": constraints}
+        for row, seed in zip(rows, seeds):
+            if "error" in row:
+                continue
+            ctx = {"item_id": seed} if isinstance(seed, str) else seed
+            assert row["results"] == client.post("/v1/recommend/complementar", json={**ctx, **single}).json()["results"]
+
+    explained = client.post("/v1/recommend/complementar/batch", json={"seeds": seeds[:1], "explain": True}).text
+    assert all("rationale" in r for r in json.loads(explained)["results"])
+
+
+@pytest.mark.parametrize("fmt", ["json", "ndjson"])
+def test_catalog_paging(client, catalog, fmt):
+    def page(**params):
+        res = client.get("/v1/items/catalog", params={"format": fmt, **params})
+        assert res.status_code == 200
+        rows = res.json() if fmt == "json" else [json.loads(line) for line in res.text.splitlines()]
+        return rows, res.headers.get("x-next-cursor")
+
+    everything, cursor = page()
+    assert cursor is None
+    assert [r["item_id"] for r in everything] == sorted(it["item_id"] for it in catalog)
+
+    seen, after = [], None
+    while True:
+        rows, after = page(limit=70, fields="item_id,cor", **({"after": after} if after else {}))
+        assert all(set(r) == {"item_id", "cor"} for r in rows)
+        seen.extend(rows)
+        if after is None:
+            break
+        assert after == rows[-1]["item_id"]
+    assert seen == [{"item_id": r["item_id"], "cor": r["cor"]} for r in everything]
+
+    assert client.get("/v1/items/catalog", params={"fields": "item_id,preco"}).status_code == 422
@@ -0,0 +1,114 @@
+# tests/test_catalog_repo.py
+"""catalog_repo sobre SQLite: upsert por item_id ou (nome, categoria), lotes, remoções, busca, exportação."""
+from __future__ import annotations
+
+import pytest
+
+
+def test_upsert_by_id_and_natural_key(catalog_db):
+    repo = catalog_db
+    saved = repo.add_item({"nome": "Blusa Azul", "categoria": "blusa", "cor": "azul"})
+    item_id = saved["item_id"]
+    assert item_id.startswith("blusa_")
+    rev = repo.revision()
+
+    # mesma chave natural, sem item_id: atualiza a linha e mantém o item_id dela
+    again = repo.add_item({"nome": "Blusa Azul", "categoria": "blusa", "cor": "verde"})
+    assert again["item_id"] == item_id
+    assert repo.get_item(item_id)["cor"] == "verde"
+    assert repo.revision() > rev
+
+    # item_id explícito na mesma chave natural: substitui o antigo
+    repo.add_item({"item_id": "b1", "nome": "Blusa Azul", "categoria": "blusa", "cor": "preto"})
+    assert repo.get_item(item_id) is None
+    assert repo.get_item("b1")["cor"] == "preto"
+
+    # mesmo item_id, outro nome: atualiza pela PK
+    repo.add_item({"item_id": "b1", "nome": "Blusa Preta", "categoria": "blusa"})
+    assert [it.item_id for it in repo.load_all()] == ["b1"]
+    assert repo.get_item("b1")["nome"] == "Blusa Preta"
+
+
+def test_add_items_is_one_transaction_with_per_item_errors(catalog_db):
+    repo = catalog_db
+    version = repo.version(check_external=False)
+    errors = repo.add_items([
+        {"item_id": "a", "nome": "A", "categoria": "blusa"},
+        {"item_id": "b", "categoria": "saia"},  # nome NOT NULL: só este item falha
+        {"nome": "C", "categoria": "sapato"},
+    ])
+    assert errors[0] is None and errors[2] is None
+    assert errors[1].startswith("conflito ao salvar item")
+    assert [it.nome for it in repo.load_all()] == ["A", "C"]
+    assert repo.version(check_external=False) == version + 1
+
+
+def test_delete_items_returns_the_existing_ones(catalog_db):
+    repo = catalog_db
+    for k in range(5):
+        repo.add_item({"item_id": f"i{k}", "nome": f"item {k}", "categoria": "bolsa"})
+    version = repo.version(check_external=False)
+    assert repo.delete_items(["i3", "nao-existe", "i1", "i3"]) == ["i3", "i1"]
+    assert [it.item_id for it in repo.load_all()] == ["i0", "i2", "i4"]
+    assert repo.delete_items(["nao-existe"]) == []
+    assert repo.version(check_external=False) == version + 1  # remoção vazia não muda a versão
+    assert repo.delete_item("i0") and not repo.delete_item("i0")
+
+
+SEARCH_ITEMS = [
+    {"item_id": "s1", "nome": "Blusa Listrada Azul", "categoria": "blusa", "cor": "azul", "padrao": "listrado"},
+    {"item_id": "s2", "nome": "Saia Azul Marinho", "categoria": "saia", "cor": "azul"},
+    {"item_id": "s3", "nome": "Blusa Branca", "categoria": "blusa", "cor": "branco", "material": "algodao"},
+    {"item_id": "s4", "nome": "Sapato Social", "categoria": "sapato", "cor": "preto", "ocasion": "trabalho"},
+]
+
+
+@pytest.mark.parametrize("fts", [True, False], ids=["fts5", "like"])
+def test_search(catalog_db, fts, monkeypatch):
+    repo = catalog_db
+    assert repo.add_items(SEARCH_ITEMS) == [None] * len(SEARCH_ITEMS)
+    if fts and not repo._fts_enabled[str(repo.CATALOG_DB)]:
+        pytest.skip("SQLite sem FTS5")
+    monkeypatch.setitem(repo._fts_enabled, str(repo.CATALOG_DB), fts)
+
+    def ids(query, **kw):
+        return sorted(it["item_id"] for it in repo.search(query, **kw))
+
+    assert ids("azul") == ["s1", "s2"]
+    assert ids("  SAPATO ") == ["s4"]
+    assert ids("") == ["s1", "s2", "s3", "s4"]
+    assert ids("roxo") == []
+    assert [it["item_id"] for it in repo.search("", limit=2, offset=1)] == ["s2", "s3"]
+    if fts:  # prefixo por termo, todos os termos obrigatórios, em qualquer campo
+        assert ids("blu") == ["s1", "s3"]
+        assert ids("blusa azul") == ["s1"]
+        assert ids("algod blusa") == ["s3"]
+        assert len(repo.search("blusa", limit=1)) == 1
+    else:  # substring do texto inteiro, como a busca antiga
+        assert ids("lusa") == ["s1", "s3"]
+        assert ids("50%") == []
+
+
+def test_export_in_keyset_chunks(catalog_db, monkeypatch):
+    repo = catalog_db
+    monkeypatch.setattr(repo, "EXPORT_CHUNK", 3)
+    ids = [f"e{k:02d}" for k in range(10)]
+    repo.add_items([{"item_id": i, "nome": f"item {i}", "categoria": "blusa", "cor": "azul"} for i in reversed(ids)])
+
+    assert [it["item_id"] for it in repo.export_items()] == ids
+    assert [it["item_id"] for it in repo.export_items(after="e02", until="e08")] == ids[3:9]
+    assert list(repo.export_items(fields=["cor", "item_id"])) == [{"item_id": i, "cor": "azul"} for i in ids]
+    with pytest.raises(ValueError, match="preco"):
+        repo.export_items(fields=["nome", "preco"])
+
+    # páginas de 4 pelo cursor cobrem o catálogo uma vez, em ordem
+    pages, cursor = [], None
+    while True:
+        last, following = repo.export_page(cursor, 4)
+        pages.append([it["item_id"] for it in repo.export_items(after=cursor, until=last)])
+        if following is None:
+            break
+        cursor = following
+    assert pages == [ids[0:4], ids[4:8], ids[8:10]]
+    assert repo.export_page("e09", 4) == (None, None)
+    assert repo.export_page(None, 0) == (None, None)
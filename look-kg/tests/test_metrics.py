@@ -0,0 +1,26 @@
+# tests/test_metrics.py
+"""GaugeFunc: valor lido na coleta; uma leitura quebrada some da saída e é logada uma vez."""
+from __future__ import annotations
+
+import logging
+
+from infrastructure.observability import metrics
+
+
+def test_broken_gauge_is_logged_once(caplog):
+    state = {"broken": True}
+
+    def read():
+        if state["broken"]:
+            raise RuntimeError("fonte indisponível")
+        return 3
+
+    gauge = metrics.GaugeFunc("lookkg_test_gauge", "Gauge de teste.", read)
+    with caplog.at_level(logging.ERROR, logger=metrics.__name__):
+        assert gauge.render() == [] and gauge.render() == []
+        assert len(caplog.records) == 1 and "lookkg_test_gauge" in caplog.records[0].getMessage()
+        state["broken"] = False
+        assert gauge.render()[-1] == "lookkg_test_gauge 3"
+        state["broken"] = True
+        gauge.render()  # quebrou de novo depois de voltar: loga outra vez
+        assert len(caplog.records) == 2
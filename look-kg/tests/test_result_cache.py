@@ -0,0 +1,75 @@
+# tests/test_result_cache.py
+"""Cache de resultados: limites, versão, e invalidação pelo serviço a cada escrita no catálogo."""
+from __future__ import annotations
+
+from application import result_cache, services
+from application.result_cache import ResultCache
+from infrastructure.graph.dict_repo import GraphManager
+
+
+def fill(cache, key, version, value):
+    """Como RecommendationService._cached: miss, calcula, guarda."""
+    assert cache.get(key, version) is None
+    cache.put(key, version, value)
+
+
+def test_version_change_drops_everything():
+    cache = ResultCache(max_entries=8)
+    fill(cache, "a", 1, {"results": [1]})
+    fill(cache, "b", 1, {"results": [2]})
+    assert cache.get("a", 1) == {"results": [1]}
+    assert cache.get("b", 2) is None  # versão nova: o cache inteiro sai
+    assert cache.get("a", 2) is None
+    cache.put("a", 1, {"results": [1]})  # calculado na versão velha: não entra
+    assert cache.get("a", 2) is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["invalidations"]) == (0, 1, 5, 1)
+
+
+def test_limits(monkeypatch):
+    cache = ResultCache(max_entries=2, max_bytes=0, ttl=10.0)
+    now = [100.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    for key in "abc":
+        fill(cache, key, 0, key)
+        cache.get("a", 0)  # "a" é o mais recente: "b" sai no LRU
+    assert [k for k in "abc" if cache.get(k, 0)] == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+    now[0] += 11
+    assert cache.get("a", 0) is None and cache.stats()["entries"] == 1
+
+    small = ResultCache(max_entries=8, max_bytes=20)
+    fill(small, "big", 0, "x" * 40)  # maior que o limite inteiro: nem entra
+    for key in "abc":
+        fill(small, key, 0, "x" * 6)  # 8 bytes em JSON: cabem dois
+    assert [k for k in ("big", "a", "b", "c") if small.get(k, 0)] == ["b", "c"]
+
+    off = ResultCache(max_entries=0)
+    fill(off, "a", 0, "a")
+    assert off.get("a", 0) is None and not off.stats()["enabled"]
+
+
+def test_service_writes_invalidate_results(catalog_db, catalog):
+    catalog_db.add_items(catalog)
+    svc = services.RecommendationService()
+    svc.results = ResultCache(max_entries=64)
+    svc.graph = GraphManager(workers=1)
+    svc.rebuild_graph()
+    ctx = [dict(catalog[0])]
+
+    def ask():
+        return svc.suggest_complements(ctx, top_k=5)["results"]
+
+    first = ask()
+    assert ask() == first and svc.results.hits == 1
+
+    # cópia do primeiro colocado com id menor: empata no score e ganha no desempate por item_id,
+    # só aparece se o cache caiu
+    copy = dict(catalog_db.get_item(first[0]["item_id"]), item_id="a-copia", nome="Copia")
+    svc.upsert_item_and_generate_edges(copy)
+    assert ask()[0]["item_id"] == "a-copia"
+    assert svc.results.stats()["invalidations"] == 1
+
+    svc.delete_items(["a-copia"])
+    assert ask() == first
+    assert svc.results.stats()["invalidations"] == 2 and svc.results.hits == 1
@@ -0,0 +1,56 @@
+# tests/test_snapshot.py
+"""Snapshot do grafo: save -> load -> load_edges devolve o mesmo grafo; snapshot velho é recusado."""
+from __future__ import annotations
+
+import pytest
+
+from infrastructure.graph import snapshot
+from infrastructure.graph.csr_repo import CSRGraphManager
+from infrastructure.graph.dict_repo import GraphManager
+
+REVISION = 7
+
+
+def edges(manager):
+    _, _, ids, _, (u, v, w) = manager.export_edges()
+    return {frozenset((ids[a], ids[b])): float(x) for a, b, x in zip(u.tolist(), v.tolist(), w.tolist())}, sorted(ids)
+
+
+def save(g, path):
+    _, _, ids, nodes, graph_edges = g.export_edges()
+    return snapshot.save(ids, graph_edges, REVISION, snapshot.items_digest(nodes),
+                         params=g.sparsify.params(), path=path)
+
+
+@pytest.mark.parametrize("cls", [GraphManager, CSRGraphManager])
+@pytest.mark.parametrize("top_k", [0, 8])
+def test_round_trip(cls, top_k, catalog, tmp_path):
+    g = cls(workers=1, top_k=top_k)
+    g.rebuild(catalog)
+    path = save(g, tmp_path / "graph.snapshot.npz")
+
+    loaded = snapshot.load(REVISION, catalog, weights=g.weight_format, params=g.sparsify.params(), path=path)
+    assert loaded is not None
+    ids, graph_edges = loaded
+    h = cls(workers=1, top_k=top_k)
+    h.load_edges(catalog, ids, graph_edges, revision=REVISION)
+    assert edges(h) == edges(g)
+    assert h.view().revision == REVISION
+    if top_k:
+        assert h.floors == g.floors
+
+
+def test_stale_snapshot_is_rejected(catalog, tmp_path):
+    g = GraphManager(workers=1)
+    g.rebuild(catalog)
+    path = save(g, tmp_path / "graph.snapshot.npz")
+    params = g.sparsify.params()
+    changed = [dict(catalog[0], cor="rosa")] + catalog[1:]
+
+    assert snapshot.load(REVISION, catalog, params=params, path=path) is not None
+    assert snapshot.load(REVISION + 1, catalog, params=params, path=path) is None
+    assert snapshot.load(REVISION, changed, params=params, path=path) is None
+    assert snapshot.load(REVISION, catalog[1:], params=params, path=path) is None
+    assert snapshot.load(REVISION, catalog, weights="uint8", params=params, path=path) is None
+    assert snapshot.load(REVISION, catalog, params={"top_k": 8}, path=path) is None
+    assert snapshot.load(REVISION, catalog, path=tmp_path / "nao-existe.npz") is None